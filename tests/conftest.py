@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# pytest fixtures of ZMake
+
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zmake
+
+@pytest.fixture
+def zmake_state():
+    """
+    empty module globals and class registries of ZMake for a test, the
+    previous state is restored afterwards
+    """
+    state = zmake._zmake_state_save()
+    for cls, name in zmake._ZMAKE_STATE_REGS:
+        setattr(cls, name, {})
+
+    yield zmake
+    zmake._zmake_state_restore(state)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# tests of critical path computed from timings of previous build
+
+import os
+
+import pytest
+
+import zmake
+
+SRC_TREE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def project(tmp_path):
+    project = zmake.zmake_workspace(SRC_TREE).project(str(tmp_path), generator = 'ninja',
+        scan_cache = False, yaml_cache = False)
+    assert project.generate(os.path.join(SRC_TREE, 'test_defconfig')) == 0
+    return project
+
+def ninja_log(project, timings):
+    with open(os.path.join(project.path, '.ninja_log'), 'w') as fd:
+        fd.write("# ninja log v5\n")
+        for output, duration in timings.items():
+            fd.write("0\t%d\t0\t%s\t0\n" %(duration, output))
+
+def test_without_timings(project):
+    for module in list(project.libs.values()) + list(project.apps.values()):
+        for obj in module.src.values():
+            size = sum(os.path.getsize(path) for path in obj.unity or [obj._src_path])
+            assert obj.priority == int(size * zmake._ZMAKE_COST_PER_BYTE)
+
+        assert module.priority == max(obj.priority for obj in module.src.values())
+
+def test_with_timings(project):
+    lib, main, main2 = project.libs['mod11'], project.apps['main'], project.apps['main2']
+    assert main._libs == ['mod11']     # mod12 is disabled
+
+    objs = list(lib.src.values())
+    timings = {main._out_path: 100, main2._out_path: 300, lib._out_path: 50}
+    timings.update({obj._obj_path: 10 * (idx + 1) for idx, obj in enumerate(objs)})
+    ninja_log(project, timings)
+    assert project.generate(os.path.join(SRC_TREE, 'test_defconfig')) == 0
+
+    lib, main, main2 = project.libs['mod11'], project.apps['main'], project.apps['main2']
+    for idx, obj in enumerate(lib.src.values()):
+        assert obj.priority == 10 * (idx + 1) + 150     # object, library and main
+
+    assert lib.priority == 10 * len(objs) + 150
+
+    # objects without timings are estimated by cost per byte of objects with timings
+
+    known_size = sum(os.path.getsize(obj._src_path) for obj in objs)
+    cost = sum(10 * (idx + 1) for idx in range(len(objs))) / known_size
+    for obj in main2.src.values():
+        assert obj.priority == int(os.path.getsize(obj._src_path) * cost) + 300
+
+    assert main2.priority == max(obj.priority for obj in main2.src.values())
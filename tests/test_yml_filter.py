@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# tests of libraries/applications disabled by Kconfig options('opt')
+
+import pytest
+
+import zmake
+from zmake import yml_module_enabled, yml_module_filter, yml_deps_prune, _zmake_exception
+
+@pytest.fixture
+def options(zmake_state, monkeypatch):
+    monkeypatch.setattr(zmake, '_KCONFIG_MODULE_OPTIONS', {'MODULE1'})
+
+def test_enabled_without_opt(options):
+    assert yml_module_enabled("lib", {"type": "lib"})
+
+def test_enabled_by_opt(options):
+    assert yml_module_enabled("lib", {"opt": "CONFIG_MODULE1"})
+    assert not yml_module_enabled("lib", {"opt": "CONFIG_MODULE2"})
+
+@pytest.mark.parametrize("opt", ["MODULE1", "", 1, ["CONFIG_MODULE1"]])
+def test_invalid_opt(options, opt):
+    with pytest.raises(_zmake_exception):
+        yml_module_enabled("lib", {"opt": opt})
+
+def test_filter(options, monkeypatch):
+    monkeypatch.setattr(zmake, '_YAML_DATA', {
+        "lib1":     {"type": "lib", "opt": "CONFIG_MODULE1"},
+        "lib2":     {"type": "lib", "opt": "CONFIG_MODULE2"},
+        "app2":     {"type": "app", "opt": "CONFIG_MODULE2"},
+        "var":      {"type": "var", "opt": "CONFIG_MODULE2"},
+        "tgt2":     {"type": "target", "deps": ["lib2", "app2"]},
+        "tgt3":     {"type": "target", "deps": ["tgt2"]},
+        "tgt_cmd":  {"type": "target", "cmd": "echo", "deps": ["lib2"]},
+        "tgt_mix":  {"type": "target", "deps": ["lib1", "lib2"]},
+    })
+    yml_module_filter()
+    assert zmake._YAML_DISABLED == {"lib2", "app2", "tgt2", "tgt3"}
+
+def test_deps_prune(options, monkeypatch):
+    monkeypatch.setattr(zmake, '_YAML_DISABLED', {"lib2", "tgt2"})
+    assert yml_deps_prune("app", ["lib1", "lib2", "tgt2", "lib3"]) == ["lib1", "lib3"]
+    assert yml_deps_prune("app", []) == []
+    assert yml_deps_prune("app", "lib2") == "lib2"     # invalid, reported when entity is created
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# tests of compile commands and keys of ZMake object cache
+
+import os, shutil
+
+import pytest
+
+from zmake_cache import _cc_cmd, _cache_uncacheable
+
+needs_cc = pytest.mark.skipif(shutil.which('cc') == None, reason = "compiler NOT found")
+
+def test_classify():
+    cmd = _cc_cmd(['cc', '-O2', '-Iinc', '-D', 'A=1', '-x', 'c', '-MD', '-MT', 'a.o', '-c', 'a.c', '-o', 'out/a.o'])
+    assert (cmd.src, cmd.lang, cmd.obj) == ('a.c', 'c', 'out/a.o')
+    assert cmd.flags == ['-O2', '-x', 'c']
+    assert cmd.cpp == ['-Iinc', '-D', 'A=1']
+    assert cmd.deps == ['-MD']
+    assert (cmd.depfile, cmd.target) == ('out/a.d', 'a.o')
+    assert not cmd.debug
+
+def test_debug():
+    assert _cc_cmd(['cc', '-g', '-c', 'a.c', '-o', 'a.o']).debug
+    assert not _cc_cmd(['cc', '-g0', '-c', 'a.c', '-o', 'a.o']).debug
+
+@pytest.mark.parametrize("argv", [
+    ['cc', 'a.c', '-o', 'a'],                           # linking
+    ['cc', '-c', 'a.c', 'b.c', '-o', 'a.o'],            # several sources
+    ['cc', '-c', 'a.c'],                                # no object
+    ['cc', '-E', '-c', 'a.c', '-o', 'a.o'],
+    ['cc', '@args', '-c', 'a.c', '-o', 'a.o'],
+    ['cc', '-c', 'a.c', '-o'],
+])
+def test_uncacheable(argv):
+    with pytest.raises(_cache_uncacheable):
+        _cc_cmd(argv)
+
+@needs_cc
+def test_key(tmp_path):
+    src = tmp_path / "a.c"
+    src.write_text("int a = VAL;\n")
+    other = tmp_path / "dir"
+    other.mkdir()
+    (other / "a.c").write_text("int a = VAL;\n")
+
+    def key(*args, src = str(src)):
+        return _cc_cmd(['cc'] + list(args) + ['-c', src, '-o', str(tmp_path / "a.o")]).key()
+
+    base = key('-DVAL=1')
+    assert key('-DVAL=1') == base
+    assert key('-D', 'VAL=1', '-Iunused') == base             # same preprocessed source
+    assert key('-DVAL=1', src = str(other / "a.c")) == base   # same source in another path
+    assert key('-DVAL=2') != base
+    assert key('-DVAL=1', '-O2') != base
+    assert key('-DVAL=1', '-x', 'c++') != base
+
+@needs_cc
+def test_key_raw_source(tmp_path):
+    src = tmp_path / "a.s"
+    src.write_text(".text\n")
+    cmd = _cc_cmd(['cc', '-c', str(src), '-o', str(tmp_path / "a.o")])
+    base = cmd.key()
+    src.write_text(".data\n")
+    assert cmd.key() != base
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# tests of dependency files rewritten by zmake_fixdep
+
+import os
+
+from zmake_fixdep import depfile_find, depfile_parse, fixdep
+
+def test_depfile_find():
+    assert depfile_find(['cc', '-MD', '-MF', 'a.dep', '-c', 'a.c', '-o', 'a.o']) == 'a.dep'
+    assert depfile_find(['cc', '-MD', '-MFa.dep', '-c', 'a.c', '-o', 'a.o']) == 'a.dep'
+    assert depfile_find(['cc', '-MMD', '-c', 'a.c', '-o', 'out/a.o']) == 'out/a.d'
+    assert depfile_find(['cc', '-c', 'a.c', '-o', 'a.o']) == None
+
+def test_depfile_parse():
+    content = "a.o: a.c dir\\ with\\ space/b.h \\\n c.h\nb.h:\nc.h: \n"
+    assert depfile_parse(content) == [('a.o', ['a.c', 'dir with space/b.h', 'c.h']), ('b.h', []), ('c.h', [])]
+
+def test_fixdep(tmp_path):
+    (tmp_path / "a.c").write_text('#include "config.h"\n#if CONFIG_FOO\nint x = CONFIG_BAR;\n#endif\n')
+    (tmp_path / "b h.h").write_text('#define B CONFIG_BAZ\n')
+    (tmp_path / "config.h").write_text('#define CONFIG_FOO 1\n#define CONFIG_QUX 1\n')
+    depfile = tmp_path / "a.d"
+    depfile.write_text("a.o: a.c b\\ h.h \\\n config.h\nb\\ h.h:\nconfig.h:\n")
+    symbols = tmp_path / "symbols"
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path)
+    try:
+        fixdep(str(depfile), str(symbols), "config.h")
+    finally:
+        os.chdir(cwd)
+
+    rules = depfile_parse(depfile.read_text())
+    names = [os.path.join(str(symbols), name) for name in ('BAR', 'BAZ', 'FOO')]
+    assert rules == [('a.o', ['a.c', 'b h.h'] + names),     # header removed, symbols used added
+        ('b\\ h.h', []), ('config.h', [])]                  # phony targets of '-MP' kept
+    assert sorted(os.listdir(symbols)) == ['BAR', 'BAZ', 'FOO']
+    assert all(os.stat(name).st_mtime == 0 for name in names)
+    assert not os.path.exists(str(depfile) + '.tmp')
+
+def test_fixdep_keeps_symbol_files(tmp_path):
+    (tmp_path / "a.c").write_text('int x = CONFIG_FOO;\n')
+    symbols = tmp_path / "symbols"
+    symbols.mkdir()
+    (symbols / "FOO").write_text("")
+    mtime = os.stat(symbols / "FOO").st_mtime_ns
+    depfile = tmp_path / "a.d"
+    depfile.write_text("a.o: %s\n" %(tmp_path / "a.c"))
+
+    fixdep(str(depfile), str(symbols), str(tmp_path / "config.h"))
+    assert os.stat(symbols / "FOO").st_mtime_ns == mtime
+
+def test_fixdep_missing_depfile(tmp_path):
+    fixdep(str(tmp_path / "a.d"), str(tmp_path / "symbols"), "config.h")
+    assert not os.path.exists(tmp_path / "symbols")
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# tests of ZMake variable resolution
+
+import pytest
+
+from zmake import zmake_var, _zmake_exception
+
+def test_reference_defined_later(zmake_state):
+    a = zmake_var("A", "$(B)/a")
+    zmake_var("B", "$(C)/b")
+    zmake_var("C", "c")
+    assert a.val == "c/b/a"
+    assert zmake_var.dereference("$(A) $(C)") == "c/b/a c"
+
+def test_nested_reference(zmake_state):
+    zmake_var("ARCH", "arm")
+    zmake_var("CFLAGS_arm", "-marm")
+    assert zmake_var.dereference("$(CFLAGS_$(ARCH))") == "-marm"
+
+def test_value_not_string(zmake_state):
+    assert zmake_var("N", 3).val == 3
+    assert zmake_var.dereference("-j$(N)") == "-j3"
+
+def test_dereference_invalidated_by_new_variable(zmake_state):
+    with pytest.raises(_zmake_exception):
+        zmake_var.dereference("$(LATE)")
+    zmake_var("LATE", "x")
+    assert zmake_var.dereference("$(LATE)") == "x"
+
+def test_undefined_reference(zmake_state):
+    with pytest.raises(_zmake_exception) as e:
+        zmake_var.dereference("$(UNDEFINED)")
+    assert "UNDEFINED" in e.value.message
+    assert zmake_var.dereference("$(UNDEFINED) -O2", False) == "$(UNDEFINED) -O2"
+
+def test_literal_references(zmake_state):
+    assert zmake_var.dereference("$(shell uname -m)") == "$(shell uname -m)"
+    assert zmake_var.dereference("a) $(b") == "a) $(b"
+
+def test_circular_reference(zmake_state):
+    zmake_var("A", "$(B)")
+    zmake_var("B", "x $(C)")
+    zmake_var("C", "$(A)")
+    with pytest.raises(_zmake_exception) as e:
+        zmake_var.dereference("$(A)")
+    assert e.value.message.endswith("A -> B -> C -> A")
+
+def test_self_reference(zmake_state):
+    zmake_var("SELF", "$(SELF) -g")
+    with pytest.raises(_zmake_exception) as e:
+        zmake_var.dereference("$(SELF)")
+    assert "SELF -> SELF" in e.value.message
+
+def test_long_chain(zmake_state):
+    count = 5000
+    for idx in range(count):
+        zmake_var("V%d" %idx, "$(V%d)" %(idx + 1))
+    zmake_var("V%d" %count, "end")
+    assert zmake_var.dereference("$(V0)") == "end"
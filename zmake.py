@@ -16,9 +16,21 @@
 
 import sys, os, re, argparse, pprint
 import yaml, subprocess
-import logging, fnmatch, time
+import logging, time
+import json, hashlib, threading, tempfile, marshal, shutil
+import concurrent.futures
 
-logging.basicConfig(level = logging.DEBUG, format = '%(levelname)s[%(asctime)s]:%(message)s')
+try:
+    import kconfiglib   # Kconfig is evaluated in process if available, otherwise by 'genconfig'
+except ImportError:
+    kconfiglib = None
+
+try:
+    import fcntl        # lock of shared object store
+except ImportError:
+    fcntl = None
+
+_LOGGER = logging.getLogger('zmake')   # configured by command line, left to the application if imported
 
 # global
 
@@ -30,42 +42,102 @@ _SRC_TREE   = ''    # source code path
 _PRJ_DIR    = ''    # project path
 _PRJ_GEN    = ''    # build generator
 _PRJ_VREB   = 0     # enable verbose output
+_PRJ_FORCE  = 0     # force regeneration even if nothing changed
+_PRJ_SCAN_CACHE = 1 # enable persistent source scan cache
+_PRJ_YAML_CACHE = 1 # enable binary cache of parsed YAML files
+_PRJ_OBJ_CACHE  = '' # object cache directory for compile steps, disabled if empty
+_PRJ_OBJ_CACHE_SIZE = 5 * 1024  # size limit of object cache in MB
+_PRJ_UNITY      = 0  # batch size of unity build for modules without 'unity', 0 to disable
+_PRJ_UNITY_OFF  = 0  # disable unity build for all modules
+_PRJ_CONFIG_DEPS = 0 # fine-grained Kconfig dependencies, objects depend on symbols they use
+_PRJ_OBJ_STORE  = '' # shared object store directory for objects and archives of libraries, disabled if empty
 
 # build generator types
 
 _PRJ_GEN_TYPE_MAKE  = 'make'
 _PRJ_GEN_TYPE_NINJA = 'ninja'
-_PRJ_GEN_TYPES      = ['make', 'ninja']
+_PRJ_GEN_TYPE_DIRECT = 'direct'  # build directly by zmake without generated files
+_PRJ_GEN_TYPES      = ['make', 'ninja', 'direct']
+
+_PRJ_MODULE_FILES   = {'make': ('make', '.mk'), 'ninja': ('ninja', '.ninja')}  # generator: (path in project, extension) of module files
+_ZMAKE_VARIANT_JOBS = os.cpu_count() or 1   # processes to configure variants, see variants_gen()
 
 # yaml
 
 _YAML_ROOT_FILE     = 'top.yml'     # top configuartion yaml
+_YAML_LOADER        = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)  # libyaml if available
+_YAML_LOAD_JOBS     = min(32, (os.cpu_count() or 1) * 4)    # threads to load YAML files
 _YAML_FILES         = []
 _YAML_DATA          = {}
+_YAML_SIGS          = {}        # YAML file: fingerprint when loaded, see yml_tree_load()
 _YAML_VARS          = {}
 _YAML_TARGETS       = {}
 _YAML_APPS          = {}
 _YAML_LIBS          = {}
+_YAML_DISABLED      = set()     # libraries/applications disabled by Kconfig option, and targets left with nothing to do
+
+# zmake metadata, saved in project path
+
+_ZMAKE_META_PATH    = '.zmake'          # metadata directory
+_ZMAKE_MANIFEST     = 'manifest.json'   # fingerprint manifest of last generation
+_ZMAKE_SCAN_CACHE   = 'scan.json'       # persistent source scan cache
+_ZMAKE_SCAN_FORMAT  = 1                 # format version of source scan cache
+_ZMAKE_YAML_CACHE   = 'yaml.cache'      # binary cache of parsed YAML files
+_ZMAKE_YAML_FORMAT  = 1                 # format version of YAML cache
+_ZMAKE_RACY_NS      = 2000000000        # fingerprints of paths modified within this time are NOT saved
+_ZMAKE_CMD_PATH     = 'cmd'             # command signatures of objects for make, <module>/<object>.cmd
+_ZMAKE_BUILD_LOG    = 'build_log.json'  # commands and timings of direct build
+_ZMAKE_BUILD_FORMAT = 1                 # format version of build log
+_ZMAKE_NINJA_LOG    = '.ninja_log'      # build log of ninja, in project path
+_ZMAKE_MODEL        = 'model.json'      # libraries/applications and their objects, for report
+_ZMAKE_UNITY_PATH   = 'unity'           # unity build units, <module>/zmake_unity_<n>.c, in project path
+_ZMAKE_UNITY_NAME   = 'zmake_unity_%d'  # file name of unity build unit without extension
+_ZMAKE_UNITY_TYPES  = ("c", "cpp")      # source types could be batched into unity build units
+_ZMAKE_COST_PER_BYTE = 0.01             # estimated compile time in ms per byte of source, if no timings
+_ZMAKE_SRC_PATHS    = {}                # source paths(files/directories) scanned, and their fingerprints
+
+# shared object store, see obj_store_assign()
+
+_ZMAKE_STORE_FORMAT     = 2             # format version of store entries, part of keys
+_ZMAKE_STORE_OBJS       = 'objs'        # entries of libraries, <library>-<key>/, include objects, archive
+                                        # and Kconfig header with symbols referenced by the library
+_ZMAKE_STORE_HDR_EXTS   = ('.h', '.hh', '.hpp', '.hxx', '.inc', '.inl')  # headers scanned for Kconfig symbols
+_ZMAKE_STORE_INC_OPTS   = ('-I', '-iquote', '-isystem', '-idirafter')   # options of include directories
+_ZMAKE_STORE_INC_FILES  = ('-include', '-imacros')                      # options of included files
+_ZMAKE_STORE_SYMBOL     = re.compile(rb'CONFIG_([A-Za-z0-9_]+)')        # Kconfig symbols, as zmake_fixdep.py
+_ZMAKE_STORE_DEFINE     = re.compile(r'^#define CONFIG_([A-Za-z0-9_]+)\b')
+_ZMAKE_STORE_FILES      = {}            # files scanned for Kconfig symbols, and their fingerprints
+_ZMAKE_STORE_PROJECTS   = 'projects'    # records of projects using the store, <hash of project path>.json
+_ZMAKE_STORE_LOCK       = '.lock'       # lock file, shared to add records and exclusive to collect garbage
 
 # Kconfig
 
 _KCONFIG_DEFCONFIG      = ''
 _KCONFIG_CONFIG_PATH    = "config"
 _KCONFIG_HDR            = 'config.h'
+_KCONFIG_DEPS           = 'deps'        # one file for each symbol, for fine-grained dependencies
 _KCONFIG_CONFIG         = 'prj.config'
-_KCONFIG_MODULE_OPTIONS = []    # CONFIG_XXX for modules
+_KCONFIG_MODULE_OPTIONS = None  # set, XXX of CONFIG_XXX=y, None if NOT yet parsed
 
 # zmake variables
 
 _VARS           = {}
 _VAR_SRC_PATH   = {'name': 'SRC_PATH', }
 
+_ZMAKE_VAR_UNRESOLVED   = object()      # value of ZMake variable that is NOT yet resolved
+_ZMAKE_VAR_TOKEN        = re.compile(r'\$\(|\)')        # start or end of reference
+_ZMAKE_VAR_SPACE        = re.compile(r'\s')             # reference with spaces is NOT for ZMake variable
+_ZMAKE_VAR_NINJA_REF    = re.compile(r"\(([^()]+)\)")   # '$(xxx)' to '$xxx' for ninja
+_ZMAKE_VAR_SHELL_REF    = re.compile(r"\$\((\w+)\)")     # '$(xxx)' to '${xxx}' for direct build
+
 # source file types
 
 _ZMAKE_SRC_TYPE_C   = "c"
 _ZMAKE_SRC_TYPE_CPP = "cpp"
 _ZMAKE_SRC_TYPE_ASM = "asm"
-_ZMAKE_SRC_TYPES    = {"c": "*.c", "cpp": "*.cpp", "asm": "*.[sS]"}
+_ZMAKE_SRC_EXTS     = {".c": "c", ".cpp": "cpp", ".s": "asm", ".S": "asm"}
+_ZMAKE_FLAGS_VARS   = {"c": "MOD_CFLAGS", "cpp": "MOD_CPPFLAGS", "asm": "MOD_ASMFLAGS"}  # module scoped variables
+_ZMAKE_SCAN_JOBS    = min(32, (os.cpu_count() or 1) * 4)  # threads to scan source directories
 
 # ZMake entity types
 
@@ -74,7 +146,15 @@ _ZMAKE_ENT_TYPE_TGT = "target"
 _ZMAKE_ENT_TYPE_APP = "app"
 _ZMAKE_ENT_TYPE_LIB = "lib"
 _ZMAKE_ENT_TYPE_OBJ = "obj"
-_ZMAKE_ENT_TYPES = ("var", "target", "app", "lib", "obj")
+_ZMAKE_ENT_TYPE_POOL = "pool"
+_ZMAKE_ENT_TYPES = ("var", "target", "app", "lib", "obj", "pool")
+
+# steps that could be limited by ZMake pools
+
+_ZMAKE_POOL_STEP_ARCHIVE    = "archive"     # packaging of libraries
+_ZMAKE_POOL_STEP_LINK       = "link"        # linking of applications
+_ZMAKE_POOL_STEPS           = ("archive", "link")
+_ZMAKE_POOL_PATH            = 'pool'        # lock files of pools for make, in metadata directory
 
 # Excpetion Class
 
@@ -82,6 +162,90 @@ class _zmake_exception(Exception):
     def __init__(self, message):
         self.message = message
 
+# lazy pretty formatter for debug logging, only formatted when the record is emitted
+
+class _pformat(object):
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        return pprint.pformat(self.obj)
+
+# Generator writer
+
+_ZMAKE_UMASK = os.umask(0o022)      # umask of process, read once since it could only be read by setting it
+os.umask(_ZMAKE_UMASK)
+
+class _zmake_writer(object):
+    """ZMake generator writer
+        path:   string, path of the generated file
+
+        contents are built into a buffer and written to file once when
+        closed; the file is only rewritten if its contents change, and is
+        written through a temporary file and renamed, so that an interrupted
+        generation never leaves a half-written file. It could be used as
+        context manager, and nothing is written if an exception is raised.
+    """
+
+    def __init__(self, path):
+        self.path   = path
+        self._buf   = []
+        self.write  = self._buf.append
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type == None:
+            self.close()
+
+    def getvalue(self):
+        return ''.join(self._buf)
+
+    def _mode(self):
+        """
+        internal function, get mode of file as if it were written by open():
+        mode of existing file is kept, and new file follows umask
+        """
+        try:
+            return os.stat(self.path).st_mode & 0o7777
+        except OSError:
+            return 0o666 & ~_ZMAKE_UMASK
+
+    def close(self) -> bool:
+        """
+        write buffered contents to file if changed
+            return: bool, True if file is written
+        """
+        if self._buf != [] and isinstance(self._buf[0], bytes):
+            content = b''.join(self._buf)
+        else:
+            content = self.getvalue().encode('utf-8')
+        self._buf.clear()
+
+        try:
+            if os.path.getsize(self.path) == len(content):
+                with open(self.path, 'rb') as fd:
+                    if fd.read() == content:
+                        _LOGGER.info("%s is unchanged", self.path)
+                        return False
+        except OSError:
+            pass
+
+        _LOGGER.info("write %s", self.path)
+        dir = os.path.dirname(self.path)
+        tmp_fd, tmp_path = tempfile.mkstemp(dir = dir, prefix = '.' + os.path.basename(self.path))
+        try:
+            with os.fdopen(tmp_fd, 'wb') as fd:
+                fd.write(content)
+            os.chmod(tmp_path, self._mode())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        return True
+
 # ZMake Entity classes
 
 class zmake_entity(object):
@@ -93,28 +257,38 @@ class zmake_entity(object):
 
     def __new__(cls, name, type, desc= ""):
         if not isinstance(name, str):
-            raise _zmake_exception("'name' MUST be str for ZMake Entity" %str(name))
+            raise _zmake_exception("'name'(%s) MUST be str for ZMake Entity" %str(name))
 
         if type not in _ZMAKE_ENT_TYPES:
-            raise _zmake_exception("invalid type for ZMake Entity(%s)" %(str(type), name))
+            raise _zmake_exception("invalid type %s for ZMake Entity(%s)" %(str(type), name))
 
         if not isinstance(desc, str):
-            raise _zmake_exception("'desc' MUST be str for ZMake Entity(%s)" %(str(name), name))
+            raise _zmake_exception("'desc'(%s) MUST be str for ZMake Entity(%s)" %(str(desc), name))
 
         return super(zmake_entity, cls).__new__(cls)
 
     def __str__(self):
         return '[ZMake Entity: %s Type: %s description: %s]' %(self.name, self.type, self.desc)
 
+class _zmake_var_pending(Exception):
+    """raised when an unresolved ZMake variable is referenced during expansion"""
+    def __init__(self, var):
+        self.var = var
+
 class zmake_var(zmake_entity):
     """ZMake variable
         name: string, the name of the entity
         desc: string, optional, the description of the entity
-        val:  string that could include references to other variable'
-        that have beed defined, such as '$(var_name)', or any value
+        val:  string that could include references to other variables,
+        such as '$(var_name)', or any value
+
+        Values are resolved lazily on first use and memoized, so variables
+        could reference ones defined later or in other YAML files.
     """
 
-    _vars = {}
+    _vars       = {}
+    _tokens     = {}    # string: tokens
+    _expanded   = {}    # string: dereferenced string, cleared when any variable is defined
 
     def __new__(cls, name, val, desc = ""):
         if val == None:
@@ -125,15 +299,53 @@ class zmake_var(zmake_entity):
     def __init__(self, name, val, desc = ""):
         self.name       = name
         self.desc       = desc
+        self._expr      = val
 
         if not isinstance(val, str):
-            self.val    = val
+            self._val   = val
         else:
-            self.val    = zmake_var.dereference(val)
+            self._val   = _ZMAKE_VAR_UNRESOLVED
+
+        _LOGGER.debug("create ZMake variable %s", name)
+        _LOGGER.debug("\tdesc = %s val = %s", desc, str(val))
+        if zmake_var._vars.setdefault(name, self) is self:
+            zmake_var._expanded.clear()
+
+    @property
+    def val(self):
+        """
+        value of ZMake variable, resolved on first use
+        """
+        if self._val is _ZMAKE_VAR_UNRESOLVED:
+            zmake_var._resolve(self)
 
-        logging.debug("create ZMake variable %s", name)
-        logging.debug("\tdesc = %s val = %s", desc, str(self.val))
-        zmake_var._vars.setdefault(name, self)
+        return self._val
+
+    @staticmethod
+    def _resolve(var):
+        """
+        internal function, resolve specified ZMake variable and all variables
+        it depends on, without recursion, so that long chains of references
+        are supported
+            var:    ZMake variable object
+        """
+
+        stack = [var]
+        while stack != []:
+            top = stack[-1]
+            try:
+                top._val = zmake_var._expand(zmake_var._tokenize(top._expr))
+            except _zmake_var_pending as e:
+                if e.var in stack:
+                    chain = [v.name for v in stack[stack.index(e.var):]] + [e.var.name]
+                    raise _zmake_exception("circular reference for ZMake variable: %s"
+                        %' -> '.join(chain))
+
+                stack.append(e.var)
+                continue
+
+            _LOGGER.debug("resolve ZMake variable %s = %s", top.name, top._val)
+            stack.pop()
 
     @staticmethod
     def _find(name):
@@ -149,54 +361,198 @@ class zmake_var(zmake_entity):
             return None
 
     @staticmethod
-    def _is_reference(var_expr):
+    def _tokenize(expr: str):
         """
-        internal functions, check whether a string is a reference
-        to ZMake variable object
-            var_expr:   string
-            return:     ZMake variable name,
-            or None if not a reference string to ZMake variable object
+        internal function, split a string into tokens, the result is cached
+        for each distinct string
+            expr:   string, a string including reference strings to ZMake
+            variable objects, references could be nested, such as '$(A_$(B))'
+            return: tuple, tokens, each of which is either a literal string,
+            or a tuple of tokens for the name of the variable referenced
         """
 
-        reg_var = re.compile('\$\((\S*)\)')
-        temp = reg_var.search(var_expr)
-        if temp != None:
-            var_name = temp.group(1)
-            return var_name
-        else:
-            return None
+        tokens = zmake_var._tokens.get(expr)
+        if tokens != None:
+            return tokens
+
+        stack   = [[]]  # tokens of the string and each unclosed reference
+        starts  = []    # start positions of unclosed references
+        pos     = 0
+        for match in _ZMAKE_VAR_TOKEN.finditer(expr):
+            if match.group() == ')' and starts == []:
+                continue    # not the end of a reference
+
+            if match.start() > pos:
+                stack[-1].append(expr[pos:match.start()])
+            pos = match.end()
+
+            if match.group() == '$(':
+                stack.append([])
+                starts.append(match.start())
+            else:
+                ref = tuple(stack.pop())
+                starts.pop()
+                stack[-1].append(ref)
+
+        if starts != []:
+            # unclosed references are literal strings
+            del stack[1:]
+            pos = starts[0]
+
+        if pos < len(expr):
+            stack[0].append(expr[pos:])
+
+        tokens = tuple(stack[0])
+        zmake_var._tokens[expr] = tokens
+        return tokens
+
+    @staticmethod
+    def _expand(tokens, strict = True):
+        """
+        internal function, expand tokens created by zmake_var._tokenize()
+            strict: bool, raise exception for references to undefined ZMake
+            variables, otherwise they are kept literal
+            return: string, in which references have been replaced with
+                value of ZMake variable object
+        """
+
+        fragments = []
+        for token in tokens:
+            if isinstance(token, str):
+                fragments.append(token)
+                continue
+
+            var_name = zmake_var._expand(token, strict)
+            if _ZMAKE_VAR_SPACE.search(var_name) != None:
+                # not a reference to ZMake variable object, such as '$(shell xxx)'
+                fragments.append('$(' + var_name + ')')
+                continue
+
+            var = zmake_var._find(var_name)
+            if var == None and not strict:
+                # make or environment variable, such as '$(EXTRA_CFLAGS)'
+                fragments.append('$(' + var_name + ')')
+            elif var == None:
+                raise _zmake_exception("ZMake variable %s is NOT defined" %var_name)
+            elif var._val is _ZMAKE_VAR_UNRESOLVED:
+                raise _zmake_var_pending(var)
+            else:
+                fragments.append(str(var._val))
+
+        return ''.join(fragments)
 
     @staticmethod
-    def dereference(expr: str):
+    def dereference(expr: str, strict = True):
         """
         dereference a string including some reference strings to ZMake
         variable objects, and replace reference strings to value of ZMake
-        variable object.
+        variable object, the result is cached until any variable is defined.
             expr:   string, a string including reference strings to ZMake
             variable objects
+            strict: bool, raise exception for references to undefined ZMake
+            variables, otherwise they are kept literal, such as references to
+            make or environment variables in compiler flags
             return: string, in which reference strings have been replaced with
                 value of ZMake variable object
         """
 
-        pattern = r'(\$\(.*?\))'
-        fragments = re.split(pattern, expr)
-        for idx in range(len(fragments)):
-            var_name = zmake_var._is_reference(fragments[idx])
-            if var_name == None:
-                continue    # not a reference string, so need to replace
+        key = expr if strict else (expr, False)
+        val = zmake_var._expanded.get(key)
+        while val == None:
+            try:
+                val = zmake_var._expand(zmake_var._tokenize(expr), strict)
+            except _zmake_var_pending as e:
+                zmake_var._resolve(e.var)
+                continue
 
-            var = zmake_var._find(var_name)
-            if var == None:
-                raise _zmake_exception("%s could NOT be referenced before defined" %var_name)
+            zmake_var._expanded[key] = val
+
+        return val
+
+    @staticmethod
+    def _format(tokens, ref_format, deps):
+        """
+        internal function, format tokens created by zmake_var._tokenize() for
+        build generator without resolving values, references to ZMake variables
+        are kept and formatted by ref_format, nested references are resolved.
+            ref_format: string, format of reference, such as '$(%s)'
+            deps:       list, names of ZMake variables referenced are appended
+            return:     string
+        """
+
+        fragments = []
+        for token in tokens:
+            if isinstance(token, str):
+                fragments.append(token)
+                continue
+
+            if len(token) == 1 and isinstance(token[0], str):
+                var_name = token[0]
+            elif len(token) == 0:
+                var_name = ''
             else:
-                fragments[idx]  = var.val
+                var_name = zmake_var.dereference(zmake_var._format(token, '$(%s)', []))
+
+            if _ZMAKE_VAR_SPACE.search(var_name) != None:
+                fragments.append('$(' + zmake_var._format(token, ref_format, deps) + ')')
+                continue
+
+            if zmake_var._find(var_name) == None:
+                raise _zmake_exception("ZMake variable %s is NOT defined" %var_name)
+
+            deps.append(var_name)
+            fragments.append(ref_format %var_name)
 
         return ''.join(fragments)
 
+    @staticmethod
+    def _sorted(ref_format):
+        """
+        internal function, check dependency graph of all ZMake variables,
+        and sort them so that every variable follows the ones it references
+            ref_format: string, format of reference, such as '$(%s)'
+            return:     list, (ZMake variable object, formatted value)
+        """
+
+        graph = {}
+        for name, var in zmake_var._vars.items():
+            deps = []
+            if isinstance(var._expr, str):
+                expr = zmake_var._format(zmake_var._tokenize(var._expr), ref_format, deps)
+            else:
+                expr = str(var._expr)
+            graph[name] = (var, expr, deps)
+
+        found   = []
+        state   = {}    # name: 1 - visiting, 2 - visited
+        for name in graph:
+            if name in state:
+                continue
+
+            stack = [(name, iter(graph[name][2]))]
+            state[name] = 1
+            while stack != []:
+                top, deps = stack[-1]
+                dep = next(deps, None)
+                if dep == None:
+                    state[top] = 2
+                    found.append(graph[top][:2])
+                    stack.pop()
+                elif state.get(dep) == 1:
+                    chain = [item[0] for item in stack]
+                    chain = chain[chain.index(dep):] + [dep]
+                    raise _zmake_exception("circular reference for ZMake variable: %s"
+                        %' -> '.join(chain))
+                elif dep not in state:
+                    state[dep] = 1
+                    stack.append((dep, iter(graph[dep][2])))
+
+        return found
+
     @staticmethod
     def reference_format(expr: str):
         if _PRJ_GEN == _PRJ_GEN_TYPE_NINJA:
-            return re.sub(r"\(([^()]+)\)", r"\1", expr)
+            return _ZMAKE_VAR_NINJA_REF.sub(r"\1", expr)
         else:
             return expr
 
@@ -205,85 +561,315 @@ class zmake_var(zmake_entity):
         """
         generate makefile segments for all ZMake variables and write fo file
         """
-        for key, val in zmake_var._vars.items():
-            logging.debug("generate variable %s", key)
-            fd.write("%s\t= %s\n" %(key, str(val.val)))
+        for var, expr in zmake_var._sorted('$(%s)'):
+            _LOGGER.debug("generate variable %s", var.name)
+            fd.write("%s\t= %s\n" %(var.name, expr))
 
         fd.write("\n")
-        fd.flush()
 
     @staticmethod
     def all_ninja_gen(fd):
         """
         generate ninja segments for all ZMake variables and write fo file
         """
-        for key, val in zmake_var._vars.items():
-            logging.debug("generate variable %s", key)
-            fd.write("%s = %s\n" %(key, str(val.val)))
+        for var, expr in zmake_var._sorted('${%s}'):
+            _LOGGER.debug("generate variable %s", var.name)
+            fd.write("%s = %s\n" %(var.name, expr))
 
         fd.write("\n")
-        fd.flush()
 
 class _zmake_obj(zmake_entity):
     """ZMake Object
-        name:   string, full source path including file name('*.c', '*.cpp', '*.s' or '*.S')
-        type:   string, one of `c`, `cpp` and `asm`
-        desc:   string, ignored
-        flags:  string, compiler flags
+        name:       string, full source path including file name('*.c', '*.cpp', '*.s' or '*.S')
+        desc:       string, ignored
+        flags:      string, compiler flags
+        libname:    string, name of the module
+        type:       string, one of `c`, `cpp` and `asm`
+        file_flags: string, compiler flags only for this file, included in 'flags'
     """
 
-    def __new__(cls, name, desc = "", flags = '', libname = ''):
+    def __new__(cls, name, desc = "", flags = '', libname = '', type = _ZMAKE_SRC_TYPE_C, file_flags = ''):
             return super(_zmake_obj, cls).__new__(cls, name, _ZMAKE_ENT_TYPE_OBJ, desc)
 
-    def __init__(self, name, desc = "", flags = '', libname = ''):
+    def __init__(self, name, desc = "", flags = '', libname = '', type = _ZMAKE_SRC_TYPE_C, file_flags = ''):
         self.name   = name
+        self.type   = type
         self.flags  = '-I$(PRJ_PATH)/config ' + flags
-        logging.debug("create ZMake Object %s", name)
+        self.file_flags = zmake_var.reference_format(file_flags)
+        _LOGGER.debug("create ZMake Object %s", name)
 
-        self._obj_dir   = os.path.join('$(PRJ_PATH)/objs', libname)
-        self._obj_name  = os.path.join(self._obj_dir,
-            os.path.splitext(os.path.basename(name))[0] + '.o')
-        self._dep_name  = os.path.splitext(self._obj_name)[0] + '.d'
+        self._src_path  = zmake_var.dereference(self.name)      # for timings of previous build
+        self._raw_flags = flags     # for key of shared object store, resolved only if enabled
+        self.priority   = 0     # length of critical path from this object in ms, see critical_path_compute()
+        self.unity      = []    # source paths included, for unity build unit
+        self.obj_dir_set(os.path.join('$(PRJ_PATH)/objs', libname))
 
         self.name       = zmake_var.reference_format(self.name)
         self.flags      = zmake_var.reference_format(self.flags)
-        self._obj_dir   = zmake_var.reference_format(self._obj_dir)
-        self._obj_name  = zmake_var.reference_format(self._obj_name)
-        self._dep_name  = zmake_var.reference_format(self._dep_name)
-        logging.debug("\tname = %s", self.name)
-        logging.debug("\tflags = %s", self.flags)
-        logging.debug("\t_obj_dir = %s", self._obj_dir)
-        logging.debug("\t_obj_name = %s", self._obj_name)
-        logging.debug("\t_dep_name = %s", self._dep_name)
-
-    def make_gen(self, fd, mod_name, added_flags):
-        """
-        generate makefile segments for specified ZMake objects with module name and write fo file
-        """
-
-        logging.debug("generate object %s", self.name)
-        fd.write("%s: %s\n" %(self._obj_name, self.name))
-        fd.write("\t$(Q)$(if $(QUIET), echo '<%s>': Compiling %s to %s)\n"
-                %(mod_name, os.path.basename(self.name), (os.path.basename(self._obj_name))))
-        fd.write("\t$(Q)mkdir -p$(VERBOSE) %s\n" %self._obj_dir)
-        fd.write("\t$(Q)$(CC) %s %s -c $< -o $@\n" %(added_flags, self.flags))
-        fd.write("\n")
+        _LOGGER.debug("\tname = %s", self.name)
+        _LOGGER.debug("\tflags = %s", self.flags)
+        _LOGGER.debug("\t_obj_dir = %s", self._obj_dir)
+        _LOGGER.debug("\t_obj_name = %s", self._obj_name)
+        _LOGGER.debug("\t_dep_name = %s", self._dep_name)
+
+    def obj_dir_set(self, obj_dir):
+        """
+        place object and its dependency file in specified directory
+            obj_dir:    string, directory that could include references to ZMake variables
+        """
+        obj_name        = os.path.join(obj_dir, os.path.splitext(os.path.basename(self._src_path))[0] + '.o')
+        self._obj_path  = zmake_var.dereference(obj_name)
+        self._obj_dir   = zmake_var.reference_format(obj_dir)
+        self._obj_name  = zmake_var.reference_format(obj_name)
+        self._dep_name  = zmake_var.reference_format(os.path.splitext(obj_name)[0] + '.d')
+
+    def make_gen(self, fd):
+        """
+        generate makefile segments for specified ZMake objects and write fo file,
+        only compiler flags for this file are written as target-specific
+        variable, the recipe is shared by static pattern rule of the module,
+        see _zmake_module.make_file_gen()
+            return: bool, True if target-specific variable is written
+        """
+
+        _LOGGER.debug("generate object %s", self.name)
+        if self.file_flags.strip() == "":
+            return False
+
+        fd.write("%s: private FILE_FLAGS = %s\n" %(self._obj_name, self.file_flags.strip()))
+        return True
 
-    def ninja_gen(self, fd, mod_name, added_flags):
+    def ninja_gen(self, fd, rule = "rule_cc", sig = ""):
         """
-        generate ninja segments for specified ZMake objects with module name and write fo file
+        generate ninja segments for specified ZMake objects and write fo file,
+        compiler flags for all files of the module are referenced by module
+        scoped variable, see _zmake_module.ninja_file_gen()
+            rule:   string, compile rule, 'rule_cc_store' for shared object store
+            sig:    string, signature of compile command for shared object store
         """
 
-        logging.debug("generate object %s", self.name)
-        fd.write("build %s: rule_mkdir\n" %self._obj_dir)
-        fd.write("build %s: rule_cc %s | %s\n" %(self._obj_name, self.name, self._obj_dir))
-        fd.write("    DEP = %s\n" %self._dep_name)
-        fd.write("    FLAGS = %s %s\n" %(added_flags, self.flags))
-        fd.write("    MOD = %s\n" %mod_name)
-        fd.write("    SRC = %s\n" %os.path.basename(self.name))
-        fd.write("    OBJ = %s\n" %os.path.basename(self._obj_name))
+        _LOGGER.debug("generate object %s", self.name)
+        fd.write("build %s: %s %s || %s\n"
+            "    DEP = %s\n"
+            "    FLAGS = $%s %s\n"
+            "    SRC = %s\n"
+            "    OBJ = %s\n"
+            %(self._obj_name, rule, self.name, self._obj_dir, self._dep_name,
+            _ZMAKE_FLAGS_VARS[self.type], self.file_flags,
+            os.path.basename(self.name), os.path.basename(self._obj_name)))
+        if sig != "":
+            fd.write("    SIG = %s\n" %sig)
         fd.write("\n")
 
+class _zmake_scanner(object):
+    """ZMake source scanner
+        scan directories by os.scandir, classify source files by extension
+        in a single pass, and memoize results per directory, so that
+        directories shared by several modules are scanned once
+    """
+
+    _dirs   = {}    # directory: (source files [(path, type)], subdirectories)
+    _stats  = {}    # directory: [mtime in ns, inode]
+    _cache  = {}    # directory: [mtime in ns, inode, [[name, type]], [subdirectory name]]
+    _hits   = 0
+    _lock   = threading.Lock()
+
+    @staticmethod
+    def _cache_find(path, st):
+        """
+        internal function, find result of specified directory from persistent
+        cache, it is valid only if mtime and inode of the directory are unchanged
+            return: tuple like scan_dir(), or None if not found
+        """
+        cached = _zmake_scanner._cache.get(path)
+        if cached == None or cached[0] != st.st_mtime_ns or cached[1] != st.st_ino:
+            return None
+
+        srcs    = [(os.path.join(path, name), type) for name, type in cached[2]]
+        subdirs = [os.path.join(path, name) for name in cached[3]]
+        _zmake_scanner._hits += 1
+        return (srcs, subdirs)
+
+    @staticmethod
+    def scan_dir(path):
+        """
+        scan specified directory without recursion
+            path:   string, directory path
+            return: tuple, (list of (source file path, type), list of subdirectories)
+        """
+        found = _zmake_scanner._dirs.get(path)
+        if found != None:
+            return found
+
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            _LOGGER.warning("failed to scan %s: %s", path, str(e))
+            return ([], [])
+
+        found = _zmake_scanner._cache_find(path, st)
+        if found != None:
+            with _zmake_scanner._lock:
+                _ZMAKE_SRC_PATHS[path] = [st.st_mtime_ns, st.st_size]
+                _zmake_scanner._stats[path] = [st.st_mtime_ns, st.st_ino]
+                return _zmake_scanner._dirs.setdefault(path, found)
+
+        srcs    = []
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key = lambda entry: entry.name)
+        except OSError as e:
+            _LOGGER.warning("failed to scan %s: %s", path, str(e))
+            entries = []
+
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                    continue
+            except OSError:
+                continue
+
+            type = _ZMAKE_SRC_EXTS.get(os.path.splitext(entry.name)[1])
+            if type != None:
+                srcs.append((entry.path, type))
+
+        with _zmake_scanner._lock:
+            _ZMAKE_SRC_PATHS[path] = [st.st_mtime_ns, st.st_size]
+            _zmake_scanner._stats[path] = [st.st_mtime_ns, st.st_ino]
+            return _zmake_scanner._dirs.setdefault(path, (srcs, subdirs))
+
+    @staticmethod
+    def _cache_checksum(dirs):
+        return hashlib.sha1(json.dumps(dirs, sort_keys = True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def cache_load(path):
+        """
+        load persistent source scan cache, stale or corrupt cache is ignored
+            path:   string, cache file path
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as fd:
+                cache = json.load(fd)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("source scan cache %s is corrupt(%s), ignored", path, str(e))
+            return
+
+        if (not isinstance(cache, dict) or not isinstance(cache.get('dirs'), dict)
+            or cache.get('checksum') != _zmake_scanner._cache_checksum(cache['dirs'])):
+            _LOGGER.warning("source scan cache %s is corrupt, ignored", path)
+            return
+
+        if (cache.get('format') != _ZMAKE_SCAN_FORMAT or cache.get('version') != ZMAKE_VER
+            or cache.get('src_tree') != _SRC_TREE):
+            _LOGGER.info("source scan cache %s is stale, ignored", path)
+            return
+
+        _LOGGER.info("load source scan cache %s", path)
+        _zmake_scanner._cache.update(cache['dirs'])
+
+    @staticmethod
+    def _cache_dirs():
+        """
+        internal function, results of all scanned directories in format of
+        persistent cache, directories modified in the last 2 seconds are
+        skipped since further changes in the same mtime tick could NOT be detected
+            return: dict, directory: [mtime in ns, inode, [[name, type]], [subdirectory name]]
+        """
+        dirs = {}
+        for dir, (srcs, subdirs) in _zmake_scanner._dirs.items():
+            mtime, ino = _zmake_scanner._stats[dir]
+            if sig_stable([mtime, ino]) == None:
+                continue
+
+            dirs[dir] = [mtime, ino,
+                [[os.path.basename(src), type] for src, type in srcs],
+                [os.path.basename(subdir) for subdir in subdirs]]
+
+        return dirs
+
+    @staticmethod
+    def reset():
+        """
+        forget directories scanned and fingerprints of source paths, so that
+        another project is scanned again; results are kept as cache which is
+        valid only if mtime and inode of the directory are unchanged
+        """
+        global _ZMAKE_SRC_PATHS
+
+        _zmake_scanner._cache.update(_zmake_scanner._cache_dirs())
+        _zmake_scanner._dirs    = {}
+        _zmake_scanner._stats   = {}
+        _zmake_scanner._hits    = 0
+        _ZMAKE_SRC_PATHS        = {}
+
+    @staticmethod
+    def cache_save(path):
+        """
+        save results of all scanned directories to persistent source scan cache,
+        see _cache_dirs()
+            path:   string, cache file path
+        """
+        _LOGGER.info("source scan cache: %d hits, %d directories",
+            _zmake_scanner._hits, len(_zmake_scanner._dirs))
+
+        dirs = _zmake_scanner._cache_dirs()
+        cache = {
+            'format':   _ZMAKE_SCAN_FORMAT,
+            'version':  ZMAKE_VER,
+            'src_tree': _SRC_TREE,
+            'checksum': _zmake_scanner._cache_checksum(dirs),
+            'dirs':     dirs,
+        }
+
+        create_dir(os.path.dirname(path))
+        file_update(path, json.dumps(cache, sort_keys = True))
+
+    @staticmethod
+    def prescan(paths):
+        """
+        scan specified directories and all their subdirectories concurrently,
+        level by level, results are memoized for _zmake_scanner.walk()
+            paths:  list, directories
+        """
+        pending = [path for path in dict.fromkeys(paths)
+            if path not in _zmake_scanner._dirs and os.path.isdir(path)]
+        if pending == []:
+            return
+
+        _LOGGER.info("scan %d source directories", len(pending))
+        with concurrent.futures.ThreadPoolExecutor(_ZMAKE_SCAN_JOBS) as pool:
+            while pending != []:
+                found = []
+                for srcs, subdirs in pool.map(_zmake_scanner.scan_dir, pending):
+                    found += subdirs
+
+                pending = [path for path in dict.fromkeys(found)
+                    if path not in _zmake_scanner._dirs]
+
+    @staticmethod
+    def walk(path):
+        """
+        find all source files in specified directory recursively, in top-down order
+            path:   string, directory path
+            return: dict, {source file path: type}
+        """
+        srcs  = {}
+        stack = [path]
+        while stack != []:
+            files, subdirs = _zmake_scanner.scan_dir(stack.pop())
+            for file, type in files:
+                srcs.setdefault(file, type)
+
+            stack += reversed(subdirs)
+
+        return srcs
+
 class _zmake_module(zmake_entity):
     """ZMake module - application/library
         name:       string, the name of the entity
@@ -303,34 +889,102 @@ class _zmake_module(zmake_entity):
             all:      xxx       # string, compiler flags for all assembly files
             xxx.s:    xxx       # string, compiler flags for xxx.s
             xxx.S:    xxx       # string, compiler flags for xxx.S
+        unity:      xxx         # int, optional, number of C/CPP files in each unity build unit,
+                                  0 to disable, '--unity' by default
+        unity_exclude:          # list, optional, files NOT batched into unity build units
+            - xxx.c
     """
 
-    def __new__(cls, name, type, src, desc = "", cflags = {}, cppflags = {}, asmflags = {}):
+    def __new__(cls, name, type, src, desc = "", cflags = {}, cppflags = {}, asmflags = {},
+        unity = None, unity_exclude = []):
         if type != _ZMAKE_ENT_TYPE_APP and type != _ZMAKE_ENT_TYPE_LIB:
             raise _zmake_exception("invalid type %s for ZMake module(%s)" %(type, name))
 
         if not isinstance(src, list):
             raise _zmake_exception("'src' (%s) MUST be list for ZMake module(%s)" %(str(src), name))
 
+        if unity != None and (not isinstance(unity, int) or isinstance(unity, bool) or unity < 0):
+            raise _zmake_exception("'unity' (%s) MUST be non-negative integer for ZMake module(%s)" %(str(unity), name))
+
+        if not isinstance(unity_exclude, list):
+            raise _zmake_exception("'unity_exclude' (%s) MUST be list for ZMake module(%s)" %(str(unity_exclude), name))
+
         return super(_zmake_module, cls).__new__(cls, name, type, desc)
 
-    def __init__(self, name, type, src, desc = "", cflags = {}, cppflags = {}, asmflags = {}):
+    def __init__(self, name, type, src, desc = "", cflags = {}, cppflags = {}, asmflags = {},
+        unity = None, unity_exclude = []):
         self.name   = name
         self.desc   = desc
         self.src    = {}
+        self.priority = 0   # length of critical path through this module in ms, see critical_path_compute()
+        self._unity = []    # ZMake objects of unity build units
+        self._unity_dir = os.path.join('$(PRJ_PATH)', _ZMAKE_UNITY_PATH, name)
+        self._obj_dir = zmake_var.reference_format(os.path.join('$(PRJ_PATH)/objs', name))
+        self._config_dir = '$(PRJ_PATH)/' + os.path.basename(_KCONFIG_CONFIG_PATH)  # directory of Kconfig header
+        self._store = ''    # entry of shared object store, empty if NOT in store, see store_set()
+        self._store_hdr = ''    # Kconfig header in entry of shared object store, see obj_store_assign()
+
+        flags = {
+            _ZMAKE_SRC_TYPE_C:      _zmake_module._check_flags(cflags),
+            _ZMAKE_SRC_TYPE_CPP:    _zmake_module._check_flags(cppflags),
+            _ZMAKE_SRC_TYPE_ASM:    _zmake_module._check_flags(asmflags),
+        }
+        self._flags = {}    # source type: compiler flags for all files of this type
+        for src_type, type_flags in flags.items():
+            self._flags[src_type] = zmake_var.reference_format(type_flags.get("all", ""))
 
         for path in src:
             final_path = zmake_var.dereference(path)
             srcs = _zmake_module.src_find(final_path)
             for file, type in srcs.items():
                 file_name = os.path.basename(file)
-                file_flags = _zmake_module._find_flags(file_name, type,
-                    cflags, cppflags, asmflags)
+                file_flags = _zmake_module._find_flags(file_name, flags[type])
+
+                if file.startswith(_SRC_TREE):
+                    file = "$(SRC_PATH)" + file[len(_SRC_TREE):]
 
-                reg_src_path = re.compile(_SRC_TREE)
                 self.src.setdefault(file_name,
-                    _zmake_obj(reg_src_path.sub("$(SRC_PATH)", file), type,
-                        flags = file_flags, libname = name))
+                    _zmake_obj(file, flags = flags[type].get("all", "") + " " + file_flags,
+                        libname = name, type = type, file_flags = file_flags))
+
+        if _PRJ_UNITY_OFF == 0:
+            self._unity_batch(_PRJ_UNITY if unity == None else unity, unity_exclude, flags)
+
+    def _unity_batch(self, size, exclude, flags):
+        """
+        internal function, replace objects of C/CPP files by unity build units,
+        each unit includes 'size' files of the same type; files with compiler
+        flags only for themselves or in 'exclude' are compiled separately
+            size:       int, number of files in each unit, 0 to disable
+            exclude:    list, file names NOT batched
+            flags:      dict, source type: compiler flags checked by _check_flags()
+        """
+        if size < 2:
+            return
+
+        batches = {}    # source type: [file name]
+        for file_name, obj in self.src.items():
+            if obj.type in _ZMAKE_UNITY_TYPES and obj.file_flags.strip() == "" and file_name not in exclude:
+                batches.setdefault(obj.type, []).append(file_name)
+
+        batched = set(file_name for files in batches.values() for file_name in files)
+        src = {file_name: obj for file_name, obj in self.src.items() if file_name not in batched}
+        for type, files in batches.items():
+            for i in range(0, len(files), size):
+                batch = files[i : i + size]
+                if len(batch) == 1:
+                    src[batch[0]] = self.src[batch[0]]
+                    continue
+
+                unit_name = _ZMAKE_UNITY_NAME %len(self._unity) + (".c" if type == _ZMAKE_SRC_TYPE_C else ".cpp")
+                unit = _zmake_obj(os.path.join(self._unity_dir, unit_name),
+                    flags = flags[type].get("all", ""), libname = self.name, type = type)
+                unit.unity = [self.src[file_name]._src_path for file_name in batch]
+                self._unity.append(unit)
+                src[unit_name] = unit
+
+        _LOGGER.debug("unity build units of %s: %d", self.name, len(self._unity))
+        self.src = src
 
     def objs(self):
         """
@@ -342,27 +996,226 @@ class _zmake_module(zmake_entity):
 
         return ' '.join(found)
 
-    def make_gen(self, fd, libname, added_flags):
+    def objs_ordered(self):
         """
-        generate makefile segments for all objects of this module and write fo file
+        find all objects of this module, objects on longer critical path first
+            return: list, ZMake objects
         """
-        
-        deps = ""
+        return sorted(self.src.values(), key = lambda obj: -obj.priority)
+
+    def make_gen(self, fd):
+        """
+        generate makefile segments for all objects of this module and write fo file,
+        objects are compiled by static pattern rules, one for each source
+        directory and extension
+        """
+        flags = False
         for key, obj in self.src.items():
-            deps += " " + obj._dep_name
-            obj.make_gen(fd, libname, added_flags)
+            flags = obj.make_gen(fd) or flags
+        if flags:
+            fd.write("\n")
+
+        groups = {}     # (source directory, extension): [object]
+        for obj in self.objs_ordered():
+            src_dir, file_name = os.path.split(obj.name)
+            groups.setdefault((src_dir, os.path.splitext(file_name)[1]), []).append(obj)
+
+        if self._store != '':
+            # the compile command is part of the key of store entry, so no
+            # command signature; objects shared with other projects are written
+            # through temporary files and renamed, so that concurrent builds
+            # never see a half-written object or dependency file
+            cmd_dir = None
+            recipe = ("\t$(Q)$(CC_CACHE) $(CC) $(%s_%s) $(FILE_FLAGS) -MD -MT $@ -MF $@.d.$$$$ -c $< -o $@.$$$$"
+                " && mv -f $@.d.$$$$ $(@:.o=.d) && mv -f $@.$$$$ $@ || { rm -f $@.$$$$ $@.d.$$$$; exit 1; }\n")
+        else:
+            cmd_dir = "$(PRJ_PATH)/%s/%s/%s" %(_ZMAKE_META_PATH, _ZMAKE_CMD_PATH, self.name)
+            recipe = "\t$(Q)$(CC_FIXDEP) $(CC_CACHE) $(CC) $(%s_%s) $(FILE_FLAGS) -c $< -o $@\n"
+
+        for (src_dir, ext), objs in groups.items():
+            fd.write("%s: %s/%%.o: %s/%%%s%s | %s\n"
+                "\t$(Q)$(if $(QUIET), echo '<%s>': Compiling $(<F) to $(@F))\n"
+                %(' '.join(obj._obj_name for obj in objs), self._obj_dir, src_dir, ext,
+                "" if cmd_dir == None else " %s/%%.cmd" %cmd_dir, self._obj_dir, self.name))
+            fd.write(recipe %(self.name, _ZMAKE_FLAGS_VARS[objs[0].type][len('MOD_'):]))
+            fd.write("\n")
 
-        fd.write("-include %s\n\n" %deps)
-        fd.flush()
+        if cmd_dir != None:
+            # missing command signature is regarded as changed
+            fd.write("%s/%%.cmd: ;\n\n" %cmd_dir)
 
-    def ninja_gen(self, fd, libname, added_flags):
+        fd.write("-include $(%s_OBJS:.o=.d)\n\n" %self.name)
+
+    def unity_gen(self):
         """
-        generate ninja segments for all objects of this module and write fo file
+        generate unity build units of this module, which include the batched
+        source files by absolute path; units are only rewritten when changed,
+        and units no longer used are removed
         """
-        for key, obj in self.src.items():
-            obj.ninja_gen(fd, libname, added_flags)
+        path = zmake_var.dereference(self._unity_dir)
+        if self._unity == []:
+            if os.path.isdir(path):
+                _LOGGER.info("remove %s", path)
+                shutil.rmtree(path, ignore_errors = True)
+            return
+
+        create_dir(path)
+
+        found = set()
+        written = 0
+        for unit in self._unity:
+            name = os.path.basename(unit._src_path)
+            found.add(name)
+            content = "/* Generated by Zmake %s */\n\n" %ZMAKE_VER
+            content += ''.join("#include \"%s\"\n" %src for src in unit.unity)
+            if file_update(unit._src_path, content):
+                written += 1
+
+        _LOGGER.info("generate %d unity build units of %s, %d written", len(found), self.name, written)
+
+        for file in os.listdir(path):
+            if file not in found:
+                _LOGGER.info("remove %s", os.path.join(path, file))
+                os.remove(os.path.join(path, file))
+
+    def store_set(self, entry):
+        """
+        place objects and unity build units of this module in specified entry
+        of shared object store
+            entry:  string, directory of store entry
+        """
+        self._store     = entry
+        self._obj_dir   = entry
+        self._unity_dir = os.path.join(entry, _ZMAKE_UNITY_PATH)
+        self._config_dir = os.path.join(entry, os.path.basename(_KCONFIG_CONFIG_PATH))
+        for obj in self.src.values():
+            if obj in self._unity:
+                obj._src_path = os.path.join(self._unity_dir, os.path.basename(obj._src_path))
+                obj.name = obj._src_path
+            obj.obj_dir_set(entry)
+
+    def make_prereqs(self):
+        """
+        objects as prerequisites for make, which are made in the listed order,
+        objects on longer critical path first
+        """
+        objs = ' '.join(obj._obj_name for obj in self.objs_ordered())
+        return "$(%s_OBJS)" %self.name if objs == self.objs() else objs
+
+    def make_file_gen(self, added_flags) -> bool:
+        """
+        generate makefile fragment of this module, which is included by Makefile,
+        compiler flags shared by all objects are defined once as variables
+        prefixed by the module name
+            added_flags:    string, compiler flags added for all objects
+            return:         bool, True if file is written
+        """
+        _LOGGER.debug("generate module %s", self.name)
+        fd = _zmake_writer(self.module_file_path())
+        fd.write("# Generated by Zmake %s\n\n" %ZMAKE_VER)
+        fd.write("# %s\n\n" %self.name)
+
+        fd.write("%s_OBJS = %s\n" %(self.name, self.objs()))
+        for type, var in _ZMAKE_FLAGS_VARS.items():
+            fd.write("%s_%s = %s\n" %(self.name, var[len('MOD_'):], self.make_flags(type, added_flags)))
+        fd.write("\n")
+
+        fd.write("%s:\n" %self._obj_dir)
+        fd.write("\t$(Q)mkdir -p$(VERBOSE) $@\n")
+        fd.write("\n")
+
+        self.unity_gen()
+        self.make_gen(fd)
+        self.make_target_gen(fd)
+        if self._store == '':
+            self.make_cmd_gen(added_flags)
+        return fd.close()
+
+    def make_flags(self, type, added_flags):
+        """
+        compiler flags shared by all objects of specified source type for make
+            type:           string, one of `c`, `cpp` and `asm`
+            added_flags:    string, compiler flags added for all objects
+        """
+        return "%s -I%s %s" %(added_flags, self._config_dir, self._flags[type])
+
+    def obj_cmd(self, obj, added_flags):
+        """
+        compile command of specified object without output, ZMake variables are NOT resolved
+            obj:            ZMake object of this module
+            added_flags:    string, compiler flags added for all objects
+        """
+        return "$(CC) %s %s -c %s" %(self.make_flags(obj.type, added_flags), obj.file_flags.strip(), obj.name)
+
+    def make_cmd_gen(self, added_flags):
+        """
+        generate command signature of each object of this module, which is
+        the compile command with all ZMake variables resolved; objects depend
+        on their signatures, and signatures are only rewritten when changed,
+        so that objects whose command lines changed are recompiled
+            added_flags:    string, compiler flags added for all objects
+        """
+        path = os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_CMD_PATH, self.name)
+        create_dir(path)
+
+        found = set()
+        written = 0
+        for obj in self.src.values():
+            name = os.path.splitext(os.path.basename(obj._obj_name))[0] + '.cmd'
+            found.add(name)
+            if file_update(os.path.join(path, name), zmake_var.dereference(self.obj_cmd(obj, added_flags) + "\n", False)):
+                written += 1
+
+        _LOGGER.info("generate %d command signatures of %s, %d written", len(found), self.name, written)
+
+        for file in os.listdir(path):
+            if file.endswith('.cmd') and file not in found:
+                _LOGGER.info("remove %s", os.path.join(path, file))
+                os.remove(os.path.join(path, file))
+
+    def ninja_gen(self, fd, added_flags):
+        """
+        generate ninja segments for all objects of this module and write fo file,
+        objects on longer critical path first, so that they are started first
+            added_flags:    string, compiler flags added for all objects
+        """
+        for obj in self.objs_ordered():
+            if self._store == '':
+                obj.ninja_gen(fd)
+            else:
+                obj.ninja_gen(fd, "rule_cc_store", store_sig(self.obj_cmd(obj, added_flags) + " -o " + obj._obj_path))
+
+    def module_file_path(self):
+        """
+        path of makefile fragment or ninja file of this module for current generator
+        """
+        return os.path.join(_PRJ_DIR, module_file_name(_PRJ_GEN, self.name))
+
+    def ninja_file_gen(self, added_flags) -> bool:
+        """
+        generate ninja file of this module, which is included by build.ninja
+        with 'subninja', so that compiler flags shared by all objects are
+        defined once as module scoped variables
+            added_flags:    string, compiler flags added for all objects
+            return:         bool, True if file is written
+        """
+        _LOGGER.debug("generate module %s", self.name)
+        fd = _zmake_writer(self.module_file_path())
+        fd.write("# Generated by Zmake %s\n\n" %ZMAKE_VER)
+        fd.write("# %s\n\n" %self.name)
+
+        fd.write("MOD = %s\n" %self.name)
+        for type, var in _ZMAKE_FLAGS_VARS.items():
+            fd.write("%s = %s -I%s %s\n" %(var, added_flags, zmake_var.reference_format(self._config_dir),
+                self._flags[type]))
+        fd.write("\n")
+
+        fd.write("build %s: rule_mkdir\n\n" %self._obj_dir)
+        self.unity_gen()
+        self.ninja_gen(fd, added_flags)
+        self.ninja_target_gen(fd)
+        return fd.close()
 
-        fd.flush()
 
     @staticmethod
     def src_find(path: str):
@@ -375,41 +1228,27 @@ class _zmake_module(zmake_entity):
         """
         #
 
+        _ZMAKE_SRC_PATHS[path] = src_sig(path)
         if not os.path.exists(path):
-            logging.warning("invalid path: %s", path)
+            _LOGGER.warning("invalid path: %s", path)
             return {}
 
-        srcs = {}
         if os.path.isfile(path):
-            for type, pattern in _ZMAKE_SRC_TYPES.items():
-                if fnmatch.fnmatch(path, pattern):
-                    srcs.setdefault(os.path.abspath(path), type)
-                    return srcs
+            type = _ZMAKE_SRC_EXTS.get(os.path.splitext(path)[1])
+            if type != None:
+                return {os.path.abspath(path): type}
 
         if os.path.isdir(path):
-            for base, subdirs, files in os.walk(path):
-                for type, pattern in _ZMAKE_SRC_TYPES.items():
-                    matches = fnmatch.filter(files, pattern)
-                    for src in matches:
-                        srcs.setdefault(os.path.join(base, src), type)
+            return _zmake_scanner.walk(path)
 
-        return srcs
+        return {}
 
     @staticmethod
-    def _find_flags(file_name, type, cflags, cppflags, asmflags) -> str:
+    def _check_flags(flags) -> dict:
         """
-        find flags for specified file and type
-            return: string, compiler flags
+        check compiler flags for one source type
+            return: dict, compiler flags for all files('all') and each file
         """
-        if type == _ZMAKE_SRC_TYPE_C:
-            flags = cflags
-        elif type == _ZMAKE_SRC_TYPE_CPP:
-            flags = cppflags
-        elif type == _ZMAKE_SRC_TYPE_ASM:
-            flags = asmflags
-        else:
-            raise _zmake_exception("invalid source type %s" %type)
-
         if not isinstance(flags, dict):
             if isinstance(flags, list):
                 if len(flags) == 1 and isinstance(flags[0], dict):
@@ -422,10 +1261,19 @@ class _zmake_module(zmake_entity):
         if not isinstance(flags.get("all", ""), str):
             raise _zmake_exception("compiler flags(%s) for 'all' MUST be string" %str(flags))
 
+        return flags
+
+    @staticmethod
+    def _find_flags(file_name, flags: dict) -> str:
+        """
+        find flags only for specified file
+            flags:  dict, compiler flags checked by _check_flags()
+            return: string, compiler flags
+        """
         if not isinstance(flags.get(file_name, ""), str):
             raise _zmake_exception("compiler flags(%s) for '%s' MUST be string" %(str(flags), file_name))
 
-        return flags.get("all", "") + " " + flags.get(file_name, "")
+        return flags.get(file_name, "")
 
 class zmake_lib(_zmake_module):
     """ZMake library
@@ -450,28 +1298,35 @@ class zmake_lib(_zmake_module):
 
     _libs = {}
 
-    def __new__(cls, name, src, desc = "", hdrdirs = [], cflags = {}, cppflags = {}, asmflags = {}):
+    def __new__(cls, name, src, desc = "", hdrdirs = [], cflags = {}, cppflags = {}, asmflags = {}, pool = "",
+        unity = None, unity_exclude = []):
         if not isinstance(hdrdirs, list):
-            raise _zmake_exception("'hdrdirs' MUST be list for ZMake library(%s)" %(str(hdrdirs), name))
+            raise _zmake_exception("'hdrdirs'(%s) MUST be list for ZMake library(%s)" %(str(hdrdirs), name))
 
         return super(zmake_lib, cls).__new__(cls,
-            name, _ZMAKE_ENT_TYPE_LIB, src, desc, cflags, cppflags, asmflags)
+            name, _ZMAKE_ENT_TYPE_LIB, src, desc, cflags, cppflags, asmflags, unity, unity_exclude)
 
-    def __init__(self, name, src, desc = "", hdrdirs = [], cflags = {}, cppflags = {}, asmflags = {}):
-        logging.debug("create ZMake library %s", name)
+    def __init__(self, name, src, desc = "", hdrdirs = [], cflags = {}, cppflags = {}, asmflags = {}, pool = "",
+        unity = None, unity_exclude = []):
+        _LOGGER.debug("create ZMake library %s", name)
         super(zmake_lib, self).__init__(name, _ZMAKE_ENT_TYPE_LIB,
-            src, desc, cflags, cppflags, asmflags)
+            src, desc, cflags, cppflags, asmflags, unity, unity_exclude)
+        self.pool = zmake_pool.module_find(name, pool, _ZMAKE_POOL_STEP_ARCHIVE)
 
-        logging.debug("ZMake library %s details:", name)
-        logging.debug("\tsrc(final) = %s", pprint.pformat(self.src))
+        _LOGGER.debug("ZMake library %s details:", name)
+        _LOGGER.debug("\tsrc(final) = %s", _pformat(self.src))
 
         self.hdrdirs = []
         for dir in hdrdirs:
             self.hdrdirs.append(zmake_var.reference_format(dir))
         self._lib_name = 'lib' + name + '.a'
+        self._lib_path = zmake_var.reference_format('$(PRJ_PATH)/libs/' + self._lib_name)
+        self._out_path = zmake_var.dereference('$(PRJ_PATH)/libs/' + self._lib_name)
 
-        logging.debug("\thdrdirs(final) = %s", pprint.pformat(self.hdrdirs))
-        logging.debug("\t_lib_name = %s", self._lib_name)
+        _LOGGER.debug("\thdrdirs(final) = %s", _pformat(self.hdrdirs))
+        _LOGGER.debug("\t_lib_name = %s", self._lib_name)
+        _LOGGER.debug("\t_lib_path = %s", self._lib_path)
+        _LOGGER.debug("\tpool = %s", self.pool)
         zmake_lib._libs.setdefault(name, self)
 
     @staticmethod
@@ -497,18 +1352,60 @@ class zmake_lib(_zmake_module):
         generate makefile segments for all libraries and write fo file
         """
         fd.write("# libraries\n\n")
+        fd.write("$(PRJ_PATH)/libs:\n")
+        fd.write("\t$(Q)mkdir -p$(VERBOSE) $@\n")
+        fd.write("\n")
 
         for name, lib in zmake_lib._libs.items():
-            logging.debug("generate library %s", name)
-            fd.write("# %s\n\n" %name)
-            lib.make_gen(fd, name, "")
+            fd.write("include $(PRJ_PATH)/%s\n" %module_file_name(_PRJ_GEN_TYPE_MAKE, name))
 
-            fd.write("%s: %s\n" %(name, lib.objs()))
-            fd.write("\t$(Q)$(if $(QUIET), echo '<%s>': Packaging)\n" %name)
-            fd.write("\t$(Q)mkdir -p$(VERBOSE) $(PRJ_PATH)/libs\n")
-            fd.write("\t$(Q)$(AR) crs$(VERBOSE) $(PRJ_PATH)/libs/%s $^\n" %lib._lib_name)
-            fd.write("\n")
-            fd.flush()
+        fd.write("\n")
+
+    def store_key(self, config):
+        """
+        key of entry in shared object store for this library, derived from
+        source paths, final compiler flags, toolchain and Kconfig header
+            config: string, hash of Kconfig header of this library, see obj_store_header()
+            return: string, hex digest
+        """
+        objs = []
+        for file_name, obj in sorted(self.src.items()):
+            objs.append([file_name, obj.type, zmake_var.dereference(obj._raw_flags), obj.unity or obj._src_path])
+
+        key = [_ZMAKE_STORE_FORMAT, ZMAKE_VER, self.name, config,
+            zmake_var.dereference("$(CC)"), zmake_var.dereference("$(AR)"), objs]
+        return hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+
+    def store_set(self, entry):
+        """
+        place objects, unity build units and archive of this library in
+        specified entry of shared object store
+            entry:  string, directory of store entry
+        """
+        super(zmake_lib, self).store_set(entry)
+        self._lib_path = os.path.join(entry, self._lib_name)
+        self._out_path = self._lib_path
+
+    def make_target_gen(self, fd):
+        """
+        generate makefile segments for this library and write fo file
+        """
+        _LOGGER.debug("generate library %s", self.name)
+        fd.write(".PHONY: %s\n" %self.name)
+        fd.write("%s: %s\n" %(self.name, self._lib_path))
+        fd.write("\n")
+        if self._store != '':
+            # archive shared with other projects is written through temporary file and renamed
+            fd.write("%s: %s | %s\n" %(self._lib_path, self.make_prereqs(), self._obj_dir))
+            fd.write("\t$(Q)$(if $(QUIET), echo '<%s>': Packaging)\n" %self.name)
+            fd.write("\t$(Q)rm -f $@.$$$$ && %s$(AR) crs$(VERBOSE) $@.$$$$ $(%s_OBJS) && mv -f $@.$$$$ $@"
+                " || { rm -f $@.$$$$; exit 1; }\n" %(zmake_pool.make_ref(self.pool), self.name))
+            return
+
+        fd.write("%s: %s | $(PRJ_PATH)/libs\n" %(self._lib_path, self.make_prereqs()))
+        fd.write("\t$(Q)$(if $(QUIET), echo '<%s>': Packaging)\n" %self.name)
+        fd.write("\t$(Q)rm -f $@\n")
+        fd.write("\t$(Q)%s$(AR) crs$(VERBOSE) $@ $(%s_OBJS)\n" %(zmake_pool.make_ref(self.pool), self.name))
 
     @staticmethod
     def all_ninja_gen(fd):
@@ -520,16 +1417,20 @@ class zmake_lib(_zmake_module):
         fd.write("build $PRJ_PATH/libs: rule_mkdir\n")
         fd.write("\n")
 
-        for name, lib in zmake_lib._libs.items():
-            logging.debug("generate library %s", name)
-            fd.write("# %s\n\n" %name)
-            lib.ninja_gen(fd, name, "")
-
-            fd.write("build %s: rule_ar %s | $PRJ_PATH/libs\n" %(name, lib.objs()))
-            fd.write("    LIB = %s\n" %lib._lib_name)
-            fd.write("    MOD = %s\n" %name)
-            fd.write("\n")
-            fd.flush()
+    def ninja_target_gen(self, fd):
+        """
+        generate ninja segments for this library and write fo file
+        """
+        _LOGGER.debug("generate library %s", self.name)
+        if self._store != '':
+            fd.write("build %s: rule_ar_store %s || %s\n" %(self._lib_path, self.objs(), self._obj_dir))
+            fd.write("    SIG = %s\n" %store_sig("$(AR) crs %s %s"
+                %(self._lib_path, ' '.join(obj._obj_path for obj in self.src.values()))))
+        else:
+            fd.write("build %s: rule_ar %s || $PRJ_PATH/libs\n" %(self._lib_path, self.objs()))
+        if self.pool != "":
+            fd.write("    pool = %s\n" %self.pool)
+        fd.write("build %s: phony %s\n" %(self.name, self._lib_path))
 
 class zmake_app(_zmake_module):
     """ZMake application
@@ -555,41 +1456,63 @@ class zmake_app(_zmake_module):
     """
 
     _apps = {}
-    def __new__(cls, name, src, desc = "", cflags = {}, cppflags = {}, asmflags = {}, linkflags = '', libs = []):
+    def __new__(cls, name, src, desc = "", cflags = {}, cppflags = {}, asmflags = {}, linkflags = '', libs = [], pool = "",
+        unity = None, unity_exclude = []):
         if not isinstance(linkflags, str):
-            raise _zmake_exception("'linkflags' MUST be string for ZMake application(%s)" %(str(linkflags), name))
+            raise _zmake_exception("'linkflags'(%s) MUST be string for ZMake application(%s)" %(str(linkflags), name))
 
         if not isinstance(libs, list):
-            raise _zmake_exception("'linkflags' MUST be string for ZMake application(%s)" %(str(linkflags), name))
+            raise _zmake_exception("'libs'(%s) MUST be list for ZMake application(%s)" %(str(libs), name))
 
         return super(zmake_app, cls).__new__(cls,
-            name, _ZMAKE_ENT_TYPE_APP, src, desc, cflags, cppflags, asmflags)
+            name, _ZMAKE_ENT_TYPE_APP, src, desc, cflags, cppflags, asmflags, unity, unity_exclude)
 
-    def __init__(self, name, src, desc = "", cflags = {}, cppflags = {}, asmflags = {}, linkflags = '', libs = []):
-        logging.debug("create ZMake application %s", name)
-        super(zmake_app, self).__init__(name, _ZMAKE_ENT_TYPE_APP, src, desc, cflags, cppflags, asmflags)
+    def __init__(self, name, src, desc = "", cflags = {}, cppflags = {}, asmflags = {}, linkflags = '', libs = [], pool = "",
+        unity = None, unity_exclude = []):
+        _LOGGER.debug("create ZMake application %s", name)
+        super(zmake_app, self).__init__(name, _ZMAKE_ENT_TYPE_APP, src, desc, cflags, cppflags, asmflags,
+            unity, unity_exclude)
         self.linkflags  = linkflags
+        self.pool       = zmake_pool.module_find(name, pool, _ZMAKE_POOL_STEP_LINK)
+        self._app_path  = zmake_var.reference_format('$(PRJ_PATH)/apps/' + name)
+        self._out_path  = zmake_var.dereference('$(PRJ_PATH)/apps/' + name)
+        self._libs      = []    # names of libraries depended
         self._lib_dep   = ""
         self._lib_ld    = ""
         self._lib_hdrs  = ""
-        logging.debug("ZMake application %s details:", name)
-        logging.debug("\tsrc(final) = %s", pprint.pformat(self.src))
+        _LOGGER.debug("ZMake application %s details:", name)
+        _LOGGER.debug("\tsrc(final) = %s", _pformat(self.src))
 
         for libname in libs:
             lib = zmake_lib.find(libname)
             if lib == None:
                 raise _zmake_exception("invalid library(%s) for ZMake application(%s)" %(str(libname), name))
             else:
-                self._lib_dep += " " + libname
-                self._lib_ld  += " -l" + libname
+                self._libs.append(libname)
                 for libhdr in lib.hdrdirs:
                     self._lib_hdrs += " -I" + zmake_var.reference_format(libhdr)
 
-        logging.debug("\t_lib_dep = %s", self._lib_dep)
-        logging.debug("\t_lib_ld = %s", self._lib_ld)
-        logging.debug("\t_lib_hdrs = %s", self._lib_hdrs)
+        self.libs_update()
+
+        _LOGGER.debug("\t_app_path = %s", self._app_path)
+        _LOGGER.debug("\t_lib_dep = %s", self._lib_dep)
+        _LOGGER.debug("\t_lib_ld = %s", self._lib_ld)
+        _LOGGER.debug("\t_lib_hdrs = %s", self._lib_hdrs)
+        _LOGGER.debug("\tpool = %s", self.pool)
         zmake_app._apps.setdefault(name, self)
 
+    def libs_update(self):
+        """
+        update archives depended and linker flags for libraries depended,
+        libraries in shared object store are linked by path of archive
+        """
+        self._lib_dep = ""
+        self._lib_ld  = ""
+        for libname in self._libs:
+            lib = zmake_lib.find(libname)
+            self._lib_dep += " " + lib._lib_path
+            self._lib_ld  += " -l" + libname if lib._store == '' else " " + lib._lib_path
+
     @staticmethod
     def find_apps() -> []:
         """
@@ -603,21 +1526,27 @@ class zmake_app(_zmake_module):
         generate makefile segments for all applications and write fo file
         """
         fd.write("# applications\n\n")
+        fd.write("$(PRJ_PATH)/apps:\n")
+        fd.write("\t$(Q)mkdir -p$(VERBOSE) $@\n")
+        fd.write("\n")
 
         for name, app in zmake_app._apps.items():
+            fd.write("include $(PRJ_PATH)/%s\n" %module_file_name(_PRJ_GEN_TYPE_MAKE, name))
 
-            logging.debug("generate application %s", name)
-            fd.write("# %s\n\n" %name)
-            app.make_gen(fd, name, app._lib_hdrs)
-
-            objs = app.objs()
-            fd.write("%s: %s %s\n" %(name, objs, app._lib_dep))
-            fd.write("\t$(Q)$(if $(QUIET), echo '<%s>': Linking)\n" %name)
-            fd.write("\t$(Q)mkdir -p$(VERBOSE) $(PRJ_PATH)/apps\n")
-            fd.write("\t$(Q)$(LD) -o $(PRJ_PATH)/apps/$@ %s %s -L$(PRJ_PATH)/libs %s\n"
-                %(objs, app.linkflags, app._lib_ld))
-            fd.write("\n")
-            fd.flush()
+        fd.write("\n")
+
+    def make_target_gen(self, fd):
+        """
+        generate makefile segments for this application and write fo file
+        """
+        _LOGGER.debug("generate application %s", self.name)
+        fd.write(".PHONY: %s\n" %self.name)
+        fd.write("%s: %s\n" %(self.name, self._app_path))
+        fd.write("\n")
+        fd.write("%s: %s %s | $(PRJ_PATH)/apps\n" %(self._app_path, self.make_prereqs(), self._lib_dep))
+        fd.write("\t$(Q)$(if $(QUIET), echo '<%s>': Linking)\n" %self.name)
+        fd.write("\t$(Q)%s$(LD) -o $@ $(%s_OBJS) %s -L$(PRJ_PATH)/libs %s\n"
+            %(zmake_pool.make_ref(self.pool), self.name, self.linkflags, self._lib_ld))
 
     @staticmethod
     def all_ninja_gen(fd):
@@ -628,17 +1557,17 @@ class zmake_app(_zmake_module):
         fd.write("build $PRJ_PATH/apps: rule_mkdir\n")
         fd.write("\n")
 
-        for name, app in zmake_app._apps.items():
-            logging.debug("generate application %s", name)
-            fd.write("# %s\n\n" %name)
-            app.ninja_gen(fd, name, app._lib_hdrs)
-
-            fd.write("build %s: rule_ld %s | $PRJ_PATH/apps %s\n"
-                %(name, app.objs(), app._lib_dep))
-            fd.write("    FLAGS = %s %s\n" %(app.linkflags, app._lib_ld))
-            fd.write("    MOD = %s\n" %name)
-            fd.write("\n")
-            fd.flush()
+    def ninja_target_gen(self, fd):
+        """
+        generate ninja segments for this application and write fo file
+        """
+        _LOGGER.debug("generate application %s", self.name)
+        fd.write("build %s: rule_ld %s |%s || $PRJ_PATH/apps\n"
+            %(self._app_path, self.objs(), self._lib_dep))
+        fd.write("    FLAGS = %s %s\n" %(self.linkflags, self._lib_ld))
+        if self.pool != "":
+            fd.write("    pool = %s\n" %self.pool)
+        fd.write("build %s: phony %s\n" %(self.name, self._app_path))
 
 class zmake_target(zmake_entity):
     """ZMake target
@@ -655,10 +1584,10 @@ class zmake_target(zmake_entity):
 
     def __new__(cls, name, desc = "", cmd = "", deps = []):
         if not isinstance(cmd, str):
-            raise _zmake_exception("'cmd' MUST be string for ZMake target(%s)" %(str(cmd), name))
+            raise _zmake_exception("'cmd'(%s) MUST be string for ZMake target(%s)" %(str(cmd), name))
 
         if not isinstance(deps, list):
-            raise _zmake_exception("'deps' MUST be list for ZMake target(%s)" %(str(deps), name))
+            raise _zmake_exception("'deps'(%s) MUST be list for ZMake target(%s)" %(str(deps), name))
 
         if cmd == "" and deps == []:
             raise _zmake_exception("'cmd' and 'deps' MUST NOT be absent at the same time for ZMake target(%s)" %name)
@@ -670,8 +1599,8 @@ class zmake_target(zmake_entity):
         self.desc   = desc
         self.cmd    = cmd
         self.deps   = deps
-        logging.debug("create ZMake target %s\n\tdesc = %s\n\tcmd = %s\n\tdeps = %s",
-            name, desc, pprint.pformat(cmd), pprint.pformat(deps))
+        _LOGGER.debug("create ZMake target %s\n\tdesc = %s\n\tcmd = %s\n\tdeps = %s",
+            name, desc, _pformat(cmd), _pformat(deps))
 
         self.cmd    = zmake_var.reference_format(self.cmd)
         zmake_target._targets.setdefault(name, self)
@@ -680,8 +1609,8 @@ class zmake_target(zmake_entity):
         """
         generate makefile segments for specified target and write fo file
         """
+        fd.write(".PHONY: %s\n" %self.name)
         if self.deps == []:
-            fd.write(".PHONY: %s\n" %self.name)
             fd.write("%s:\n" %self.name)
         else:
             fd.write("%s: %s\n" %(self.name, ' '.join(self.deps)))
@@ -730,7 +1659,6 @@ class zmake_target(zmake_entity):
         for name, target in zmake_target._targets.items():
             fd.write("# %s\n\n" %name)
             target.make_gen(fd)
-            fd.flush()
 
     @staticmethod
     def all_ninja_gen(fd):
@@ -744,33 +1672,162 @@ class zmake_target(zmake_entity):
             target.ninja_gen(fd)
 
         fd.write("default all\n\n")
-        fd.flush()
 
-def zmake_sys_var_create():
-    logging.info("create zmake system variables")
-    zmake_var("SRC_PATH", _SRC_TREE, "source code path")
-    zmake_var("PRJ_PATH", _PRJ_DIR, "project path")
-    zmake_var("KCONFIG_CONFIG", _PRJ_DIR, "Kconfig makefile output")
+class zmake_pool(zmake_entity):
+    """ZMake pool
+        name:   string, the name of the entity
+        desc:   string, optional, the description of the entity
+        depth:  int, maximum number of concurrent jobs in this pool
+        steps:  list, optional, steps limited by this pool by default,
+        'archive' for libraries and 'link' for applications
+            - xxx
 
-def zmake_sys_target_create():
-    logging.info("create zmake system targets")
+        Libraries and applications could override default pool by 'pool'.
+    """
 
-    config_cmd = "python3 $(SRC_PATH)/zmake.py -m $(SRC_PATH) $(PRJ_PATH)"
-    if _PRJ_GEN == _PRJ_GEN_TYPE_NINJA:
-        config_cmd += " -g ninja"
-    if _PRJ_VREB == 1:
-        config_cmd += " -V"
-    zmake_target("config",
-        desc = "configure project and generate header and mk",
-        cmd = config_cmd)
+    _pools = {}
+    _steps = {}     # step: default pool
+
+    def __new__(cls, name, depth, desc = "", steps = []):
+        if not isinstance(depth, int) or isinstance(depth, bool) or depth < 1:
+            raise _zmake_exception("'depth'(%s) MUST be positive integer for ZMake pool(%s)" %(str(depth), name))
+
+        if not isinstance(steps, list):
+            raise _zmake_exception("'steps'(%s) MUST be list for ZMake pool(%s)" %(str(steps), name))
+
+        for step in steps:
+            if step not in _ZMAKE_POOL_STEPS:
+                raise _zmake_exception("invalid step %s for ZMake pool(%s), MUST be one of %s"
+                    %(str(step), name, ', '.join(_ZMAKE_POOL_STEPS)))
+
+        return super(zmake_pool, cls).__new__(cls, name, _ZMAKE_ENT_TYPE_POOL, desc)
+
+    def __init__(self, name, depth, desc = "", steps = []):
+        self.name   = name
+        self.desc   = desc
+        self.depth  = depth
+        self.steps  = steps
+        _LOGGER.debug("create ZMake pool %s\n\tdesc = %s\n\tdepth = %d\n\tsteps = %s",
+            name, desc, depth, _pformat(steps))
+
+        for step in steps:
+            if zmake_pool._steps.setdefault(step, name) != name:
+                raise _zmake_exception("step %s is limited by both ZMake pool %s and %s"
+                    %(step, zmake_pool._steps[step], name))
+
+        zmake_pool._pools.setdefault(name, self)
+
+    @staticmethod
+    def find(name):
+        return zmake_pool._pools.get(name, None)
+
+    @staticmethod
+    def module_find(name, pool, step):
+        """
+        find pool of library/application
+            name:   string, name of library/application
+            pool:   string, pool specified by library/application, or empty for default pool
+            step:   string, step of library/application
+            return: string, name of pool, or empty if not limited
+        """
+        if not isinstance(pool, str):
+            raise _zmake_exception("'pool'(%s) MUST be string for ZMake module(%s)" %(str(pool), name))
+
+        if pool == "":
+            return zmake_pool._steps.get(step, "")
+
+        if zmake_pool.find(pool) == None:
+            raise _zmake_exception("invalid pool(%s) for ZMake module(%s)" %(pool, name))
+
+        return pool
+
+    @staticmethod
+    def make_ref(name):
+        """
+        reference to wrapper of specified pool for make recipe, see zmake_pool.py
+            return: string, empty if not limited
+        """
+        return "" if name == "" else "$(POOL_%s) " %name
+
+    @staticmethod
+    def all_make_gen(fd):
+        """
+        generate makefile segments for all pools and write fo file, jobs in
+        one pool are limited by lock files, since GNU make has no pools
+        """
+        if zmake_pool._pools == {}:
+            return
+
+        fd.write("# pools\n\n")
+        for name, pool in zmake_pool._pools.items():
+            fd.write("POOL_%s\t= python3 $(SRC_PATH)/zmake_pool.py --dir $(PRJ_PATH)/%s/%s/%s --depth %d --\n"
+                %(name, _ZMAKE_META_PATH, _ZMAKE_POOL_PATH, name, pool.depth))
+
+        fd.write("\n")
+
+    @staticmethod
+    def all_ninja_gen(fd):
+        """
+        generate ninja segments for all pools and write fo file
+        """
+        if zmake_pool._pools == {}:
+            return
+
+        fd.write("# pools\n\n")
+        for name, pool in zmake_pool._pools.items():
+            fd.write("pool %s\n" %name)
+            fd.write("    depth = %d\n" %pool.depth)
+
+        fd.write("\n")
+
+def zmake_sys_var_create():
+    _LOGGER.info("create zmake system variables")
+    zmake_var("SRC_PATH", _SRC_TREE, "source code path")
+    zmake_var("PRJ_PATH", _PRJ_DIR, "project path")
+    zmake_var("KCONFIG_CONFIG", _PRJ_DIR, "Kconfig makefile output")
+
+def zmake_sys_target_create():
+    _LOGGER.info("create zmake system targets")
+
+    config_cmd = "python3 $(SRC_PATH)/zmake.py -m $(SRC_PATH) $(PRJ_PATH)"
+    if _PRJ_GEN != _PRJ_GEN_TYPE_MAKE:
+        config_cmd += " -g %s" %_PRJ_GEN
+    if _PRJ_VREB == 1:
+        config_cmd += " -V"
+    if _PRJ_OBJ_CACHE != '':
+        config_cmd += " --obj-cache %s --obj-cache-size %d" %(_PRJ_OBJ_CACHE, _PRJ_OBJ_CACHE_SIZE)
+    if _PRJ_UNITY_OFF == 1:
+        config_cmd += " --no-unity"
+    elif _PRJ_UNITY != 0:
+        config_cmd += " --unity %d" %_PRJ_UNITY
+    if _PRJ_CONFIG_DEPS == 1:
+        config_cmd += " --config-deps"
+    if _PRJ_OBJ_STORE != '':
+        config_cmd += " --obj-store %s" %_PRJ_OBJ_STORE
+    zmake_target("config",
+        desc = "configure project and generate header and mk",
+        cmd = config_cmd)
 
     zmake_target("all", desc = "Build all applications and libraries",
-        deps = zmake_lib.find_libs() + zmake_app.find_apps())
+        deps = [module.name for module in modules_ordered()])
 
     zmake_target("clean",
         cmd = "rm -rf $(PRJ_PATH)/objs $(PRJ_PATH)/libs $(PRJ_PATH)/apps",
             desc = "Clean all generated files")
 
+def zmake_reset():
+    """
+    remove all ZMake entities, so that another project could be created from
+    loaded YAML files and scanned source directories
+    """
+    zmake_var._vars.clear()
+    zmake_var._expanded.clear()
+    zmake_lib._libs.clear()
+    zmake_app._apps.clear()
+    zmake_target._targets.clear()
+    zmake_pool._pools.clear()
+    zmake_pool._steps.clear()
+
 # basic functions
 
 def ver():
@@ -780,43 +1837,305 @@ def create_dir(path):
     if os.path.exists(path):
         return
 
-    logging.info("create %s", path)
-    os.makedirs(path)
+    _LOGGER.info("create %s", path)
+    os.makedirs(path, exist_ok = True)
+
+def path_sig(path):
+    """
+    get fingerprint of specified file or directory
+        return: list, [mtime in ns, size], or None if path does NOT exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return [st.st_mtime_ns, st.st_size]
+
+def sig_stable(sig):
+    """
+    get fingerprint that could be saved for later comparison: fingerprint of
+    path modified in the last 2 seconds is dropped, since further changes in
+    the same mtime tick could NOT be detected by it
+        sig:    fingerprint created by path_sig() or src_sig()
+        return: the fingerprint, or None if path was modified recently
+    """
+    if isinstance(sig, list) and sig[0] >= time.time_ns() - _ZMAKE_RACY_NS:
+        return None
+
+    return sig
+
+def src_sig(path):
+    """
+    get fingerprint of specified source path, for directory, the fingerprint
+    changes when entries are added or removed; for file, only its existence
+    matters, since the content of source file is irrelevant to generation
+        return: list for directory, 'file' for file, or None if path does NOT exist
+    """
+    if os.path.isfile(path):
+        return 'file'
+
+    return path_sig(path)
+
+def file_hash(path):
+    """
+    get content hash of specified file
+        return: string, hex digest, or None if file does NOT exist
+    """
+    try:
+        with open(path, 'rb') as fd:
+            return hashlib.sha1(fd.read()).hexdigest()
+    except OSError:
+        return None
+
+def file_update(path, content: str):
+    """
+    write content to specified file only when it is different from current
+    content of the file, so that mtime of unchanged file is kept
+        return: bool, True if file is written
+    """
+    fd = _zmake_writer(path)
+    fd.write(content)
+    return fd.close()
+
+# Manifest functions
+
+def manifest_path():
+    return os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_MANIFEST)
+
+def module_file_name(gen, name):
+    """
+    get path of makefile fragment or ninja file of specified module, relative
+    to project path
+        gen:    string, build generator
+        name:   string, name of library/application
+    """
+    path, ext = _PRJ_MODULE_FILES[gen]
+    return os.path.join(path, name + ext)
+
+def obj_cache_cmd(ref_format):
+    """
+    get compile wrapper of object cache, see zmake_cache.py
+        ref_format: string, format of reference, such as '$(%s)'
+        return:     string, empty if object cache is disabled
+    """
+    if _PRJ_OBJ_CACHE == '':
+        return ''
+
+    return "python3 %s/zmake_cache.py --dir %s --max-size %d --" %(ref_format %'SRC_PATH',
+        _PRJ_OBJ_CACHE, _PRJ_OBJ_CACHE_SIZE)
+
+def fixdep_cmd(ref_format):
+    """
+    get compile wrapper of fine-grained Kconfig dependencies, see zmake_fixdep.py
+        ref_format: string, format of reference, such as '$(%s)'
+        return:     string, empty if fine-grained Kconfig dependencies are disabled
+    """
+    if _PRJ_CONFIG_DEPS == 0:
+        return ''
+
+    path = ref_format %'PRJ_PATH' + '/' + os.path.basename(_KCONFIG_CONFIG_PATH)
+    return "python3 %s/zmake_fixdep.py --dir %s/%s --header %s/%s --" %(ref_format %'SRC_PATH',
+        path, _KCONFIG_DEPS, path, os.path.basename(_KCONFIG_HDR))
+
+def manifest_output():
+    if _PRJ_GEN == _PRJ_GEN_TYPE_NINJA:
+        return os.path.join(_PRJ_DIR, "build.ninja")
+    else:
+        return os.path.join(_PRJ_DIR, "Makefile")
+
+def scan_cache_path():
+    return os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_SCAN_CACHE)
+
+def yaml_cache_path():
+    return os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_YAML_CACHE)
+
+def manifest_create():
+    """
+    create fingerprint manifest for current configuration, includes all
+    inputs that could affect generated files
+    """
+    return {
+        'version':      ZMAKE_VER,
+        'zmake':        path_sig(os.path.abspath(__file__)),
+        'generator':    _PRJ_GEN,
+        'verbose':      _PRJ_VREB,
+        'obj_cache':    [_PRJ_OBJ_CACHE, _PRJ_OBJ_CACHE_SIZE],
+        'unity':        [_PRJ_UNITY, _PRJ_UNITY_OFF],
+        'config_deps':  _PRJ_CONFIG_DEPS,
+        'obj_store':    _PRJ_OBJ_STORE,
+        'src_tree':     _SRC_TREE,
+        'config':       file_hash(_KCONFIG_CONFIG),
+        'output':       manifest_output(),
+        'yaml':         {path: sig_stable(path_sig(path)) for path in _YAML_FILES},
+        'srcs':         {path: sig_stable(sig) for path, sig in _ZMAKE_SRC_PATHS.items()},
+        'store_files':  {path: sig_stable(sig) for path, sig in _ZMAKE_STORE_FILES.items()},
+        'timings':      timings_sig(timings_load()),
+    }
+
+def manifest_check():
+    """
+    check whether generated files are up to date by fingerprint manifest
+    saved by last generation
+        return: bool, True if nothing relevant changed
+    """
+    path = manifest_path()
+    try:
+        with open(path, 'r', encoding='utf-8') as fd:
+            manifest = json.load(fd)
+    except (OSError, ValueError):
+        _LOGGER.info("no valid manifest %s", path)
+        return False
+
+    if not isinstance(manifest, dict):
+        return False
+
+    current = manifest_create()
+    for key in ('version', 'zmake', 'generator', 'verbose', 'obj_cache', 'unity', 'config_deps', 'obj_store',
+        'src_tree', 'output', 'timings'):
+        if manifest.get(key) != current[key]:
+            _LOGGER.info("manifest: %s changed", key)
+            return False
+
+    if manifest.get('config') != file_hash(_KCONFIG_CONFIG):
+        _LOGGER.info("manifest: %s changed", _KCONFIG_CONFIG)
+        return False
+
+    if not os.path.isfile(manifest['output']):
+        _LOGGER.info("manifest: %s NOT exist", manifest['output'])
+        return False
+
+    if _PRJ_OBJ_STORE != '' and not os.path.isfile(obj_store_record_path(_PRJ_OBJ_STORE)):
+        _LOGGER.info("manifest: record in %s NOT exist", _PRJ_OBJ_STORE)
+        return False
+
+    paths = manifest.get('store_files', {}) if _PRJ_OBJ_STORE != '' else {}
+    for path, sig in (paths.items() if isinstance(paths, dict) else []):
+        if path_sig(path) != sig:
+            # Kconfig symbols referenced by libraries in store may be changed
+            _LOGGER.info("manifest: %s changed", path)
+            return False
+
+    for key in ('yaml', 'srcs'):
+        paths = manifest.get(key)
+        if not isinstance(paths, dict) or paths == {}:
+            return False
+
+        for path, sig in paths.items():
+            if (src_sig(path) if key == 'srcs' else path_sig(path)) != sig:
+                _LOGGER.info("manifest: %s changed", path)
+                return False
+
+    return True
+
+def manifest_save():
+    path = manifest_path()
+    create_dir(os.path.dirname(path))
+    file_update(path, json.dumps(manifest_create(), indent = 1, sort_keys = True))
 
 # Kconfig functions
 
 def kconfig_init(defconfig):
+    """
+    initialize Kconfig paths of current project, it could be called again
+    for another project in the same process
+        defconfig:  string, defconfig file, or empty
+    """
     global _KCONFIG_DEFCONFIG
     global _KCONFIG_CONFIG_PATH
     global _KCONFIG_CONFIG
     global _KCONFIG_HDR
+    global _KCONFIG_MODULE_OPTIONS
 
-    logging.info("set srctree to %s", _SRC_TREE)
+    _LOGGER.info("set srctree to %s", _SRC_TREE)
     os.environ['srctree'] = _SRC_TREE
 
+    _KCONFIG_DEFCONFIG = ''
     if defconfig != '':
         if not os.path.exists(defconfig):
             raise _zmake_exception("%s is invalid path" %defconfig)
         else:
             _KCONFIG_DEFCONFIG = os.path.abspath(defconfig)
 
-    _KCONFIG_CONFIG_PATH = os.path.join(_PRJ_DIR, _KCONFIG_CONFIG_PATH)
-    logging.info("Create Kconfig output directory %s", _KCONFIG_CONFIG_PATH)
+    _KCONFIG_CONFIG_PATH = os.path.join(_PRJ_DIR, os.path.basename(_KCONFIG_CONFIG_PATH))
+    _LOGGER.info("Create Kconfig output directory %s", _KCONFIG_CONFIG_PATH)
     create_dir(_KCONFIG_CONFIG_PATH)
 
-    _KCONFIG_CONFIG = os.path.join(_KCONFIG_CONFIG_PATH, _KCONFIG_CONFIG)
-    _KCONFIG_HDR = os.path.join(_KCONFIG_CONFIG_PATH, _KCONFIG_HDR)
+    _KCONFIG_CONFIG = os.path.join(_KCONFIG_CONFIG_PATH, os.path.basename(_KCONFIG_CONFIG))
+    _KCONFIG_HDR = os.path.join(_KCONFIG_CONFIG_PATH, os.path.basename(_KCONFIG_HDR))
+    _KCONFIG_MODULE_OPTIONS = None
+
+def kconfig_load():
+    """
+    parse Kconfig scripts and load configuration in process, configuration
+    file is specified by KCONFIG_CONFIG
+        return: Kconfig object
+    """
+    try:
+        kconf = kconfiglib.Kconfig('Kconfig')
+        _LOGGER.info(kconf.load_config())
+    except (kconfiglib.KconfigError, OSError) as e:
+        raise _zmake_exception("failed to load Kconfig: %s" %str(e))
+
+    return kconf
+
+def kconfig_file_update(path, write):
+    """
+    write file by Kconfig object, and replace specified file only when its
+    contents change, so that mtime of unchanged file is kept
+        path:   string, file path
+        write:  function, write file to the path given
+        return: bool, True if file is written
+    """
+    tmp = path + '.tmp'
+    try:
+        write(tmp)
+        with open(tmp, 'r', encoding='utf-8') as fd:
+            content = fd.read()
+    except OSError as e:
+        raise _zmake_exception("failed to generate %s: %s" %(path, str(e)))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return file_update(path, content)
+
+def kconfig_write(kconf):
+    """
+    generate header file and configuration of project in process, and find
+    options enabled
+        kconf:  Kconfig object
+    """
+    global _KCONFIG_MODULE_OPTIONS
+
+    _LOGGER.info("generate %s and %s", _KCONFIG_HDR, _KCONFIG_CONFIG)
+    written = kconfig_file_update(_KCONFIG_HDR, kconf.write_autoconf)
+    written = kconfig_file_update(_KCONFIG_CONFIG,
+        lambda path: kconf.write_config(path, save_old = False)) or written
+    if not written:
+        _LOGGER.info("%s and %s are unchanged", _KCONFIG_HDR, _KCONFIG_CONFIG)
+
+    # same as 'CONFIG_XXX=y' in configuration file
+
+    _KCONFIG_MODULE_OPTIONS = set()
+    for name, sym in kconf.syms.items():
+        if sym.config_string == "%s%s=y\n" %(kconf.config_prefix, name):
+            _KCONFIG_MODULE_OPTIONS.add(name)
 
 def kconfig_gen():
     if _KCONFIG_DEFCONFIG == '':
         if 'KCONFIG_CONFIG' in os.environ:
-            logging.info("unset KCONFIG_CONFIG")
+            _LOGGER.info("unset KCONFIG_CONFIG")
             os.environ.pop('KCONFIG_CONFIG')
     else:
-        logging.info("set KCONFIG_CONFIG to %s", _KCONFIG_DEFCONFIG)
+        _LOGGER.info("set KCONFIG_CONFIG to %s", _KCONFIG_DEFCONFIG)
         os.environ['KCONFIG_CONFIG'] = _KCONFIG_DEFCONFIG
 
-    logging.info("generate %s and %s", _KCONFIG_HDR, _KCONFIG_CONFIG)
+    if kconfiglib != None:
+        kconfig_write(kconfig_load())
+        return
+
+    _LOGGER.info("generate %s and %s", _KCONFIG_HDR, _KCONFIG_CONFIG)
     ret = subprocess.run(['genconfig', '--header-path', _KCONFIG_HDR, '--config-out', _KCONFIG_CONFIG])
 
     if ret.returncode != 0:
@@ -827,16 +2146,27 @@ def kconfig_menu():
         raise _zmake_exception("menuconfig method could ONLY be used after project"
             " is created and %s is existed" %_KCONFIG_CONFIG)
 
-    logging.info("set KCONFIG_CONFIG to %s", _KCONFIG_CONFIG)
+    _LOGGER.info("set KCONFIG_CONFIG to %s", _KCONFIG_CONFIG)
     os.environ['KCONFIG_CONFIG'] = _KCONFIG_CONFIG
 
-    logging.info("Execute menuconfig")
+    _LOGGER.info("Execute menuconfig")
+    if kconfiglib != None:
+        import menuconfig
+
+        menuconfig.menuconfig(kconfig_load())
+
+        # edits are only kept if saved by menuconfig, so the saved configuration
+        # is loaded again, like genconfig does
+
+        kconfig_write(kconfig_load())
+        return
+
     ret = subprocess.run(['menuconfig'])
 
     if ret.returncode != 0:
         raise _zmake_exception("failed to run menuconfig")
 
-    logging.info("generate %s and %s", _KCONFIG_HDR, _KCONFIG_CONFIG)
+    _LOGGER.info("generate %s and %s", _KCONFIG_HDR, _KCONFIG_CONFIG)
     ret = subprocess.run(['genconfig', '--header-path', _KCONFIG_HDR, '--config-out', _KCONFIG_CONFIG])
 
     if ret.returncode != 0:
@@ -845,94 +2175,439 @@ def kconfig_menu():
 def kconfig_parse():
     global _KCONFIG_MODULE_OPTIONS
 
+    if _KCONFIG_MODULE_OPTIONS != None:
+        _LOGGER.info("%d options enabled by Kconfig", len(_KCONFIG_MODULE_OPTIONS))
+        return
+
     if not os.path.isfile(_KCONFIG_CONFIG):
         raise _zmake_exception("yaml load: %s NOT exist" %_KCONFIG_CONFIG)
 
-    pattern = re.compile('^CONFIG_(\S*)+=y')
-    logging.info("parse %s", _KCONFIG_CONFIG)
+    pattern = re.compile(r'^CONFIG_([A-Za-z0-9_]+)=y$')
+    _LOGGER.info("parse %s", _KCONFIG_CONFIG)
+    _KCONFIG_MODULE_OPTIONS = set()
     with open(_KCONFIG_CONFIG, 'r', encoding='utf-8') as file:
         for line in file:
             temp = pattern.search(line)
             if temp != None:
-                logging.debug(line)
-                _KCONFIG_MODULE_OPTIONS.append(temp.group(1))
+                _LOGGER.debug(line)
+                _KCONFIG_MODULE_OPTIONS.add(temp.group(1))
+
+def kconfig_deps_sync():
+    """
+    synchronize symbol files for fine-grained Kconfig dependencies: each
+    symbol in configuration of project has one file with its value, which
+    is only rewritten when the value changes; files of symbols no longer in
+    the configuration are emptied, so objects using them are rebuilt once
+    """
+    pattern = re.compile(r'^(?:CONFIG_([A-Za-z0-9_]+)=(.*)|# CONFIG_([A-Za-z0-9_]+) is not set)$')
+    values = {}
+    with open(_KCONFIG_CONFIG, 'r', encoding='utf-8') as file:
+        for line in file:
+            temp = pattern.match(line.rstrip('\n'))
+            if temp != None:
+                values[temp.group(1) or temp.group(3)] = temp.group(2) or ""
+
+    path = os.path.join(_KCONFIG_CONFIG_PATH, _KCONFIG_DEPS)
+    create_dir(path)
+    for name in os.listdir(path):
+        if not name.startswith('.'):    # temporary files of _zmake_writer
+            values.setdefault(name, "")
+
+    written = 0
+    for name, value in values.items():
+        if file_update(os.path.join(path, name), value):
+            written += 1
+
+    _LOGGER.info("synchronize %d symbol files, %d written", len(values), written)
 
 def kconfig_options_find(opt):
     return opt in _KCONFIG_MODULE_OPTIONS
 
 # Yaml functions
 
+class _zmake_yaml_cache(object):
+    """ZMake YAML cache
+        parsed data of each YAML file is saved in binary format(marshal),
+        keyed by path, mtime and size, so that unchanged files are NOT parsed;
+        files modified in the last 2 seconds are NOT saved, see sig_stable()
+    """
+
+    _files  = {}    # path: [mtime in ns, size, marshalled data]
+    _used   = {}    # path: [mtime in ns, size, marshalled data], for files loaded this time
+    _hits   = 0
+    _misses = 0
+    _lock   = threading.Lock()
+
+    @staticmethod
+    def load(path):
+        """
+        load YAML cache, stale or corrupt cache is ignored
+            path:   string, cache file path
+        """
+        try:
+            with open(path, 'rb') as fd:
+                cache = marshal.loads(fd.read())
+        except FileNotFoundError:
+            return
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            _LOGGER.warning("YAML cache %s is corrupt(%s), ignored", path, str(e))
+            return
+
+        if (not isinstance(cache, dict) or cache.get('format') != _ZMAKE_YAML_FORMAT
+            or cache.get('version') != ZMAKE_VER or cache.get('loader') != _YAML_LOADER.__name__
+            or not isinstance(cache.get('files'), dict)):
+            _LOGGER.info("YAML cache %s is stale, ignored", path)
+            return
+
+        _LOGGER.info("load YAML cache %s", path)
+        _zmake_yaml_cache._files = cache['files']
+
+    @staticmethod
+    def find(real_path, sig):
+        """
+        find parsed data of specified YAML file
+            real_path:  string, absolute path of YAML file
+            sig:        list, fingerprint of YAML file
+            return:     YAML data, or None if not found
+        """
+        cached = _zmake_yaml_cache._files.get(real_path)
+        if cached != None and cached[:2] == sig:
+            try:
+                data = marshal.loads(cached[2])
+            except (EOFError, ValueError, TypeError):
+                data = None
+
+            if data != None:
+                with _zmake_yaml_cache._lock:
+                    _zmake_yaml_cache._hits += 1
+                    _zmake_yaml_cache._used[real_path] = cached
+                return data
+
+        with _zmake_yaml_cache._lock:
+            _zmake_yaml_cache._misses += 1
+        return None
+
+    @staticmethod
+    def add(real_path, sig, data):
+        try:
+            cached = sig + [marshal.dumps(data)]
+        except ValueError:
+            _LOGGER.debug("%s could NOT be cached", real_path)    # such as timestamps
+            return
+
+        with _zmake_yaml_cache._lock:
+            _zmake_yaml_cache._used[real_path] = cached
+
+    @staticmethod
+    def save(path):
+        """
+        save YAML cache for files loaded this time
+            path:   string, cache file path
+        """
+        total = _zmake_yaml_cache._hits + _zmake_yaml_cache._misses
+        _LOGGER.debug("YAML cache: %d hits, %d misses, hit rate %.1f%%",
+            _zmake_yaml_cache._hits, _zmake_yaml_cache._misses,
+            100.0 * _zmake_yaml_cache._hits / total if total != 0 else 0)
+
+        # files modified recently may change again in the same mtime tick
+        files = {file: cached for file, cached in _zmake_yaml_cache._used.items()
+            if sig_stable(cached[:2]) != None}
+        if files == _zmake_yaml_cache._files:
+            return
+
+        cache = {
+            'format':   _ZMAKE_YAML_FORMAT,
+            'version':  ZMAKE_VER,
+            'loader':   _YAML_LOADER.__name__,
+            'files':    files,
+        }
+
+        create_dir(os.path.dirname(path))
+        fd = _zmake_writer(path)
+        fd.write(marshal.dumps(cache))
+        fd.close()
+
+def _yml_file_read(real_path):
+    """
+    internal function, read and parse one YAML file, or get parsed data from
+    YAML cache if the file is unchanged
+        real_path:  string, absolute path of YAML file
+        return:     dict, YAML data
+    """
+    if _PRJ_YAML_CACHE == 1:
+        sig  = path_sig(real_path)
+        data = _zmake_yaml_cache.find(real_path, sig)
+        if data != None:
+            _LOGGER.debug("load %s from YAML cache", real_path)
+            return data
+
+    _LOGGER.debug("load %s", real_path)
+    with open(real_path, 'r', encoding='utf-8') as fd:
+        data = yaml.load(fd.read(), Loader = _YAML_LOADER)
+
+    if data == None:
+        raise _zmake_exception("%s is empty" %real_path)
+
+    if not isinstance(data, dict):
+        raise _zmake_exception("%s MUST be a mapping of ZMake entities" %real_path)
+
+    includes = data.get('includes')
+    if includes == None:
+        data['includes'] = []
+    elif not isinstance(includes, list):
+        raise _zmake_exception("'includes' MUST be list in %s" %real_path)
+
+    if _PRJ_YAML_CACHE == 1:
+        _zmake_yaml_cache.add(real_path, sig, data)
+
+    return data
+
+def _yml_file_path(path):
+    real_path = os.path.abspath(os.path.join(_SRC_TREE, path))
+    if not os.path.isfile(real_path):
+        raise _zmake_exception("yaml load: %s NOT exist" %real_path)
+
+    return real_path
+
 def yml_file_load(path):
+    """
+    load specified YAML file and all files included by it: files are parsed
+    concurrently, and merged once in include order
+        path:   string, YAML file path relative to source tree
+    """
     global _YAML_FILES
     global _YAML_DATA
 
-    real_path = os.path.join(_SRC_TREE, path)
-    if not os.path.isfile(real_path):
-        raise _zmake_exception("yaml load: %s NOT exist" %real_path)
+    root    = _yml_file_path(path)
+    loaded  = {}    # real path: future of YAML data
+
+    with concurrent.futures.ThreadPoolExecutor(_YAML_LOAD_JOBS) as pool:
+        loaded[root] = pool.submit(_yml_file_read, root)
+        pending = {loaded[root]}
+        while pending:
+            done, pending = concurrent.futures.wait(pending,
+                return_when = concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for file in future.result()['includes']:
+                    real_path = _yml_file_path(file)
+                    if real_path not in loaded:
+                        loaded[real_path] = pool.submit(_yml_file_read, real_path)
+                        pending.add(loaded[real_path])
+
+    # merge in include order(depth-first)
+
+    origins = {}    # entity name: YAML file
+    visited = set()
+    stack   = [root]
+    while stack != []:
+        real_path = stack.pop()
+        if real_path in visited:
+            _LOGGER.warning("%s is included more than once, ignored", real_path)
+            continue
 
-    logging.debug("open %s", real_path)
-    fd = open(real_path, 'r', encoding='utf-8')
+        visited.add(real_path)
+        _YAML_FILES.append(real_path)
+        data = loaded[real_path].result()
+        for name, config in data.items():
+            if name == 'includes':
+                continue
 
-    logging.debug("load %s", real_path)
-    data = yaml.safe_load(fd.read())
-    if data == None:
-        raise _zmake_exception("%s is empty" %real_path)
+            if name in origins:
+                raise _zmake_exception("%s is defined in both %s and %s"
+                    %(name, origins[name], real_path))
 
-    fd.close()
-    _YAML_FILES += os.path.abspath(real_path)
-    _YAML_DATA  = {**_YAML_DATA, **data}
+            origins[name]       = real_path
+            _YAML_DATA[name]    = config
 
-    if 'includes' not in data:
-        return
+        stack += reversed([_yml_file_path(file) for file in data['includes']])
 
-    if data['includes'] == []:
-        return
+    _LOGGER.info("load %d YAML files", len(_YAML_FILES))
+
+def yml_tree_load():
+    """
+    load YAML files of source tree with caches of current project, unless
+    they are already loaded and none of them changed since, so that YAML files
+    are loaded once for several projects in the same process
+    """
+    global _YAML_FILES
+    global _YAML_DATA
+    global _YAML_SIGS
+
+    if _YAML_FILES != []:
+        if all(path_sig(path) == sig for path, sig in _YAML_SIGS.items()):
+            return
+
+        _LOGGER.info("YAML files changed, reload")
+        _YAML_FILES = []
+        _YAML_DATA  = {}
+
+    if _PRJ_SCAN_CACHE == 1:
+        _zmake_scanner.cache_load(scan_cache_path())
+
+    if _PRJ_YAML_CACHE == 1:
+        _zmake_yaml_cache.load(yaml_cache_path())
+
+    yml_file_load(_YAML_ROOT_FILE)
+    _YAML_SIGS = {path: sig_stable(path_sig(path)) for path in _YAML_FILES}
+
+    if _PRJ_YAML_CACHE == 1:
+        _zmake_yaml_cache.save(yaml_cache_path())
+
+def yml_module_enabled(name, config) -> bool:
+    """
+    check whether library/application is enabled by its Kconfig option('opt'),
+    it is always enabled if 'opt' is absent
+    """
+    opt = config.get("opt", None)
+    if opt == None:
+        return True
+
+    if not isinstance(opt, str) or not opt.startswith("CONFIG_"):
+        raise _zmake_exception("'opt'(%s) MUST be Kconfig option(CONFIG_XXX) for ZMake module(%s)"
+            %(str(opt), name))
+
+    return kconfig_options_find(opt[len("CONFIG_"):])
+
+def yml_module_filter():
+    """
+    find libraries/applications disabled by Kconfig options, so that they are
+    never scanned, created or generated, and targets left with nothing to do
+    """
+    global _YAML_DISABLED
+
+    _YAML_DISABLED = set()
+    for name, config in _YAML_DATA.items():
+        if config.get("type", "") not in (_ZMAKE_ENT_TYPE_LIB, _ZMAKE_ENT_TYPE_APP):
+            continue
+
+        if not yml_module_enabled(name, config):
+            _LOGGER.info("%s is disabled by %s", name, config["opt"])
+            _YAML_DISABLED.add(name)
+
+    # targets without 'cmd' whose dependencies are all disabled do nothing,
+    # they are dropped as well, repeated for targets depending on them
+
+    changed = True
+    while changed:
+        changed = False
+        for name, config in _YAML_DATA.items():
+            if config.get("type", "") != _ZMAKE_ENT_TYPE_TGT or name in _YAML_DISABLED:
+                continue
+
+            deps = config.get("deps", [])
+            if (config.get("cmd", "") == "" and isinstance(deps, list) and deps != []
+                and all(dep in _YAML_DISABLED for dep in deps)):
+                _LOGGER.info("%s is disabled since all its dependencies are disabled", name)
+                _YAML_DISABLED.add(name)
+                changed = True
+
+def yml_deps_prune(name, deps):
+    """
+    remove disabled libraries/applications/targets from dependencies of specified entity
+    """
+    if not isinstance(deps, list):
+        return deps     # reported when entity is created
+
+    found = []
+    for dep in deps:
+        if dep in _YAML_DISABLED:
+            _LOGGER.info("remove disabled %s from dependencies of %s", dep, name)
+        else:
+            found.append(dep)
+
+    return found
+
+def yml_src_prescan():
+    """
+    scan source directories of all libraries and applications concurrently
+    before ZMake modules are created
+    """
+    paths = []
+    for name, config in _YAML_DATA.items():
+        if config.get("type", "") not in (_ZMAKE_ENT_TYPE_LIB, _ZMAKE_ENT_TYPE_APP):
+            continue
+
+        if name in _YAML_DISABLED:
+            continue
+
+        src = config.get("src", [])
+        if not isinstance(src, list):
+            continue    # reported when module is created
+
+        for path in src:
+            try:
+                paths.append(zmake_var.dereference(path))
+            except _zmake_exception:
+                continue    # reported when module is created
+
+    _zmake_scanner.prescan(paths)
 
-    for file in data['includes']:
-        yml_file_load(file)
+def yml_vars_create():
+    """
+    create ZMake variables and pools from YAML files
+    """
+    for name, config in _YAML_DATA.items():
+        if config.get("type", "") == _ZMAKE_ENT_TYPE_VAR:
+            _LOGGER.debug("parse YAML object %s:\n%s", name, _pformat(config))
+            zmake_var(name, config.get("val", ""), config.get("desc", ""))
+        elif config.get("type", "") == _ZMAKE_ENT_TYPE_POOL:
+            _LOGGER.debug("parse YAML object %s:\n%s", name, _pformat(config))
+            zmake_pool(name, config.get("depth", None), config.get("desc", ""), config.get("steps", []))
 
 def yml_file_parse():
-    del _YAML_DATA['includes']
-    logging.info("parse YAML for ZMake objects")
+    _LOGGER.info("parse YAML for ZMake objects")
+
+    # variables are created firstly, so that source directories could be scanned concurrently
+
+    yml_vars_create()
+    yml_module_filter()
+    yml_src_prescan()
+
     for name, config in _YAML_DATA.items():
-        logging.debug("parse YAML object %s:\n%s", name, pprint.pformat(config))
         obj_type = config.get("type", "")
-        if obj_type == _ZMAKE_ENT_TYPE_VAR:
-            zmake_var(name, config.get("val", ""), config.get("desc", ""))
-        elif obj_type == _ZMAKE_ENT_TYPE_LIB:
-            zmake_lib(name, config.get("src", ""), config.get("desc", ""),
-                config.get("hdrdirs", ""), config.get("cflags", ""),
-                config.get("cppflags", ""), config.get("asmflags", ""))
+        if obj_type in (_ZMAKE_ENT_TYPE_VAR, _ZMAKE_ENT_TYPE_POOL) or name in _YAML_DISABLED:
+            continue
+
+        _LOGGER.debug("parse YAML object %s:\n%s", name, _pformat(config))
+        if obj_type == _ZMAKE_ENT_TYPE_LIB:
+            zmake_lib(name, config.get("src", []), config.get("desc", ""),
+                config.get("hdrdirs", []), config.get("cflags", {}),
+                config.get("cppflags", {}), config.get("asmflags", {}), config.get("pool", ""),
+                config.get("unity", None), config.get("unity_exclude", []))
         elif obj_type == _ZMAKE_ENT_TYPE_APP:
             zmake_app(name, config.get("src", []), config.get("desc", ""),
                 config.get("cflags", {}), config.get("cppflags", {}),
                 config.get("asmflags", {}), config.get("linkflags", ""),
-                config.get("libs", []))
+                yml_deps_prune(name, config.get("libs", [])), config.get("pool", ""),
+                config.get("unity", None), config.get("unity_exclude", []))
         elif obj_type == _ZMAKE_ENT_TYPE_TGT:
-            zmake_target(name, config.get("desc", ""), config.get("cmd", {}),
-                config.get("deps", {}))
+            zmake_target(name, config.get("desc", ""), config.get("cmd", ""),
+                yml_deps_prune(name, config.get("deps", [])))
         else:
-            logging.warning("invalid object type %s for YAML Object %s", obj_type, name)
+            _LOGGER.warning("invalid object type %s for YAML Object %s", obj_type, name)
             continue
 
-
 def make_gen():
     path = os.path.join(_PRJ_DIR, "Makefile")
-    logging.info("generate %s", path)
-    fd = open(path, 'w', encoding='utf-8')
+    _LOGGER.info("generate %s", path)
+    fd = _zmake_writer(path)
 
-    cur_time = time.asctime()
-    fd.write("# Generated by Zmake %s on %s\n\n" %(ZMAKE_VER, cur_time))
+    fd.write("# Generated by Zmake %s\n\n" %ZMAKE_VER)
 
     fd.write("default: all\n")
     fd.write("\n")
 
     fd.write("# variables\n")
     fd.write("\n")
-    fd.flush()
 
     zmake_var.all_make_gen(fd)
 
+    fd.write("CC_CACHE\t= %s\n" %obj_cache_cmd('$(%s)'))
+    fd.write("CC_FIXDEP\t= %s\n" %fixdep_cmd('$(%s)'))
+    fd.write("\n")
+
+    zmake_pool.all_make_gen(fd)
+
     fd.write("ifneq ($(V), )\n")
     fd.write("\tVREBOSE_BUILD = $(V)\n")
     fd.write("else\n")
@@ -950,64 +2625,1562 @@ def make_gen():
     fd.write("\tVERBOSE =\n")
     fd.write("endif\n")
     fd.write("\n")
-    fd.flush()
+
+    if _PRJ_CONFIG_DEPS == 1:
+        # missing symbol file is regarded as changed
+        fd.write("$(PRJ_PATH)/%s/%s/%%: ;\n\n" %(os.path.basename(_KCONFIG_CONFIG_PATH), _KCONFIG_DEPS))
+
+    modules_gen()
 
     zmake_lib.all_make_gen(fd)
     zmake_app.all_make_gen(fd)
     zmake_target.all_make_gen(fd)
 
-def ninja_gen():
-    path = os.path.join(_PRJ_DIR, "build.ninja")
-    logging.info("generate %s", path)
-    fd = open(path, 'w', encoding='utf-8')
+    fd.close()
 
-    cur_time = time.asctime()
-    fd.write("# Generated by Zmake %s on %s\n" %(ZMAKE_VER, cur_time))
-    fd.write("\n")
-    fd.flush()
+def modules_find():
+    """
+    find all libraries and applications
+        return: list, (module, compiler flags added for all objects)
+    """
+    modules = [(lib, "") for lib in zmake_lib._libs.values()]
+    modules += [(app, app._lib_hdrs) for app in zmake_app._apps.values()]
+    return modules
 
-    fd.write("# variables\n")
-    fd.write("\n")
-    fd.flush()
+def modules_ordered():
+    """
+    find all libraries and applications, modules on longer critical path first
+        return: list, modules
+    """
+    return sorted([module for module, flags in modules_find()], key = lambda module: -module.priority)
 
-    zmake_var.all_ninja_gen(fd)
+def modules_gen():
+    """
+    generate makefile fragments or ninja files of all libraries and
+    applications, and remove files of modules that no longer exist
+    """
+    modules = modules_find()
 
-    fd.write("# common rules\n")
-    fd.write("\n")
+    if _PRJ_GEN == _PRJ_GEN_TYPE_NINJA:
+        gen = lambda module: module[0].ninja_file_gen(module[1])
+    else:
+        gen = lambda module: module[0].make_file_gen(module[1])
 
-    fd.write("rule rule_cmd\n")
-    fd.write("    command = $CMD\n")
-    fd.write("    description = $DESC\n")
-    fd.write("\n")
+    path, ext = _PRJ_MODULE_FILES[_PRJ_GEN]
+    path = os.path.join(_PRJ_DIR, path)
+    create_dir(path)
 
-    fd.write("rule rule_mkdir\n")
+    cmd_path = os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_CMD_PATH)
+    if _PRJ_GEN == _PRJ_GEN_TYPE_MAKE:
+        create_dir(cmd_path)
+
+    # generated serially: generation is CPU-bound Python, which threads could
+    # NOT speed up, and variable resolution is cached already
+    written = [gen(module) for module in modules]
+
+    _LOGGER.info("generate %d module files, %d written", len(written), written.count(True))
+
+    found = set(module.name + ext for module, flags in modules)
+    for file in os.listdir(path):
+        if file.endswith(ext) and file not in found:
+            _LOGGER.info("remove %s", os.path.join(path, file))
+            os.remove(os.path.join(path, file))
+
+    # unity build units and command signatures of modules in shared object store are NOT in project
+
+    found = set(module.name for module, flags in modules if module._store == '')
+    dirs = [os.path.join(_PRJ_DIR, _ZMAKE_UNITY_PATH)]
+    if _PRJ_GEN == _PRJ_GEN_TYPE_MAKE:
+        dirs.append(cmd_path)
+
+    for dir in dirs:
+        if not os.path.isdir(dir):
+            continue
+
+        for name in os.listdir(dir):
+            if name not in found:
+                _LOGGER.info("remove %s", os.path.join(dir, name))
+                shutil.rmtree(os.path.join(dir, name), ignore_errors = True)
+
+def ninja_gen():
+    path = os.path.join(_PRJ_DIR, "build.ninja")
+    _LOGGER.info("generate %s", path)
+    fd = _zmake_writer(path)
+
+    fd.write("# Generated by Zmake %s\n" %ZMAKE_VER)
+    fd.write("\n")
+
+    fd.write("# variables\n")
+    fd.write("\n")
+
+    zmake_var.all_ninja_gen(fd)
+
+    fd.write("CC_CACHE = %s\n" %obj_cache_cmd('$%s'))
+    fd.write("CC_FIXDEP = %s\n" %fixdep_cmd('$%s'))
+    fd.write("\n")
+
+    zmake_pool.all_ninja_gen(fd)
+
+    modules_gen()
+
+    fd.write("# common rules\n")
+    fd.write("\n")
+
+    fd.write("rule rule_cmd\n")
+    fd.write("    command = $CMD\n")
+    fd.write("    description = $DESC\n")
+    fd.write("\n")
+
+    fd.write("rule rule_mkdir\n")
     fd.write("    command = mkdir -p $out\n")
     fd.write("    description = Creating $out\n")
+    fd.write("    restat = 1\n")
     fd.write("\n")
 
     fd.write("rule rule_cc\n")
     fd.write("    depfile = $DEP\n")
     fd.write("    deps = gcc\n")
-    fd.write("    command = $CC -MF $DEP -c $in -o $out $FLAGS\n")
+    fd.write("    command = $CC_FIXDEP $CC_CACHE $CC -MF $DEP -c $in -o $out $FLAGS\n")
     fd.write("    description = '<$MOD>': Compiling $SRC to $OBJ\n")
     fd.write("\n")
 
+    # archive is only replaced when its contents change(archivers are
+    # deterministic by default), so that 'restat' skips relinking
     fd.write("rule rule_ar\n")
-    fd.write("    command = $AR crs $PRJ_PATH/libs/$LIB $in\n")
+    fd.write("    restat = 1\n")
+    fd.write("    command = rm -f ${out}.tmp && $AR crs ${out}.tmp $in"
+        " && { cmp -s ${out}.tmp $out && rm -f ${out}.tmp || mv -f ${out}.tmp $out; }\n")
     fd.write("    description = '<$MOD>': Packaging\n")
     fd.write("\n")
 
+    if _PRJ_OBJ_STORE != '':
+        # objects and archives in shared object store: outputs built by other
+        # projects are NOT in ninja log of this project, so their commands are
+        # run once, and zmake_store.py skips outputs which are up to date and
+        # whose command signatures('<output>.sig') are unchanged, 'restat' keeps
+        # dependents up to date then; outputs are written through temporary
+        # files and renamed
+        check = "python3 $SRC_PATH/zmake_store.py --sig $SIG"
+        fd.write("rule rule_cc_store\n")
+        fd.write("    depfile = $DEP\n")
+        fd.write("    restat = 1\n")
+        fd.write("    command = %s --dep $DEP $out $in || { $CC_CACHE $CC -MD -MT $out -MF ${DEP}.$$$$ -c $in"
+            " -o ${out}.$$$$ $FLAGS && mv -f ${DEP}.$$$$ $DEP && mv -f ${out}.$$$$ $out"
+            " && echo $SIG > ${out}.sig.$$$$ && mv -f ${out}.sig.$$$$ ${out}.sig"
+            " || { rm -f ${out}.$$$$ ${DEP}.$$$$ ${out}.sig.$$$$; exit 1; }; }\n" %check)
+        fd.write("    description = '<$MOD>': Compiling $SRC to $OBJ\n")
+        fd.write("\n")
+
+        fd.write("rule rule_ar_store\n")
+        fd.write("    restat = 1\n")
+        fd.write("    command = %s $out $in || { rm -f ${out}.$$$$ && $AR crs ${out}.$$$$ $in && mv -f ${out}.$$$$ $out"
+            " && echo $SIG > ${out}.sig.$$$$ && mv -f ${out}.sig.$$$$ ${out}.sig"
+            " || { rm -f ${out}.$$$$ ${out}.sig.$$$$; exit 1; }; }\n" %check)
+        fd.write("    description = '<$MOD>': Packaging\n")
+        fd.write("\n")
+
     fd.write("rule rule_ld\n")
-    fd.write("    command = $LD -o $PRJ_PATH/apps/$out $in -L$PRJ_PATH/libs $FLAGS\n")
+    fd.write("    command = $LD -o $out $in -L$PRJ_PATH/libs $FLAGS\n")
     fd.write("    description = '<$MOD>': Linking\n")
     fd.write("\n")
-    fd.flush()
 
     zmake_lib.all_ninja_gen(fd)
     zmake_app.all_ninja_gen(fd)
+
+    # edges are created in the order of ninja files, modules on longer critical path first
+
+    fd.write("# modules\n\n")
+    for module in modules_ordered():
+        fd.write("subninja $PRJ_PATH/%s\n" %module_file_name(_PRJ_GEN_TYPE_NINJA, module.name))
+    fd.write("\n")
+
     zmake_target.all_ninja_gen(fd)
 
+    fd.close()
+
+# Critical path
+
+def timings_load():
+    """
+    load timings of previous build from ninja log and build log of direct build
+        return: dict, output path: duration in ms
+    """
+    timings = {}
+    for output, entry in build_log_load(build_log_path()).items():
+        if isinstance(entry, list) and len(entry) >= 3:
+            timings[output] = entry[2] - entry[1]
+
+    path = os.path.join(_PRJ_DIR, _ZMAKE_NINJA_LOG)
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as fd:
+            for line in fd:
+                fields = line.rstrip('\n').split('\t')
+                if line.startswith('#') or len(fields) < 5:
+                    continue
+
+                try:
+                    timings[fields[3]] = int(fields[1]) - int(fields[0])    # later entries override
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+
+    _LOGGER.info("load timings of %d outputs", len(timings))
+    return timings
+
+def timings_sig(timings):
+    """
+    get fingerprint of timings of previous build, so that build files are
+    generated again in the order of new timings; durations are rounded to
+    powers of 2, so that small variations between builds are ignored
+        timings:    dict, output path: duration in ms, see timings_load()
+        return:     string, hex digest
+    """
+    buckets = sorted([output, max(duration, 0).bit_length()] for output, duration in timings.items())
+    return hashlib.sha1(json.dumps(buckets).encode('utf-8')).hexdigest()
+
+def critical_path_compute():
+    """
+    compute critical path from each object to libraries and applications
+    with timings of previous build, objects without timings are estimated
+    by size of source file; results are saved in 'priority' of ZMake
+    objects and modules, so that longer chains are started first
+    """
+    timings = timings_load()
+
+    objs = [obj for module, flags in modules_find() for obj in module.src.values()]
+    sizes = {}
+    for obj in objs:
+        sizes[obj] = 0
+        for path in obj.unity or [obj._src_path]:
+            try:
+                sizes[obj] += os.path.getsize(path)
+            except OSError:
+                pass
+
+    known = [obj for obj in objs if obj._obj_path in timings]
+    known_size = sum(sizes[obj] for obj in known)
+    if known_size != 0:
+        cost = sum(timings[obj._obj_path] for obj in known) / known_size
+    else:
+        cost = _ZMAKE_COST_PER_BYTE
+
+    # applications are sinks, libraries lead to applications linked with them
+
+    users = {}  # library name: applications
+    for app in zmake_app._apps.values():
+        app.priority = timings.get(app._out_path, 0)
+        for lib in app._libs:
+            users.setdefault(lib, []).append(app.priority)
+
+    for lib in zmake_lib._libs.values():
+        lib.priority = timings.get(lib._out_path, 0) + max(users.get(lib.name, [0]))
+
+    for module, flags in modules_find():
+        path = module.priority
+        for obj in module.src.values():
+            obj.priority = timings.get(obj._obj_path, int(sizes[obj] * cost)) + path
+            module.priority = max(module.priority, obj.priority)
+
+    _LOGGER.info("critical path: %d ms, %d of %d objects with timings",
+        max([module.priority for module, flags in modules_find()] + [0]), len(known), len(objs))
+
+# Direct build
+
+class _zmake_job(object):
+    """ZMake build job
+        name:   string, output path, or name of phony job
+        cmd:    string, shell command with ZMake variables resolved, empty for phony job
+        desc:   string, description displayed when the job is executed
+        inputs: list, input files, such as source file of object
+        deps:   list, jobs depended
+        depfile: string, optional, dependency file written by compiler
+        mod:    string, optional, name of library/application
+        pool:   string, optional, name of ZMake pool that limits the job
+        priority: int, optional, jobs with higher priority are started first
+        shared: bool, optional, output is in shared object store and could be
+                built by other projects, so it is NOT required in build log
+    """
+
+    def __init__(self, name, cmd = "", desc = "", inputs = [], deps = [], depfile = None, mod = "", pool = "",
+        priority = 0, shared = False):
+        self.name       = name
+        self.cmd        = cmd
+        self.desc       = desc
+        self.inputs     = list(inputs)
+        self.deps       = list(deps)
+        self.depfile    = depfile
+        self.mod        = mod
+        self.pool       = pool
+        self.priority   = priority
+        self.shared     = shared
+        self.phony      = cmd == "" or not os.path.isabs(name)
+
+    def _dep_inputs(self):
+        """
+        internal function, find inputs from dependency file
+            return: list, or None if dependency file does NOT exist
+        """
+        try:
+            with open(self.depfile, 'r', encoding='utf-8') as fd:
+                content = fd.read()
+        except OSError:
+            return None
+
+        content = content.replace('\\\n', ' ')
+        inputs = []
+        for line in content.splitlines():
+            target, sep, deps = line.partition(': ')
+            if sep == '' or os.path.abspath(target.strip()) != self.name:
+                continue    # phony targets of '-MP'
+            inputs += deps.replace('\\ ', '\0').split()
+
+        return [input.replace('\0', ' ') for input in inputs]
+
+    def dirty(self, log):
+        """
+        check whether job need be executed
+            log:    dict, build log of last build, output: [command hash, start, end]
+            return: string, reason, or None if up to date
+        """
+        if self.phony:
+            return "phony" if self.cmd != "" else None
+
+        entry = log.get(self.name)
+        if (entry == None and not self.shared) or (entry != None and entry[0] != _zmake_job.cmd_hash(self.cmd)):
+            return "command changed"
+
+        mtime = path_sig(self.name)
+        if mtime == None:
+            return "output missing"
+
+        inputs = list(self.inputs)
+        if self.depfile != None:
+            inputs += self._dep_inputs() or []     # compiler may NOT write dependency file
+
+        for dep in self.deps:
+            if not dep.phony:
+                inputs.append(dep.name)
+
+        for input in inputs:
+            sig = path_sig(input)
+            if sig == None or sig[0] > mtime[0]:
+                return "%s changed" %input
+
+        return None
+
+    def run(self, log):
+        """
+        execute the job if it is NOT up to date
+            log:    dict, build log of last build
+            return: tuple, (executed, start time, end time, exit code, output)
+        """
+        reason = self.dirty(log)
+        if reason == None:
+            return (False, 0, 0, 0, b'')
+
+        _LOGGER.debug("build %s: %s", self.name, reason)
+        if not self.phony:
+            create_dir(os.path.dirname(self.name))
+
+        start = time.time()
+        ret = subprocess.run(self.cmd, shell = True, stdout = subprocess.PIPE, stderr = subprocess.STDOUT)
+        return (True, start, time.time(), ret.returncode, ret.stdout)
+
+    @staticmethod
+    def cmd_hash(cmd):
+        return hashlib.sha1(cmd.encode('utf-8')).hexdigest()
+
+class _zmake_builder(object):
+    """ZMake direct builder
+        execute jobs of ZMake objects, libraries, applications and targets
+        in memory without generated Makefile/build.ninja; jobs are executed
+        concurrently once the jobs they depend on are done, and skipped if
+        up to date by mtime, dependency files and commands in build log
+    """
+
+    def __init__(self, out = None):
+        self.jobs = {}  # name: job
+        self.out  = out if out != None else sys.stdout
+
+    def _write(self, text):
+        """
+        internal function, write build output, all output of builder is
+        written by this function from the thread scheduling jobs
+        """
+        self.out.write(text)
+        self.out.flush()
+
+    def _report(self, done, total, job, output):
+        """
+        internal function, report job executed and its output, command of job
+        is reported in verbose mode, otherwise its description
+        """
+        line = job.cmd if _PRJ_VREB == 1 else job.desc
+        if line != "":
+            self._write("[%d/%d] %s\n" %(done, total, line))
+        if output != b'':
+            self._write(output.decode('utf-8', 'replace'))
+
+    def _add(self, job):
+        return self.jobs.setdefault(job.name, job)
+
+    def graph_create(self):
+        """
+        create jobs for all ZMake objects, libraries, applications and targets
+        """
+        cc_cache = zmake_var.dereference(fixdep_cmd('$(%s)') + " " + obj_cache_cmd('$(%s)'))
+        for module, added_flags in modules_find():
+            module.unity_gen()
+            shared = module._store != ''
+            objs = []
+            for obj in module.src.values():
+                obj_name = zmake_var.dereference(obj._obj_name)
+                dep_name = os.path.splitext(obj_name)[0] + '.d'
+                cmd = zmake_var.dereference(module.obj_cmd(obj, added_flags))
+                if shared:
+                    # written through temporary files and renamed, see _zmake_module.make_gen()
+                    cmd = (zmake_var.dereference(obj_cache_cmd('$(%s)')) + " " + cmd
+                        + " -MD -MT %s -MF %s.$$ -o %s.$$ && mv -f %s.$$ %s && mv -f %s.$$ %s"
+                        " || { rm -f %s.$$ %s.$$; exit 1; }"
+                        %(obj_name, dep_name, obj_name, dep_name, dep_name, obj_name, obj_name, obj_name, dep_name))
+                else:
+                    cmd = cc_cache + " " + cmd + " -o " + obj_name
+                objs.append(self._add(_zmake_job(obj_name, cmd.strip(),
+                    "'<%s>': Compiling %s to %s" %(module.name, os.path.basename(obj.name), os.path.basename(obj_name)),
+                    [zmake_var.dereference(obj.name)], [], dep_name, module.name,
+                    priority = obj.priority, shared = shared)))
+
+            obj_names = ' '.join(job.name for job in objs)
+            if isinstance(module, zmake_lib):
+                out = zmake_var.dereference(module._lib_path)
+                if shared:
+                    cmd = zmake_var.dereference("rm -f %s.$$ && $(AR) crs %s.$$ %s && mv -f %s.$$ %s || { rm -f %s.$$; exit 1; }"
+                        %(out, out, obj_names, out, out, out))
+                else:
+                    cmd = zmake_var.dereference("rm -f %s && $(AR) crs %s %s" %(out, out, obj_names))
+                self._add(_zmake_job(out, cmd, "'<%s>': Packaging" %module.name, [], objs,
+                    mod = module.name, pool = module.pool, priority = module.priority, shared = shared))
+            else:
+                out = zmake_var.dereference(module._app_path)
+                cmd = zmake_var.dereference("$(LD) -o %s %s %s -L$(PRJ_PATH)/libs %s"
+                    %(out, obj_names, module.linkflags, module._lib_ld))
+                libs = [self.jobs[zmake_var.dereference(lib)] for lib in module._lib_dep.split()]
+                self._add(_zmake_job(out, cmd, "'<%s>': Linking" %module.name, [], objs + libs,
+                    mod = module.name, pool = module.pool, priority = module.priority))
+
+            self._add(_zmake_job(module.name, deps = [self.jobs[out]]))
+
+        for name, target in zmake_target._targets.items():
+            # as make, references to undefined variables are taken from environment
+            cmd = _ZMAKE_VAR_SHELL_REF.sub(r'${\1}', zmake_var.dereference(target.cmd, False))
+            self._add(_zmake_job(name, cmd, target.desc))
+
+        for name, target in zmake_target._targets.items():
+            for dep in target.deps:
+                if dep not in self.jobs:
+                    raise _zmake_exception("invalid dependency(%s) for ZMake target(%s)" %(dep, name))
+                self.jobs[name].deps.append(self.jobs[dep])
+
+    def _find(self, targets):
+        """
+        internal function, find all jobs required by specified targets
+            return: list, jobs in dependency order
+        """
+        found = []
+        state = {}      # job name: 1 - visiting, 2 - visited
+        for name in targets:
+            if name not in self.jobs:
+                raise _zmake_exception("unknown target %s" %name)
+
+            stack = [(self.jobs[name], iter(self.jobs[name].deps))]
+            while stack != []:
+                top, deps = stack[-1]
+                state[top.name] = 1
+                dep = next(deps, None)
+                if dep == None:
+                    state[top.name] = 2
+                    found.append(top)
+                    stack.pop()
+                elif state.get(dep.name) == 1:
+                    raise _zmake_exception("circular dependency: %s -> %s" %(top.name, dep.name))
+                elif dep.name not in state:
+                    stack.append((dep, iter(dep.deps)))
+
+        return found
+
+    def build(self, targets, jobs):
+        """
+        build specified targets
+            targets:    list, names of targets, libraries or applications
+            jobs:       int, number of concurrent jobs
+            return:     bool, True if succeed
+        """
+        log_path = build_log_path()
+        log = build_log_load(log_path)
+        number = max([entry[3] for entry in log.values() if len(entry) > 3] + [0]) + 1
+
+        found   = self._find(targets)
+        waiting = {job: len(job.deps) for job in found}
+        users   = {}    # job: jobs depend on it
+        for job in found:
+            for dep in job.deps:
+                users.setdefault(dep, []).append(job)
+
+        ready   = [job for job in found if waiting[job] == 0]
+        running = {}    # future: job
+        pools   = {}    # pool: number of running jobs in the pool
+        done    = 0
+        executed = 0
+        failed  = []
+        base    = time.time()
+
+        _LOGGER.info("build %d jobs with %d concurrent jobs", len(found), jobs)
+        with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+            while ready != [] or running != {}:
+                ready.sort(key = lambda job: -job.priority)
+                for job in list(ready):
+                    if len(running) >= jobs or failed != []:
+                        break
+
+                    if job.pool != "":
+                        if pools.get(job.pool, 0) >= zmake_pool.find(job.pool).depth:
+                            continue    # wait for jobs in the same pool
+                        pools[job.pool] = pools.get(job.pool, 0) + 1
+
+                    ready.remove(job)
+                    running[pool.submit(job.run, log)] = job
+
+                if running == {}:
+                    break
+
+                finished, pending = concurrent.futures.wait(running,
+                    return_when = concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    if job.pool != "":
+                        pools[job.pool] -= 1
+                    run, start, end, code, output = future.result()
+                    done += 1
+                    if run:
+                        executed += 1
+                        self._report(done, len(found), job, output)
+                        if code != 0:
+                            self._write("FAILED: %s\n" %job.name)
+                            failed.append(job)
+                            log.pop(job.name, None)
+                            continue
+
+                        if not job.phony:
+                            log[job.name] = [_zmake_job.cmd_hash(job.cmd),
+                                int((start - base) * 1000), int((end - base) * 1000), number]
+
+                    for user in users.get(job, []):
+                        waiting[user] -= 1
+                        if waiting[user] == 0:
+                            ready.append(user)
+
+        build_log_save(log_path, log)
+
+        if failed != []:
+            self._write("build stopped: %d job(s) failed\n" %len(failed))
+            return False
+
+        if executed == 0:
+            self._write("no work to do\n")
+        return True
+
+def build_log_path():
+    return os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_BUILD_LOG)
+
+def build_log_load(path):
+    """
+    load build log of direct build, stale or corrupt log is ignored
+        return: dict, output: [command hash, start time in ms, end time in ms, build number]
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as fd:
+            log = json.load(fd)
+    except (OSError, ValueError):
+        return {}
+
+    if (not isinstance(log, dict) or log.get('format') != _ZMAKE_BUILD_FORMAT
+        or not isinstance(log.get('entries'), dict)):
+        _LOGGER.info("build log %s is stale, ignored", path)
+        return {}
+
+    return log['entries']
+
+def build_log_save(path, log):
+    create_dir(os.path.dirname(path))
+    file_update(path, json.dumps({'format': _ZMAKE_BUILD_FORMAT, 'entries': log},
+        indent = 1, sort_keys = True))
+
+def direct_build(targets, jobs):
+    """
+    build specified targets directly without generated files
+        targets:    list, names of targets, libraries or applications
+        jobs:       int, number of concurrent jobs
+        return:     bool, True if succeed
+    """
+    builder = _zmake_builder()
+    builder.graph_create()
+    return builder.build(targets, jobs)
+
+# Shared object store
+
+class _zmake_store_lock(object):
+    """ZMake lock of shared object store
+        store:      string, store directory
+        exclusive:  bool, exclusive lock to collect garbage, shared lock to
+                    add records of projects
+
+        used as context manager, the lock is released when the lock file is closed
+    """
+
+    def __init__(self, store, exclusive = False):
+        self.path       = os.path.join(store, _ZMAKE_STORE_LOCK)
+        self.exclusive  = exclusive
+        self._fd        = None
+
+    def __enter__(self):
+        if fcntl == None:
+            raise _zmake_exception("shared object store is NOT supported on this platform")
+
+        create_dir(os.path.dirname(self.path))
+        self._fd = open(self.path, 'a')
+        fcntl.flock(self._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._fd.close()
+
+def _obj_store_headers(dir, found):
+    """
+    internal function, find headers in specified directory and its subdirectories,
+    the project and the store are skipped
+        found:  dict, directory: [header], results of directories searched
+        return: list, header paths
+    """
+    if dir in found:
+        return found[dir]
+
+    headers = []
+    for path, dirs, files in os.walk(dir):
+        _ZMAKE_STORE_FILES[path] = path_sig(path)   # headers added or removed
+        dirs[:] = [name for name in dirs if os.path.join(path, name) not in (_PRJ_DIR, _PRJ_OBJ_STORE)]
+        headers += [os.path.join(path, file) for file in files if os.path.splitext(file)[1] in _ZMAKE_STORE_HDR_EXTS]
+
+    found[dir] = headers
+    return headers
+
+def _obj_store_inside(path, dir):
+    """
+    internal function, check whether specified path is in specified directory
+    """
+    return dir != '' and (path == dir or path.startswith(dir + os.sep))
+
+def obj_store_symbols(lib, found):
+    """
+    find Kconfig symbols referenced by sources of specified library and by
+    headers in its source and include directories; include directories
+    outside the source tree, such as those of toolchain, are NOT searched
+        lib:    ZMake library object
+        found:  dict, path: symbols or headers, results of files and directories scanned
+        return: set, XXX of CONFIG_XXX, or None if they could NOT be determined,
+            such as headers generated in project
+    """
+    files = []
+    dirs  = []
+    for obj in lib.src.values():
+        srcs = obj.unity or [obj._src_path]
+        files += srcs
+        dirs += [os.path.dirname(src) for src in srcs]
+
+        args = zmake_var.dereference(obj._raw_flags).split()
+        for idx, arg in enumerate(args):
+            for opt in _ZMAKE_STORE_INC_OPTS + _ZMAKE_STORE_INC_FILES:
+                if arg.startswith(opt):
+                    val = arg[len(opt):] or (args[idx + 1] if idx + 1 < len(args) else '')
+                    (files if opt in _ZMAKE_STORE_INC_FILES else dirs).append(os.path.abspath(val))
+                    break
+
+    for dir in set(dirs):
+        if _obj_store_inside(dir, _PRJ_DIR) or _obj_store_inside(dir, _PRJ_OBJ_STORE):
+            return None
+        elif _obj_store_inside(dir, _SRC_TREE) and os.path.isdir(dir):
+            files += _obj_store_headers(dir, found)
+
+    symbols = set()
+    for file in files:
+        if file not in found:
+            try:
+                with open(file, 'rb') as fd:
+                    found[file] = set(sym.decode('ascii') for sym in _ZMAKE_STORE_SYMBOL.findall(fd.read()))
+            except OSError:
+                return None
+
+            _ZMAKE_STORE_FILES[file] = path_sig(file)
+
+        symbols.update(found[file])
+
+    return symbols
+
+def obj_store_header(symbols):
+    """
+    get Kconfig header of a library in shared object store, which only
+    defines the symbols referenced by the library, so that projects(variants)
+    agreeing on these symbols share the library
+        symbols:    set, XXX of CONFIG_XXX, or None for the whole header
+        return:     string, content of header
+    """
+    with open(_KCONFIG_HDR, 'r', encoding='utf-8') as fd:
+        lines = fd.readlines()
+
+    if symbols == None:
+        return ''.join(lines)
+
+    content = "/* Kconfig symbols referenced by the library, generated by zmake */\n"
+    for line in lines:
+        temp = _ZMAKE_STORE_DEFINE.match(line)
+        if temp != None and temp.group(1) in symbols:
+            content += line
+
+    return content
+
+def store_sig(cmd):
+    """
+    get signature of command for output in shared object store, see zmake_store.py
+        cmd:    string, command, ZMake variables are resolved
+        return: string, hex digest
+    """
+    return hashlib.sha1(zmake_var.dereference(cmd, False).encode('utf-8')).hexdigest()
+
+def obj_store_record_path(store):
+    """
+    get path of record of current project in shared object store
+    """
+    name = hashlib.sha1(_PRJ_DIR.encode('utf-8')).hexdigest() + '.json'
+    return os.path.join(store, _ZMAKE_STORE_PROJECTS, name)
+
+def obj_store_assign():
+    """
+    place objects and archives of all libraries in shared object store: each
+    library is placed in entry '<store>/objs/<library>-<key>', the key is
+    derived from source paths, effective compiler flags and the values of
+    Kconfig symbols referenced by the library(or the whole Kconfig header if
+    they could NOT be determined), so that projects(variants) agreeing on the
+    configuration of a library reuse its objects and archive; the Kconfig
+    header with these symbols is placed in the entry, so that compile commands
+    of such projects are identical
+        return: dict, record of current project, see obj_store_save()
+    """
+    global _ZMAKE_STORE_FILES
+
+    if not os.path.isfile(_KCONFIG_HDR):
+        raise _zmake_exception("Kconfig header of %s NOT found" %_PRJ_DIR)
+
+    _ZMAKE_STORE_FILES = {}
+    found = {}
+    entries = []
+    for lib in zmake_lib._libs.values():
+        symbols = obj_store_symbols(lib, found)
+        if symbols == None:
+            _LOGGER.info("Kconfig symbols of library %s could NOT be determined, whole %s is used",
+                lib.name, _KCONFIG_HDR)
+
+        lib._store_hdr = obj_store_header(symbols)
+        config = hashlib.sha1(lib._store_hdr.encode('utf-8')).hexdigest()
+        name = "%s-%s" %(lib.name, lib.store_key(config)[:16])
+        lib.store_set(os.path.join(_PRJ_OBJ_STORE, _ZMAKE_STORE_OBJS, name))
+        entries.append(name)
+        _LOGGER.info("library %s in store entry %s", lib.name, name)
+
+    for app in zmake_app._apps.values():
+        app.libs_update()
+
+    return {'project': _PRJ_DIR, 'entries': sorted(entries)}
+
+def obj_store_save(record):
+    """
+    save Kconfig headers of libraries and record of current project in shared
+    object store, entries referenced by records of existing projects are kept
+    by store-gc; headers are identical for the same entry, so they are only
+    written when absent
+        record: dict, record of current project, see obj_store_assign()
+    """
+    with _zmake_store_lock(_PRJ_OBJ_STORE):
+        for lib in zmake_lib._libs.values():
+            create_dir(lib._config_dir)
+            file_update(os.path.join(lib._config_dir, os.path.basename(_KCONFIG_HDR)), lib._store_hdr)
+
+        path = obj_store_record_path(_PRJ_OBJ_STORE)
+        create_dir(os.path.dirname(path))
+        file_update(path, json.dumps(record, indent = 1, sort_keys = True))
+
+def _obj_store_live(store, record):
+    """
+    internal function, check whether project of specified record still uses the store
+        return: bool, True if model of the project refers to the store
+    """
+    if not isinstance(record, dict) or not isinstance(record.get('project'), str):
+        return False
+
+    try:
+        with open(os.path.join(record['project'], _ZMAKE_META_PATH, _ZMAKE_MODEL), 'r', encoding='utf-8') as fd:
+            model = json.load(fd)
+    except (OSError, ValueError):
+        return False
+
+    return isinstance(model, dict) and model.get('obj_store') == store
+
+def _obj_store_size(path):
+    """
+    internal function, get size of all files in specified directory in bytes
+    """
+    size = 0
+    for dir, dirs, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(dir, file)).st_size
+            except OSError:
+                pass
+
+    return size
+
+def obj_store_gc(store, dry_run = False):
+    """
+    collect garbage of shared object store: records of projects that no
+    longer exist or no longer use the store are removed, then entries NOT
+    referenced by any record are removed; the store is locked exclusively,
+    so that no project adds its record meanwhile
+        store:      string, store directory
+        dry_run:    bool, only report what would be removed
+        return:     dict, number of removed records/entries and bytes
+    """
+    store = os.path.abspath(store)
+    if not os.path.isdir(store):
+        raise _zmake_exception("invalid object store: %s" %store)
+
+    remove = (lambda path: None) if dry_run else (lambda path: shutil.rmtree(path, ignore_errors = True))
+    result = {'records': 0, 'entries': 0, 'bytes': 0}
+    with _zmake_store_lock(store, exclusive = True):
+        used = set()
+        path = os.path.join(store, _ZMAKE_STORE_PROJECTS)
+        for name in (os.listdir(path) if os.path.isdir(path) else []):
+            try:
+                with open(os.path.join(path, name), 'r', encoding='utf-8') as fd:
+                    record = json.load(fd)
+            except (OSError, ValueError):
+                record = None
+
+            if not _obj_store_live(store, record):
+                _LOGGER.info("remove record %s", os.path.join(path, name))
+                result['records'] += 1
+                if not dry_run:
+                    os.remove(os.path.join(path, name))
+                continue
+
+            used.update(record.get('entries', []))
+
+        path = os.path.join(store, _ZMAKE_STORE_OBJS)
+        for name in (os.listdir(path) if os.path.isdir(path) else []):
+            if name in used:
+                continue
+
+            _LOGGER.info("remove %s", os.path.join(path, name))
+            result['entries'] += 1
+            result['bytes'] += _obj_store_size(os.path.join(path, name))
+            remove(os.path.join(path, name))
+
+    return result
+
+def store_gc_main(argv):
+    """
+    'zmake.py store-gc' command, collect garbage of shared object store
+        argv:   list, arguments after 'store-gc'
+    """
+    parser = argparse.ArgumentParser(prog = "zmake.py store-gc",
+        description = "remove entries of shared object store NOT used by any existing project")
+
+    parser.add_argument("-n", "--dry-run",
+                        default = False, action = 'store_true',
+                        help    = 'only report what would be removed')
+    parser.add_argument("-V", "--verbose",
+                        default = False, action = 'store_true',
+                        help    = 'list removed records and entries')
+    parser.add_argument("store",
+                        help    = 'object store directory')
+
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    try:
+        result = obj_store_gc(args.store, args.dry_run)
+    except _zmake_exception as e:
+        sys.exit("zmake.py store-gc: %s" %e.message)
+
+    sys.stdout.write("%s %d records, %d entries, %.1f MB\n"
+        %("would remove" if args.dry_run else "removed", result['records'], result['entries'],
+        result['bytes'] / (1024 * 1024)))
+
+# Build report
+
+def model_save():
+    """
+    save libraries/applications and their objects in metadata directory, so
+    that build report could be created without YAML files and Kconfig
+    """
+    modules = {}
+    for module, flags in modules_find():
+        modules[module.name] = {
+            'type':     _ZMAKE_ENT_TYPE_LIB if isinstance(module, zmake_lib) else _ZMAKE_ENT_TYPE_APP,
+            'output':   module._out_path,
+            'objs':     {obj._obj_path: obj._src_path for obj in module.src.values()},
+            'libs':     module._libs if isinstance(module, zmake_app) else [],
+        }
+
+    path = os.path.join(_PRJ_DIR, _ZMAKE_META_PATH, _ZMAKE_MODEL)
+    create_dir(os.path.dirname(path))
+    file_update(path, json.dumps({'version': ZMAKE_VER, 'obj_store': _PRJ_OBJ_STORE, 'modules': modules},
+        indent = 1, sort_keys = True))
+
+class _zmake_report(object):
+    """ZMake build report
+        prj_dir:    string, project path
+
+        timings of last build are loaded from ninja log or build log of direct
+        build, and joined with libraries/applications saved by model_save();
+        if model is absent, modules are inferred from output paths
+    """
+
+    def __init__(self, prj_dir):
+        self.prj_dir    = os.path.abspath(prj_dir)
+        self.entries    = []    # [output, start in ms, end in ms]
+        self.source     = ''
+        self.modules    = {}    # name: {'type', 'output', 'objs', 'libs'}
+        self.owners     = {}    # output: module name
+
+        self._model_load()
+        self._ninja_log_load()
+        if self.entries == []:
+            self._build_log_load()
+
+        if self.entries == []:
+            raise _zmake_exception("no timings in %s, build the project with ninja or '-g direct' first"
+                %self.prj_dir)
+
+        for output, start, end in self.entries:
+            if output not in self.owners:
+                self.owners[output] = self._infer(output)
+
+    def _model_load(self):
+        path = os.path.join(self.prj_dir, _ZMAKE_META_PATH, _ZMAKE_MODEL)
+        try:
+            with open(path, 'r', encoding='utf-8') as fd:
+                model = json.load(fd)
+            self.modules = model['modules']
+        except (OSError, ValueError, KeyError, TypeError):
+            _LOGGER.info("no valid model %s, modules are inferred from paths", path)
+            return
+
+        for name, module in self.modules.items():
+            self.owners[module['output']] = name
+            for obj in module['objs']:
+                self.owners[obj] = name
+
+    def _infer(self, output):
+        """
+        internal function, infer module from output path:
+        objs/<module>/xxx.o, libs/lib<module>.a or apps/<module>
+        """
+        parts = os.path.relpath(output, self.prj_dir).split(os.sep)
+        if len(parts) == 3 and parts[0] == 'objs':
+            name = parts[1]
+        elif len(parts) == 2 and parts[0] == 'libs' and parts[1].startswith('lib') and parts[1].endswith('.a'):
+            name = parts[1][len('lib'):-len('.a')]
+        elif len(parts) == 2 and parts[0] == 'apps':
+            name = parts[1]
+        else:
+            return None
+
+        module = self.modules.setdefault(name, {'type': '', 'output': '', 'objs': {}, 'libs': []})
+        if parts[0] == 'objs':
+            module['objs'][output] = ''
+        else:
+            module['type'] = _ZMAKE_ENT_TYPE_LIB if parts[0] == 'libs' else _ZMAKE_ENT_TYPE_APP
+            module['output'] = output
+        return name
+
+    def _ninja_log_load(self):
+        """
+        internal function, load entries of last build from ninja log, a new
+        build starts when end time goes backwards
+        """
+        path = os.path.join(self.prj_dir, _ZMAKE_NINJA_LOG)
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as fd:
+                lines = fd.readlines()
+        except OSError:
+            return
+
+        entries = {}
+        last_end = 0
+        for line in lines:
+            fields = line.rstrip('\n').split('\t')
+            if line.startswith('#') or len(fields) < 5:
+                continue
+
+            try:
+                start, end = int(fields[0]), int(fields[1])
+            except ValueError:
+                continue
+
+            if end < last_end:
+                entries = {}
+            last_end = end
+            entries[fields[3]] = [fields[3], start, end]
+
+        self.entries = list(entries.values())
+        self.source = path
+
+    def _build_log_load(self):
+        """
+        internal function, load entries of last build from build log of direct build
+        """
+        path = os.path.join(self.prj_dir, _ZMAKE_META_PATH, _ZMAKE_BUILD_LOG)
+        log = build_log_load(path)
+        number = max([entry[3] for entry in log.values() if len(entry) > 3] + [0])
+        self.entries = [[output, entry[1], entry[2]] for output, entry in log.items()
+            if (entry[3] if len(entry) > 3 else 0) == number]
+        self.source = path
+
+    def critical_path(self, durations):
+        """
+        find critical path of last build: object -> library -> application
+            durations:  dict, output: duration in ms
+            return:     tuple, (length in ms, list of outputs)
+        """
+        def longest_obj(module):
+            found = [(durations.get(obj, 0), [obj]) for obj in module['objs'] if obj in durations]
+            return max(found, default = (0, []))
+
+        chains = {}     # library name: (length, outputs)
+        for name, module in self.modules.items():
+            if module['type'] == _ZMAKE_ENT_TYPE_LIB:
+                length, outputs = longest_obj(module)
+                chains[name] = (length + durations.get(module['output'], 0), outputs + [module['output']])
+
+        found = max(chains.values(), default = (0, []))
+        for name, module in self.modules.items():
+            if module['type'] != _ZMAKE_ENT_TYPE_APP:
+                continue
+
+            inputs = [longest_obj(module)] + [chains[lib] for lib in module['libs'] if lib in chains]
+            length, outputs = max(inputs)
+            found = max(found, (length + durations.get(module['output'], 0), outputs + [module['output']]))
+
+        return (found[0], [output for output in found[1] if output in durations])
+
+    def create(self, top):
+        """
+        create report
+            top:    int, number of slowest translation units
+            return: dict
+        """
+        durations = {output: end - start for output, start, end in self.entries}
+        start = min(entry[1] for entry in self.entries)
+        wall = max(entry[2] for entry in self.entries) - start
+        total = sum(durations.values())
+
+        modules = {}
+        for output, duration in durations.items():
+            name = self.owners.get(output)
+            if name == None:
+                continue
+
+            module = modules.setdefault(name, {'type': self.modules[name]['type'],
+                'objs': 0, 'compile': 0, 'output': 0, 'total': 0})
+            if output == self.modules[name]['output']:
+                module['output'] += duration
+            else:
+                module['objs'] += 1
+                module['compile'] += duration
+            module['total'] += duration
+
+        objs = [(duration, output) for output, duration in durations.items()
+            if self.owners.get(output) != None and output != self.modules[self.owners[output]]['output']]
+        objs.sort(reverse = True)
+
+        length, path = self.critical_path(durations)
+        return {
+            'source':       self.source,
+            'jobs':         len(self.entries),
+            'wall':         wall,
+            'total':        total,
+            'parallelism':  total / wall if wall != 0 else 0,
+            'modules':      modules,
+            'slowest':      [{'output': output, 'module': self.owners[output], 'time': duration}
+                for duration, output in objs[:top]],
+            'critical_path': {'time': length,
+                'outputs': [{'output': output, 'time': durations[output]} for output in path]},
+        }
+
+    def trace_create(self):
+        """
+        create Chrome trace events, jobs are placed in lanes so that jobs in
+        one lane never overlap
+            return: dict
+        """
+        events = []
+        lanes  = []     # end time of last job in each lane
+        for output, start, end in sorted(self.entries, key = lambda entry: (entry[1], entry[2])):
+            for tid, lane_end in enumerate(lanes):
+                if lane_end <= start:
+                    break
+            else:
+                tid = len(lanes)
+                lanes.append(0)
+
+            lanes[tid] = end
+            events.append({'name': os.path.basename(output), 'cat': self.owners.get(output) or 'other',
+                'ph': 'X', 'ts': start * 1000, 'dur': (end - start) * 1000, 'pid': 0, 'tid': tid,
+                'args': {'output': output}})
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    @staticmethod
+    def text(report):
+        """
+        format report as text tables
+            return: string
+        """
+        lines = ["timings: %s" %report['source'],
+            "jobs: %d, wall time: %d ms, total job time: %d ms, parallelism: %.2f"
+            %(report['jobs'], report['wall'], report['total'], report['parallelism']), ""]
+
+        lines.append("%-24s %-6s %8s %12s %12s %12s" %('module', 'type', 'objects', 'compile(ms)', 'output(ms)', 'total(ms)'))
+        for name, module in sorted(report['modules'].items(), key = lambda item: -item[1]['total']):
+            lines.append("%-24s %-6s %8d %12d %12d %12d" %(name, module['type'], module['objs'],
+                module['compile'], module['output'], module['total']))
+
+        lines += ["", "slowest translation units:", "%10s  %-24s %s" %('time(ms)', 'module', 'object')]
+        for obj in report['slowest']:
+            lines.append("%10d  %-24s %s" %(obj['time'], obj['module'], obj['output']))
+
+        lines += ["", "critical path: %d ms" %report['critical_path']['time']]
+        for output in report['critical_path']['outputs']:
+            lines.append("%10d  %s" %(output['time'], output['output']))
+
+        return '\n'.join(lines) + '\n'
+
+def report_main(argv):
+    """
+    'zmake.py report' command, create build report for existing project
+        argv:   list, arguments after 'report'
+    """
+    parser = argparse.ArgumentParser(prog = "zmake.py report",
+        description = "build time report from ninja log or build log of direct build")
+
+    parser.add_argument("--top", default = 10, type = int,
+                        help    = 'number of slowest translation units')
+    parser.add_argument("--json", metavar = 'FILE',
+                        help    = 'save report to JSON file')
+    parser.add_argument("--trace", metavar = 'FILE',
+                        help    = 'save Chrome trace events file, could be loaded by chrome://tracing or Perfetto')
+    parser.add_argument("project",
+                        help    = 'project path')
+
+    args = parser.parse_args(argv)
+    logging.disable(logging.INFO)
+
+    try:
+        report = _zmake_report(args.project)
+    except _zmake_exception as e:
+        sys.exit("zmake.py report: %s" %e.message)
+
+    result = report.create(args.top)
+    sys.stdout.write(_zmake_report.text(result))
+
+    if args.json != None:
+        with open(args.json, 'w', encoding='utf-8') as fd:
+            json.dump(result, fd, indent = 1)
+
+    if args.trace != None:
+        with open(args.trace, 'w', encoding='utf-8') as fd:
+            json.dump(report.trace_create(), fd)
+
+# Project generation
+
+def prj_gen(defconfig, menuconfig, project, targets, jobs):
+    """
+    configure project and generate Makefile/build.ninja, or build it directly;
+    YAML files are loaded unless they are already loaded and unchanged, see
+    zmake_project.generate() for the state of the project
+        defconfig:  string, defconfig file, or empty
+        menuconfig: string, Source Code Path for menuconfig method, or empty
+        project:    string, project path
+        targets:    list, targets for direct build
+        jobs:       int, number of concurrent jobs for direct build
+        return:     int, exit code
+    """
+    global _PRJ_DIR
+
+    _PRJ_DIR = os.path.abspath(project)
+
+    kconfig_init(defconfig)
+
+    if menuconfig != '':
+        kconfig_menu()
+    else:
+        kconfig_gen()
+
+    kconfig_parse()
+
+    if _PRJ_CONFIG_DEPS == 1:
+        kconfig_deps_sync()
+
+    if _PRJ_GEN != _PRJ_GEN_TYPE_DIRECT and _PRJ_FORCE == 0 and manifest_check():
+        _LOGGER.info("%s is up to date", manifest_output())
+        return 0
+
+    yml_tree_load()
+    zmake_sys_var_create()
+    yml_file_parse()
+
+    record = None
+    if _PRJ_OBJ_STORE != '':
+        record = obj_store_assign()
+
+    critical_path_compute()
+    zmake_sys_target_create()
+    model_save()
+
+    # record is saved after model, which tells store-gc the project uses the store
+
+    if record != None:
+        obj_store_save(record)
+
+    if _PRJ_SCAN_CACHE == 1:
+        _zmake_scanner.cache_save(scan_cache_path())
+
+    if _PRJ_GEN == _PRJ_GEN_TYPE_DIRECT:
+        return 0 if direct_build(targets, jobs) else 1
+
+    if _PRJ_GEN == _PRJ_GEN_TYPE_MAKE:
+        make_gen()
+    else:
+        ninja_gen()
+
+    manifest_save()
+    return 0
+
+def _variant_wait(running):
+    """
+    internal function, wait for one variant process to exit
+        running:    dict, pid: project path
+        return:     int, 1 if the variant failed, otherwise 0
+    """
+    pid, status = os.wait()
+    project = running.pop(pid)
+    if os.waitstatus_to_exitcode(status) != 0:
+        _LOGGER.error("failed to configure %s", project)
+        return 1
+
+    _LOGGER.info("configure %s done", project)
+    return 0
+
+# Workspace
+
+_ZMAKE_STATE_LOCK   = threading.RLock()     # module globals are the state of one project at a time
+_ZMAKE_STATE_VARS   = ('_SRC_TREE', '_PRJ_DIR', '_PRJ_GEN', '_PRJ_VREB', '_PRJ_FORCE', '_PRJ_SCAN_CACHE',
+    '_PRJ_YAML_CACHE', '_PRJ_OBJ_CACHE', '_PRJ_OBJ_CACHE_SIZE', '_PRJ_UNITY', '_PRJ_UNITY_OFF',
+    '_PRJ_CONFIG_DEPS', '_PRJ_OBJ_STORE', '_YAML_FILES', '_YAML_DATA', '_YAML_SIGS', '_YAML_DISABLED',
+    '_ZMAKE_SRC_PATHS', '_ZMAKE_STORE_FILES', '_KCONFIG_DEFCONFIG', '_KCONFIG_CONFIG_PATH', '_KCONFIG_CONFIG',
+    '_KCONFIG_HDR', '_KCONFIG_MODULE_OPTIONS')     # module globals owned by workspace and project
+_ZMAKE_STATE_ENVS   = ('srctree', 'KCONFIG_CONFIG')    # environment variables set for Kconfig tools
+_ZMAKE_STATE_REGS   = ((zmake_var, '_vars'), (zmake_var, '_tokens'), (zmake_var, '_expanded'),
+    (zmake_lib, '_libs'), (zmake_app, '_apps'), (zmake_target, '_targets'),
+    (zmake_pool, '_pools'), (zmake_pool, '_steps'))    # class registries of ZMake entities
+
+def _zmake_state_save():
+    """
+    internal function, save module globals, class registries and environment
+    variables owned by workspace and project
+        return: tuple, see _zmake_state_restore()
+    """
+    return ({name: globals()[name] for name in _ZMAKE_STATE_VARS},
+        [getattr(cls, name) for cls, name in _ZMAKE_STATE_REGS],
+        {name: os.environ.get(name) for name in _ZMAKE_STATE_ENVS})
+
+def _zmake_state_restore(state):
+    """
+    internal function, restore module globals, class registries and environment
+    variables saved by _zmake_state_save()
+    """
+    vars, regs, envs = state
+    globals().update(vars)
+    for (cls, name), reg in zip(_ZMAKE_STATE_REGS, regs):
+        setattr(cls, name, reg)
+
+    for name, val in envs.items():
+        if val == None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = val
+
+class _zmake_state(object):
+    """ZMake state of project
+        project:    ZMake project object, see zmake_project._install()
+        rescan:     bool, forget directories scanned when installed
+
+        used as context manager around each public entry point of workspace
+        and project: the state lock is held, the state of caller is saved and
+        the project is installed; the state of caller is restored on exit,
+        even if an exception is raised, so projects are serialized in a
+        process, and concurrent calls from other threads wait for the lock
+    """
+
+    def __init__(self, project, rescan = True):
+        self.project    = project
+        self.rescan     = rescan
+        self.saved      = None
+
+    def __enter__(self):
+        _ZMAKE_STATE_LOCK.acquire()
+        try:
+            self.saved = _zmake_state_save()
+            self.project._install(self.rescan)
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            _zmake_scanner.reset()
+        finally:
+            try:
+                if self.saved != None:
+                    _zmake_state_restore(self.saved)
+            finally:
+                self.saved = None
+                _ZMAKE_STATE_LOCK.release()
+
+class zmake_workspace(object):
+    """ZMake workspace
+        src_tree:   string, source code path, including top.yml and Kconfig
+
+        a source tree loaded once and shared by projects created by project(),
+        so that several projects could be generated, or a project could be
+        reconfigured repeatedly, in a long-lived process without loading
+        YAML files again; YAML files are only reloaded when any of them
+        changes, and scanned directories are cached by mtime
+    """
+
+    def __init__(self, src_tree):
+        self.src_tree = os.path.abspath(src_tree)
+        if not os.path.isdir(self.src_tree):
+            raise _zmake_exception("invalid Source Code Path: %s" %src_tree)
+
+        self._yaml_files = []   # YAML files loaded, see yml_tree_load()
+        self._yaml_data  = {}
+        self._yaml_sigs  = {}
+
+    def project(self, path, **options):
+        """
+        create project of this source tree
+            path:       string, project path
+            options:    options of project, see zmake_project
+            return:     ZMake project object
+        """
+        return zmake_project(self, path, **options)
+
+    def variants_gen(self, variants, targets = ['all'], jobs = os.cpu_count() or 1):
+        """
+        configure several variants of source tree in one pass: YAML files are
+        loaded and source directories of all libraries/applications are scanned
+        once, then Kconfig of each variant is evaluated, disabled modules are
+        filtered and files are generated in a forked process, which shares the
+        parsed state; caches of the first project are used
+            variants:   list, (defconfig file, ZMake project object)
+            targets:    list, targets for direct build
+            jobs:       int, number of concurrent jobs for direct build
+            return:     int, exit code, non-zero if any variant failed
+        """
+        if not hasattr(os, 'fork'):
+            raise _zmake_exception("multi-variant configure is NOT supported on this platform")
+
+        with _zmake_state(variants[0][1]):
+            yml_tree_load()
+            self._update()
+
+            # no module is disabled before Kconfig is evaluated, so all are scanned
+
+            zmake_sys_var_create()
+            yml_vars_create()
+            yml_src_prescan()
+            zmake_reset()
+
+            failed  = 0
+            running = {}    # pid: project path
+            for defconfig, project in variants:
+                while len(running) >= _ZMAKE_VARIANT_JOBS:
+                    failed += _variant_wait(running)
+
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    code = 1
+                    try:
+                        project._install(rescan = False)
+                        code = prj_gen(defconfig, '', project.path, targets, jobs)
+                    except _zmake_exception as e:
+                        _LOGGER.error("%s: %s", project.path, e.message)
+                    finally:
+                        sys.stdout.flush()
+                        sys.stderr.flush()
+                        os._exit(code)
+
+                _LOGGER.info("configure %s with %s", project.path, defconfig)
+                running[pid] = project.path
+
+            while running != {}:
+                failed += _variant_wait(running)
+
+        return 1 if failed != 0 else 0
+
+    def _update(self):
+        """
+        internal function, keep YAML files loaded by current project for next projects
+        """
+        self._yaml_files = _YAML_FILES
+        self._yaml_data  = _YAML_DATA
+        self._yaml_sigs  = _YAML_SIGS
+
+class zmake_project(object):
+    """ZMake project
+        workspace:      ZMake workspace object, source tree of project
+        path:           string, project path
+        generator:      string, optional, one of 'make', 'ninja' and 'direct'
+        verbose:        bool, optional, enable verbose output of generated files
+        force:          bool, optional, force regeneration even if nothing changed
+        scan_cache:     bool, optional, enable persistent source scan cache
+        yaml_cache:     bool, optional, enable binary cache of parsed YAML files
+        obj_cache:      string, optional, object cache directory, disabled if empty
+        obj_cache_size: int, optional, size limit of object cache in MB
+        unity:          int, optional, batch size of unity build for modules without 'unity'
+        no_unity:       bool, optional, disable unity build for all modules
+        config_deps:    bool, optional, fine-grained Kconfig dependencies
+        obj_store:      string, optional, shared object store directory, disabled if empty
+
+        the state of project, such as options and ZMake entities, is owned by
+        this object; it is installed in module globals and class registries
+        while the project is generated, and the previous state is restored
+        afterwards even if an exception is raised, see _zmake_state, so
+        projects are generated one at a time in a process: calls from several
+        threads are serialized, use variants_gen() or processes to configure
+        projects in parallel
+    """
+
+    def __init__(self, workspace, path, generator = _PRJ_GEN_TYPE_MAKE, verbose = False, force = False,
+        scan_cache = True, yaml_cache = True, obj_cache = '', obj_cache_size = _PRJ_OBJ_CACHE_SIZE,
+        unity = 0, no_unity = False, config_deps = False, obj_store = ''):
+        if generator not in _PRJ_GEN_TYPES:
+            raise _zmake_exception("invalid build generator %s for project %s" %(generator, path))
+
+        self.workspace  = workspace
+        self.path       = os.path.abspath(path)
+        self.generator  = generator
+        self.verbose    = verbose
+        self.force      = force
+        self.scan_cache = scan_cache
+        self.yaml_cache = yaml_cache
+        self.obj_cache  = os.path.abspath(obj_cache) if obj_cache != '' else ''
+        self.obj_cache_size = obj_cache_size
+        self.unity      = max(unity, 0)
+        self.no_unity   = no_unity
+        self.config_deps = config_deps
+        self.obj_store  = os.path.abspath(obj_store) if obj_store != '' else ''
+
+        # ZMake entities of last generation, name: entity
+
+        self.vars       = {}
+        self.libs       = {}
+        self.apps       = {}
+        self.targets    = {}
+
+    def _install(self, rescan = True):
+        """
+        internal function, install state of workspace and this project in
+        module globals, ZMake entities are removed
+            rescan: bool, forget directories scanned, so that they are checked again
+        """
+        globals().update({
+            '_SRC_TREE':            self.workspace.src_tree,
+            '_PRJ_DIR':             self.path,
+            '_PRJ_GEN':             self.generator,
+            '_PRJ_VREB':            1 if self.verbose else 0,
+            '_PRJ_FORCE':           1 if self.force else 0,
+            '_PRJ_SCAN_CACHE':      1 if self.scan_cache else 0,
+            '_PRJ_YAML_CACHE':      1 if self.yaml_cache else 0,
+            '_PRJ_OBJ_CACHE':       self.obj_cache,
+            '_PRJ_OBJ_CACHE_SIZE':  self.obj_cache_size,
+            '_PRJ_UNITY':           0 if self.no_unity else self.unity,
+            '_PRJ_UNITY_OFF':       1 if self.no_unity else 0,
+            '_PRJ_CONFIG_DEPS':     1 if self.config_deps else 0,
+            '_PRJ_OBJ_STORE':       self.obj_store,
+            '_YAML_FILES':          self.workspace._yaml_files,
+            '_YAML_DATA':           self.workspace._yaml_data,
+            '_YAML_SIGS':           self.workspace._yaml_sigs,
+            '_YAML_DISABLED':       set(),
+            '_ZMAKE_STORE_FILES':   {},
+        })
+
+        for cls, name in _ZMAKE_STATE_REGS:
+            setattr(cls, name, {})
+
+        if rescan:
+            _zmake_scanner.reset()
+
+    def generate(self, defconfig = '', menuconfig = False, targets = ['all'], jobs = os.cpu_count() or 1):
+        """
+        configure this project and generate Makefile/build.ninja, or build it
+        directly, like 'zmake.py' with options of this project; it could be
+        called repeatedly, such as with '<project path>/config/prj.config' as
+        defconfig file to reconfigure the project with its current configuration
+            defconfig:  string, optional, defconfig file
+            menuconfig: bool, optional, enable menuconfig method
+            targets:    list, optional, targets for direct build
+            jobs:       int, optional, number of concurrent jobs for direct build
+            return:     int, exit code
+        """
+        with _zmake_state(self):
+            code = prj_gen(defconfig, self.workspace.src_tree if menuconfig else '', self.path,
+                targets, max(jobs, 1))
+            self.workspace._update()
+            self.vars       = zmake_var._vars
+            self.libs       = zmake_lib._libs
+            self.apps       = zmake_app._apps
+            self.targets    = zmake_target._targets
+
+        return code
+
 if __name__ == "__main__":
+    # logging is only configured for command line, NOT when imported
+    logging.basicConfig(level = logging.DEBUG, format = '%(levelname)s[%(asctime)s]:%(message)s')
+
+    if sys.argv[1:2] == ['report']:
+        report_main(sys.argv[2:])
+        sys.exit(0)
+
+    if sys.argv[1:2] == ['store-gc']:
+        store_gc_main(sys.argv[2:])
+        sys.exit(0)
+
     parser = argparse.ArgumentParser(description="zmake project builder")
 
     parser.add_argument('-v', '--version',
@@ -1025,50 +4198,85 @@ if __name__ == "__main__":
                         default = '', metavar = '"Source Code Path"',
                         help    = 'enable menuconfig method, \nused after project created ONLY')
 
+    parser.add_argument('-f', '--force',
+                        default = False, action = 'store_true',
+                        help    = 'force regeneration even if nothing changed')
+    parser.add_argument('--no-scan-cache',
+                        default = False, action = 'store_true',
+                        help    = 'disable persistent source scan cache')
+    parser.add_argument('--no-yaml-cache',
+                        default = False, action = 'store_true',
+                        help    = 'disable binary cache of parsed YAML files')
+    parser.add_argument('--obj-cache',
+                        default = '', metavar = '"cache directory"',
+                        help    = 'enable object cache for compile steps in specified directory')
+    parser.add_argument('--obj-cache-size',
+                        default = _PRJ_OBJ_CACHE_SIZE, type = int, metavar = 'MB',
+                        help    = 'size limit of object cache in MB')
+    parser.add_argument('--unity',
+                        default = 0, type = int, metavar = 'N',
+                        help    = 'unity build with N files in each unit for modules without "unity"')
+    parser.add_argument('--no-unity',
+                        default = False, action = 'store_true',
+                        help    = 'disable unity build for all modules')
+    parser.add_argument('--config-deps',
+                        default = False, action = 'store_true',
+                        help    = 'objects only depend on Kconfig symbols they use instead of the whole config.h')
+    parser.add_argument('--obj-store',
+                        default = '', metavar = '"store directory"',
+                        help    = 'place objects and archives of libraries in shared object store, so that'
+                                  ' projects with the same configuration of a library reuse them')
     parser.add_argument("-g", "--generator",
                         default = _PRJ_GEN_TYPE_MAKE, choices = _PRJ_GEN_TYPES,
                         help    = 'build generator')
-    parser.add_argument("project",
+    parser.add_argument("-j", "--jobs",
+                        default = os.cpu_count() or 1, type = int,
+                        help    = 'number of concurrent jobs for direct build')
+    parser.add_argument("-t", "--target",
+                        default = [], action = 'append',
+                        help    = 'target to build for direct build, "all" by default, could be repeated')
+    parser.add_argument("--variant",
+                        default = [], action = 'append', nargs = 2, metavar = ('"defconfig file"', 'project'),
+                        help    = 'configure a variant of source tree, could be repeated to configure'
+                                  ' several variants in one pass, instead of "-d" and project')
+    parser.add_argument("project", nargs = '?',
                         help    ='project path')
 
     args = parser.parse_args()
 
-    if args.verbose:
-        _PRJ_VREB = 1
-    else:
-        logging.disable(logging.DEBUG)   # disable Debug/INFO logging
-
-    logging.info("arguments:")
-    logging.info(" defconfig file           : %s", args.defconfig)
-    logging.info(" Source Code Path         : %s", args.menuconfig)
-    logging.info(" build generator          : %s", args.generator)
-    logging.info(" project path             : %s", args.project)
-
-    if args.menuconfig == '':
-        _SRC_TREE   = os.path.abspath('.')
-    else:
-        if not os.path.exists(args.menuconfig):
-            raise _zmake_exception("invalid Source Code Path: %s" %args.menuconfig)
-        else:
-            _SRC_TREE = os.path.abspath(args.menuconfig)
-
-    _PRJ_DIR    = os.path.abspath(args.project)
-    _PRJ_GEN    = args.generator
-
-    kconfig_init(args.defconfig)
-
-    if args.menuconfig != '':
-        kconfig_menu()
-    else:
-        kconfig_gen()
+    if args.variant != []:
+        if args.project != None or args.defconfig != '' or args.menuconfig != '':
+            parser.error("--variant could NOT be used with project, -d or -m")
+    elif args.project == None:
+        parser.error("project is required")
 
-    kconfig_parse()
-    yml_file_load(_YAML_ROOT_FILE)
-    zmake_sys_var_create()
-    yml_file_parse()
-    zmake_sys_target_create()
+    if not args.verbose:
+        logging.disable(logging.DEBUG)   # disable Debug/INFO logging
 
-    if _PRJ_GEN == _PRJ_GEN_TYPE_MAKE:
-        make_gen()
-    else:
-        ninja_gen()
+    _LOGGER.info("arguments:")
+    _LOGGER.info(" defconfig file           : %s", args.defconfig)
+    _LOGGER.info(" Source Code Path         : %s", args.menuconfig)
+    _LOGGER.info(" build generator          : %s", args.generator)
+    _LOGGER.info(" project path             : %s", args.project)
+
+    workspace = zmake_workspace(args.menuconfig if args.menuconfig != '' else '.')
+    options = {
+        'generator':        args.generator,
+        'verbose':          args.verbose,
+        'force':            args.force,
+        'scan_cache':       not args.no_scan_cache,
+        'yaml_cache':       not args.no_yaml_cache,
+        'obj_cache':        args.obj_cache,
+        'obj_cache_size':   args.obj_cache_size,
+        'unity':            args.unity,
+        'no_unity':         args.no_unity,
+        'config_deps':      args.config_deps,
+        'obj_store':        args.obj_store,
+    }
+
+    if args.variant != []:
+        sys.exit(workspace.variants_gen([(defconfig, workspace.project(project, **options))
+            for defconfig, project in args.variant], args.target or ['all'], max(args.jobs, 1)))
+
+    project = workspace.project(args.project, **options)
+    sys.exit(project.generate(args.defconfig, args.menuconfig != '', args.target or ['all'], args.jobs))
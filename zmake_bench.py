@@ -0,0 +1,284 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#Copyright 2023 Xiaofeng Zu
+#
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+# zmake generator benchmark:
+#   1) synthesize YAML configurations, Kconfig and source trees of configurable size;
+#   2) run each zmake phase in a fresh interpreter and report wall time and peak memory.
+
+import sys, os, argparse, json, shutil, statistics
+import subprocess, tempfile, time, tracemalloc, resource
+
+_BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# phases, in execution order
+
+_BENCH_PHASES = ['kconfig_gen', 'kconfig_parse', 'yml_file_load', 'src_find',
+    'yml_file_parse', 'generate']
+
+# tree synthesis
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w', encoding='utf-8') as fd:
+        fd.write(content)
+
+def _module_srcs(root, name, count, depth):
+    """
+    create source files for one module, spread over 'depth' levels of subdirectories
+    """
+    for idx in range(count):
+        dir = root
+        for level in range(idx % (depth + 1)):
+            dir = os.path.join(dir, 'sub%d' %level)
+
+        _write(os.path.join(dir, '%s_%d.c' %(name, idx)),
+            '#include <config.h>\n\nint %s_%d(void)\n{\n    return %d;\n}\n' %(name, idx, idx))
+
+def tree_create(root, libs, apps, srcs, vars, include_depth, src_depth):
+    """
+    synthesize source tree with top.yml, Kconfig and modules
+        root:           string, path of source tree
+        libs:           int, number of libraries
+        apps:           int, number of applications
+        srcs:           int, number of source files per module
+        vars:           int, number of ZMake variables
+        include_depth:  int, depth of YAML includes between top.yml and module YAML files
+        src_depth:      int, depth of source subdirectories in each module
+    """
+    kconfig = 'mainmenu "zmake benchmark"\n\n'
+    modules = []
+
+    for idx in range(libs):
+        name = 'lib%d' %idx
+        _module_srcs(os.path.join(root, 'libs', name), name, srcs, src_depth)
+        kconfig += 'config %s\n    bool "Enable %s"\n    default y\n\n' %(name.upper(), name)
+        _write(os.path.join(root, 'libs', name, name + '.yml'),
+            '%s:\n'
+            '  type:     lib\n'
+            '  desc:     %s library\n'
+            '  opt:      CONFIG_%s\n'
+            '  src:\n'
+            '    - $(BENCH_PATH)/libs/%s\n'
+            '  hdrdirs:\n'
+            '    - $(BENCH_PATH)/libs/%s\n'
+            '  cflags:\n'
+            '    all:      $(BENCH_FLAGS_%d) -D%s\n'
+            '    %s_0.c:   -DFIRST\n'
+            %(name, name, name.upper(), name, name, idx % max(vars, 1), name.upper(), name))
+        modules.append('libs/%s/%s.yml' %(name, name))
+
+    for idx in range(apps):
+        name = 'app%d' %idx
+        _module_srcs(os.path.join(root, 'apps', name), name, srcs, src_depth)
+        kconfig += 'config %s\n    bool "Enable %s"\n    default y\n\n' %(name.upper(), name)
+        deps = ''.join('    - lib%d\n' %((idx + dep) % libs) for dep in range(min(libs, 4)))
+        _write(os.path.join(root, 'apps', name, name + '.yml'),
+            '%s:\n'
+            '  type:     app\n'
+            '  desc:     %s application\n'
+            '  opt:      CONFIG_%s\n'
+            '  src:\n'
+            '    - $(BENCH_PATH)/apps/%s\n'
+            '  cflags:\n'
+            '    all:      $(BENCH_FLAGS_%d)\n'
+            '%s'
+            %(name, name, name.upper(), name, idx % max(vars, 1),
+            ('  libs:\n' + deps) if deps != '' else ''))
+        modules.append('apps/%s/%s.yml' %(name, name))
+
+    # chain of YAML includes, the last one includes all module YAML files
+
+    includes = modules
+    for level in reversed(range(include_depth)):
+        path = 'yml/level%d.yml' %level
+        _write(os.path.join(root, path),
+            'includes:\n' + ''.join('  - %s\n' %file for file in includes))
+        includes = [path]
+
+    top = 'includes:\n' + ''.join('  - %s\n' %file for file in includes)
+    top += ('CC:\n  type: var\n  val:  gcc -MD\n\n'
+        'AR:\n  type: var\n  val:  ar\n\n'
+        'LD:\n  type: var\n  val:  gcc\n\n'
+        'BENCH_PATH:\n  type: var\n  val:  $(SRC_PATH)\n\n')
+    for idx in range(vars):
+        val = '-DBENCH_%d' %idx if idx == 0 else '$(BENCH_FLAGS_%d) -DBENCH_%d' %(idx - 1, idx)
+        top += 'BENCH_FLAGS_%d:\n  type: var\n  val:  %s\n\n' %(idx, val)
+
+    _write(os.path.join(root, 'top.yml'), top)
+    _write(os.path.join(root, 'Kconfig'), kconfig)
+
+# phase runner, executed in a fresh interpreter for each run
+
+def _phase(results, name, func, *args):
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    ret = func(*args)
+    results[name] = {'time': time.perf_counter() - start}
+
+    if tracemalloc.is_tracing():
+        results[name]['peak'] = tracemalloc.get_traced_memory()[1]
+
+    return ret
+
+def phases_run(src_tree, prj_dir, generator, trace_memory):
+    """
+    run all zmake phases for specified source tree and project, and print
+    results as JSON
+    """
+    sys.path.insert(0, _BENCH_DIR)
+    import logging
+    import zmake
+
+    logging.disable(logging.INFO)
+    os.chdir(src_tree)
+
+    zmake._SRC_TREE = src_tree
+    zmake._PRJ_DIR  = prj_dir
+    zmake._PRJ_GEN  = generator
+
+    if trace_memory:
+        tracemalloc.start()
+
+    results = {}
+    zmake.kconfig_init('')
+    _phase(results, 'kconfig_gen', zmake.kconfig_gen)
+    _phase(results, 'kconfig_parse', zmake.kconfig_parse)
+    _phase(results, 'yml_file_load', zmake.yml_file_load, zmake._YAML_ROOT_FILE)
+    zmake.zmake_sys_var_create()
+
+    # source discovery happens inside yml_file_parse(), and is accounted separately
+
+    prescan = zmake.yml_src_prescan
+    def timed_prescan():
+        _phase(results, 'src_find', prescan)
+
+    zmake.yml_src_prescan = timed_prescan
+    _phase(results, 'yml_file_parse', zmake.yml_file_parse)
+    results['yml_file_parse']['time'] -= results.get('src_find', {'time': 0})['time']
+    zmake.zmake_sys_target_create()
+
+    if generator == zmake._PRJ_GEN_TYPE_NINJA:
+        _phase(results, 'generate', zmake.ninja_gen)
+    else:
+        _phase(results, 'generate', zmake.make_gen)
+
+    results['maxrss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(json.dumps(results))
+
+# report
+
+def _size(val):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if val < 1024 or unit == 'GB':
+            return '%.1f%s' %(val, unit)
+        val /= 1024
+
+def report(generator, runs):
+    """
+    print median wall time and peak memory of each phase for all runs
+    """
+    print("generator: %s, %d run(s)" %(generator, len(runs)))
+    print("%-16s %12s %12s" %('phase', 'time(ms)', 'peak'))
+
+    total = 0
+    for phase in _BENCH_PHASES:
+        times = [run[phase]['time'] for run in runs if phase in run]
+        if times == []:
+            continue
+
+        peaks = [run[phase]['peak'] for run in runs if 'peak' in run[phase]]
+        median = statistics.median(times)
+        total += median
+        print("%-16s %12.1f %12s" %(phase, median * 1000, _size(max(peaks)) if peaks != [] else '-'))
+
+    print("%-16s %12.1f %12s" %('total', total * 1000, _size(max(run['maxrss'] for run in runs))))
+    print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="zmake generator benchmark")
+
+    parser.add_argument('--libs', type = int, default = 50,
+                        help = 'number of libraries')
+    parser.add_argument('--apps', type = int, default = 10,
+                        help = 'number of applications')
+    parser.add_argument('--srcs', type = int, default = 100,
+                        help = 'number of source files per module')
+    parser.add_argument('--vars', type = int, default = 100,
+                        help = 'number of ZMake variables')
+    parser.add_argument('--include-depth', type = int, default = 2,
+                        help = 'depth of YAML includes')
+    parser.add_argument('--src-depth', type = int, default = 2,
+                        help = 'depth of source subdirectories in each module')
+    parser.add_argument('-g', '--generator', default = 'all', choices = ['make', 'ninja', 'all'],
+                        help = 'build generator to benchmark')
+    parser.add_argument('-r', '--repeat', type = int, default = 3,
+                        help = 'number of runs for each generator, median is reported')
+    parser.add_argument('--no-trace-memory', default = False, action = 'store_true',
+                        help = 'do not trace peak memory of each phase, which slows down phases')
+    parser.add_argument('--json', metavar = 'FILE',
+                        help = 'save all results to JSON file')
+    parser.add_argument('--tree', metavar = 'PATH',
+                        help = 'path for synthesized tree, kept after benchmark; temporary if absent')
+    parser.add_argument('--run-phases', nargs = 3, metavar = ('SRC', 'PRJ', 'GEN'),
+                        help = argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_phases != None:
+        src, prj, gen = args.run_phases
+        phases_run(src, prj, gen, not args.no_trace_memory)
+        sys.exit(0)
+
+    root = args.tree if args.tree != None else tempfile.mkdtemp(prefix = 'zmake_bench_')
+    root = os.path.abspath(root)
+    src_tree = os.path.join(root, 'src')
+
+    try:
+        print("synthesize %d libraries and %d applications with %d sources each in %s"
+            %(args.libs, args.apps, args.srcs, src_tree))
+        shutil.rmtree(src_tree, ignore_errors = True)
+        tree_create(src_tree, args.libs, args.apps, args.srcs, args.vars,
+            args.include_depth, args.src_depth)
+        print()
+
+        all_runs = {}
+        gens = ['make', 'ninja'] if args.generator == 'all' else [args.generator]
+        for gen in gens:
+            runs = []
+            for idx in range(args.repeat):
+                prj = os.path.join(root, 'prj_%s' %gen)
+                shutil.rmtree(prj, ignore_errors = True)
+                cmd = [sys.executable, os.path.abspath(__file__), '--run-phases', src_tree, prj, gen]
+                if args.no_trace_memory:
+                    cmd.append('--no-trace-memory')
+
+                ret = subprocess.run(cmd, stdout = subprocess.PIPE, universal_newlines = True)
+                if ret.returncode != 0:
+                    sys.exit("benchmark failed for generator %s" %gen)
+
+                runs.append(json.loads(ret.stdout.splitlines()[-1]))
+
+            report(gen, runs)
+            all_runs[gen] = runs
+
+        if args.json != None:
+            with open(args.json, 'w', encoding='utf-8') as fd:
+                json.dump({'args': vars(args), 'runs': all_runs}, fd, indent = 1)
+    finally:
+        if args.tree == None:
+            shutil.rmtree(root, ignore_errors = True)
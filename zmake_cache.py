@@ -0,0 +1,447 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#Copyright 2023 Xiaofeng Zu
+#
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+# zmake object cache, compile wrapper used by generated Makefile/build.ninja:
+#   1) objects are keyed by preprocessed source, compiler flags and compiler identity;
+#   2) objects are saved in a local content-addressed cache directory, bounded
+#   by size with LRU eviction;
+#   3) entries are written through temporary files and renamed, and cache
+#   statistics are updated under a file lock, so that concurrent jobs could
+#   share one cache directory.
+#
+# usage: zmake_cache.py --dir <cache directory> [--max-size <MB>] -- <compiler> <flags> -c <source> -o <object>
+
+import sys, os, argparse, json, hashlib
+import subprocess, tempfile, fcntl
+
+_CACHE_FORMAT       = 2                 # format version of cache entries, part of keys
+_CACHE_STATS        = 'stats.json'      # statistics: hits, misses, uncacheable and size
+_CACHE_LOCK         = '.lock'           # lock file for statistics and eviction
+_CACHE_OBJ_EXT      = '.o'              # cached object
+_CACHE_ERR_EXT      = '.stderr'         # compiler diagnostics replayed on hits
+_CACHE_MAX_SIZE     = 5 * 1024          # default size limit in MB
+_CACHE_EVICT_RATIO  = 0.9               # size after eviction, ratio of size limit
+_CACHE_UMASK        = os.umask(0o022)   # umask of process, read once since it could only be read by setting it
+os.umask(_CACHE_UMASK)
+
+# compiler options
+
+_CC_ARG_OPTS    = ('-o', '-x', '-MF', '-MT', '-MQ', '-I', '-D', '-U', '-include',
+    '-imacros', '-isystem', '-iquote', '-idirafter', '-Xpreprocessor')    # options with separate argument
+_CC_CPP_OPTS    = ('-I', '-D', '-U', '-include', '-imacros', '-isystem', '-iquote',
+    '-idirafter', '-Xpreprocessor')     # preprocessor options, reflected in preprocessed source
+_CC_DEP_OPTS    = ('-MD', '-MMD', '-MP')        # dependency options without argument
+_CC_DEP_ARG_OPTS = ('-MF', '-MT', '-MQ')        # dependency options with argument
+_CC_RAW_LANGS   = ('assembler', 'cpp-output', 'c++-cpp-output')     # languages NOT preprocessed
+_CC_RAW_EXTS    = ('.s', '.i', '.ii')       # source extensions NOT preprocessed
+
+class _cache_uncacheable(Exception):
+    """raised when compile command could NOT be cached, it is executed directly"""
+    pass
+
+# compile command
+
+class _cc_cmd(object):
+    """compile command
+        argv:   list, compiler and its arguments
+
+        compiler arguments are classified for the preprocessor, the hash
+        and the dependency file
+    """
+
+    def __init__(self, argv):
+        self.argv   = argv
+        self.src    = None
+        self.lang   = None  # effective '-x' language of source, or None if derived from extension
+        self.obj    = None
+        self.flags  = []    # options that affect compilation but NOT preprocessing, hashed
+        self.cpp    = []    # options for preprocessor
+        self.deps   = []    # dependency options
+        self.depfile = None
+        self.target = None
+        self.debug  = False
+
+        compile = False
+        srcs    = []
+        lang    = None
+        idx     = 1
+        while idx < len(argv):
+            arg = argv[idx]
+            val = None
+            if arg in _CC_ARG_OPTS:
+                if idx + 1 >= len(argv):
+                    raise _cache_uncacheable("missing argument for %s" %arg)
+                val = argv[idx + 1]
+                idx += 1
+            idx += 1
+
+            if arg == '-c':
+                compile = True
+            elif arg == '-o':
+                self.obj = val
+            elif arg == '-x':
+                lang = None if val == 'none' else val
+                self.flags += [arg, val]
+            elif arg in ('-E', '-S', '-M', '-MM', '-') or arg.startswith('@'):
+                raise _cache_uncacheable("unsupported option %s" %arg)
+            elif arg in _CC_DEP_OPTS:
+                self.deps.append(arg)
+            elif arg in _CC_DEP_ARG_OPTS:
+                if arg == '-MF':
+                    self.depfile = val
+                else:
+                    self.target = val if self.target == None else self.target + ' ' + val
+            elif arg.startswith(_CC_CPP_OPTS):
+                self.cpp += [arg] if val == None else [arg, val]
+            elif not arg.startswith('-'):
+                srcs.append((arg, lang))
+            else:
+                self.flags += [arg] if val == None else [arg, val]
+                if arg.startswith('-g') and arg != '-g0':
+                    self.debug = True
+
+        if not compile or len(srcs) != 1 or self.obj == None:
+            raise _cache_uncacheable("NOT a single compilation")
+
+        self.src, self.lang = srcs[0]
+        if self.deps != [] and self.depfile == None:
+            self.depfile = os.path.splitext(self.obj)[0] + '.d'
+
+    def preprocess(self):
+        """
+        preprocess source file, and generate dependency file if required, so
+        that dependency file is always correct for this object even on hits;
+        line markers are dropped unless debug information is generated, so
+        that the same source in different paths could share objects
+            return: bytes, preprocessed source
+        """
+        cmd = [self.argv[0]] + self.flags + self.cpp + ['-E']
+        if not self.debug:
+            cmd.append('-P')
+
+        if self.deps != []:
+            cmd += self.deps + ['-MF', self.depfile]
+            cmd += ['-MT', self.obj] if self.target == None else ['-MT', self.target]
+
+        ret = subprocess.run(cmd + [self.src], stdout = subprocess.PIPE, stderr = subprocess.DEVNULL)
+        if ret.returncode != 0:
+            raise _cache_uncacheable("failed to preprocess %s" %self.src)
+
+        return ret.stdout
+
+    def source(self):
+        """
+        read source file which is NOT preprocessed by compiler, such as '.s',
+        for which the preprocessor prints nothing; the compiler writes no
+        dependency file for it either
+            return: bytes, source
+        """
+        try:
+            with open(self.src, 'rb') as fd:
+                content = fd.read()
+        except OSError:
+            raise _cache_uncacheable("failed to read %s" %self.src)
+
+        return content
+
+    def key(self):
+        """
+        key of object: hash of source language, preprocessed source, compiler flags
+        and compiler identity
+            return: string, hex digest
+        """
+        ext = os.path.splitext(self.src)[1]
+        hash = hashlib.sha256()
+        hash.update(("zmake cache %d\n" %_CACHE_FORMAT).encode('utf-8'))
+        hash.update(compiler_identity(self.argv[0]).encode('utf-8'))
+        hash.update(("%s %s\n" %(ext, self.lang)).encode('utf-8'))
+        hash.update(('\0'.join(self.flags) + '\n').encode('utf-8'))
+        if self.debug:
+            hash.update((os.getcwd() + '\n').encode('utf-8'))   # compilation directory in debug information
+        if self.lang in _CC_RAW_LANGS or (self.lang == None and ext in _CC_RAW_EXTS):
+            hash.update(self.source())
+        else:
+            hash.update(self.preprocess())
+        return hash.hexdigest()
+
+def compiler_identity(cc):
+    """
+    identity of compiler: real path, mtime and size of the executable
+        return: string
+    """
+    path = cc
+    if os.sep not in cc:
+        for dir in os.environ.get('PATH', '').split(os.pathsep):
+            if os.path.isfile(os.path.join(dir, cc)) and os.access(os.path.join(dir, cc), os.X_OK):
+                path = os.path.join(dir, cc)
+                break
+
+    try:
+        path = os.path.realpath(path)
+        st = os.stat(path)
+    except OSError:
+        raise _cache_uncacheable("compiler %s NOT found" %cc)
+
+    return "%s %d %d\n" %(path, st.st_mtime_ns, st.st_size)
+
+# cache directory
+
+class _zmake_cache(object):
+    """zmake object cache
+        path:       string, cache directory
+        max_size:   int, size limit in bytes
+    """
+
+    def __init__(self, path, max_size):
+        self.path       = os.path.abspath(path)
+        self.max_size   = max_size
+        os.makedirs(self.path, exist_ok = True)
+
+    def _entry(self, key):
+        return os.path.join(self.path, key[:2], key[2:])
+
+    def find(self, key, obj):
+        """
+        copy cached object to specified path, and replay compiler diagnostics
+            return: bool, True if found
+        """
+        entry = self._entry(key)
+        try:
+            with open(entry + _CACHE_OBJ_EXT, 'rb') as fd:
+                content = fd.read()
+        except OSError:
+            return False
+
+        try:
+            with open(entry + _CACHE_ERR_EXT, 'rb') as fd:
+                sys.stderr.buffer.write(fd.read())
+                sys.stderr.flush()
+        except OSError:
+            pass
+
+        _atomic_write(obj, content)
+        try:
+            os.utime(entry + _CACHE_OBJ_EXT)    # recently used
+        except OSError:
+            pass
+        return True
+
+    def add(self, key, obj, stderr):
+        """
+        save compiled object and its compiler diagnostics
+            return: int, size of the entry
+        """
+        entry = self._entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok = True)
+        with open(obj, 'rb') as fd:
+            content = fd.read()
+
+        size = len(content) + len(stderr)
+        if stderr != b'':
+            _atomic_write(entry + _CACHE_ERR_EXT, stderr)
+        _atomic_write(entry + _CACHE_OBJ_EXT, content)     # object is written last, it marks a valid entry
+        return size
+
+    def _locked(self):
+        fd = open(os.path.join(self.path, _CACHE_LOCK), 'a')
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _stats_read(self):
+        try:
+            with open(os.path.join(self.path, _CACHE_STATS), 'r', encoding='utf-8') as fd:
+                stats = json.load(fd)
+            if isinstance(stats, dict):
+                return stats
+        except (OSError, ValueError):
+            pass
+
+        return {'hits': 0, 'misses': 0, 'uncacheable': 0, 'size': 0}
+
+    def stats_update(self, name, size = 0):
+        """
+        update cache statistics, and evict least recently used entries if
+        cache size exceeds the limit
+            name:   string, 'hits', 'misses' or 'uncacheable'
+            size:   int, size added to cache
+        """
+        with self._locked():
+            stats = self._stats_read()
+            stats[name] = stats.get(name, 0) + 1
+            stats['size'] = stats.get('size', 0) + size
+            if stats['size'] > self.max_size:
+                stats['size'] = self.evict(int(self.max_size * _CACHE_EVICT_RATIO))
+                stats['evictions'] = stats.get('evictions', 0) + 1
+
+            _atomic_write(os.path.join(self.path, _CACHE_STATS),
+                json.dumps(stats, indent = 1, sort_keys = True).encode('utf-8'))
+
+    def entries(self):
+        """
+        find all entries
+            return: list, (mtime in ns, size, entry path without extension)
+        """
+        found = []
+        for dir in os.listdir(self.path):
+            dir = os.path.join(self.path, dir)
+            if not os.path.isdir(dir):
+                continue
+
+            sizes = {}
+            for file in os.listdir(dir):
+                name, ext = os.path.splitext(file)
+                if ext not in (_CACHE_OBJ_EXT, _CACHE_ERR_EXT):
+                    continue    # temporary files
+
+                try:
+                    st = os.stat(os.path.join(dir, file))
+                except OSError:
+                    continue
+
+                mtime, size = sizes.get(name, (0, 0))
+                sizes[name] = (max(mtime, st.st_mtime_ns) if ext == _CACHE_OBJ_EXT else mtime, size + st.st_size)
+
+            found += [(mtime, size, os.path.join(dir, name)) for name, (mtime, size) in sizes.items()]
+
+        return found
+
+    def evict(self, size):
+        """
+        remove least recently used entries until cache size is NOT larger than specified size
+            return: int, cache size
+        """
+        found = sorted(self.entries())
+        total = sum(entry[1] for entry in found)
+        for mtime, entry_size, entry in found:
+            if total <= size:
+                break
+
+            for ext in (_CACHE_OBJ_EXT, _CACHE_ERR_EXT):
+                try:
+                    os.remove(entry + ext)
+                except OSError:
+                    pass
+            total -= entry_size
+
+        return total
+
+    def stats(self):
+        """
+        get cache statistics
+            return: dict
+        """
+        with self._locked():
+            stats = self._stats_read()
+            found = self.entries()
+        stats['entries'] = len(found)
+        stats['size'] = sum(entry[1] for entry in found)
+        stats['max_size'] = self.max_size
+        return stats
+
+    def clear(self):
+        """
+        remove all entries and statistics
+        """
+        with self._locked():
+            self.evict(0)
+            try:
+                os.remove(os.path.join(self.path, _CACHE_STATS))
+            except OSError:
+                pass
+
+def _atomic_write(path, content: bytes):
+    """
+    write file through a temporary file and rename it, so that readers never
+    see a half-written file
+    """
+    tmp_fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(os.path.abspath(path)),
+        prefix = '.' + os.path.basename(path))
+    try:
+        with os.fdopen(tmp_fd, 'wb') as fd:
+            fd.write(content)
+        os.chmod(tmp_path, 0o666 & ~_CACHE_UMASK)     # as if written by compiler
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def cache_compile(cache, argv):
+    """
+    compile with object cache
+        cache:  _zmake_cache object
+        argv:   list, compile command
+        return: int, exit code of compiler
+    """
+    try:
+        cmd = _cc_cmd(argv)
+        key = cmd.key()
+    except _cache_uncacheable:
+        cache.stats_update('uncacheable')
+        return subprocess.run(argv).returncode
+
+    if cache.find(key, cmd.obj):
+        cache.stats_update('hits')
+        return 0
+
+    ret = subprocess.run(argv, stderr = subprocess.PIPE)
+    sys.stderr.buffer.write(ret.stderr)
+    sys.stderr.flush()
+    if ret.returncode != 0:
+        return ret.returncode
+
+    try:
+        size = cache.add(key, cmd.obj, ret.stderr)
+    except OSError as e:
+        sys.stderr.write("zmake cache: failed to save %s(%s)\n" %(cmd.obj, str(e)))
+        size = 0
+
+    cache.stats_update('misses', size)
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="zmake object cache")
+
+    parser.add_argument('-d', '--dir', required = True,
+                        help = 'cache directory')
+    parser.add_argument('-s', '--max-size', type = int, default = _CACHE_MAX_SIZE,
+                        help = 'size limit of cache in MB, least recently used objects are evicted')
+    parser.add_argument('--stats', default = False, action = 'store_true',
+                        help = 'show cache statistics')
+    parser.add_argument('--clear', default = False, action = 'store_true',
+                        help = 'remove all cached objects')
+    parser.add_argument('cmd', nargs = argparse.REMAINDER,
+                        help = 'compile command, after "--"')
+
+    args = parser.parse_args()
+    cache = _zmake_cache(args.dir, args.max_size * 1024 * 1024)
+
+    if args.clear:
+        cache.clear()
+
+    if args.stats:
+        stats = cache.stats()
+        total = stats.get('hits', 0) + stats.get('misses', 0)
+        print("cache directory  : %s" %cache.path)
+        print("hits             : %d" %stats.get('hits', 0))
+        print("misses           : %d" %stats.get('misses', 0))
+        print("uncacheable      : %d" %stats.get('uncacheable', 0))
+        print("hit rate         : %.1f%%" %(100.0 * stats.get('hits', 0) / total if total != 0 else 0))
+        print("entries          : %d" %stats['entries'])
+        print("size             : %.1fMB / %.1fMB" %(stats['size'] / 1024 / 1024, stats['max_size'] / 1024 / 1024))
+
+    cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+    if cmd != []:
+        sys.exit(cache_compile(cache, cmd))
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#Copyright 2023 Xiaofeng Zu
+#
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+# zmake fixdep, compile wrapper used for fine-grained Kconfig dependencies,
+# in the spirit of fixdep of Linux:
+#   1) ZMake keeps one file for each Kconfig symbol in the symbol directory,
+#   which is only rewritten when the value of the symbol changes;
+#   2) after compiling, the dependency file written by the compiler is
+#   rewritten: the Kconfig header is removed, and the symbol files of all
+#   CONFIG_XXX referenced by the source file and headers are added, so that
+#   objects are only rebuilt when symbols they use change.
+#
+# usage: zmake_fixdep.py --dir <symbol directory> --header <config.h> -- <compile command>
+
+import sys, os, re, argparse, subprocess
+
+_FIXDEP_SYMBOL = re.compile(rb'CONFIG_([A-Za-z0-9_]+)')
+
+def depfile_find(cmd):
+    """
+    find dependency file written by compiler from compile command
+        cmd:    list, compile command
+        return: string, or None if NOT found
+    """
+    out = None
+    for idx, arg in enumerate(cmd):
+        if arg == '-MF' and idx + 1 < len(cmd):
+            return cmd[idx + 1]
+        if arg.startswith('-MF'):
+            return arg[len('-MF'):]
+        if arg == '-o' and idx + 1 < len(cmd):
+            out = cmd[idx + 1]
+
+    if out != None and ('-MD' in cmd or '-MMD' in cmd):
+        return os.path.splitext(out)[0] + '.d'
+
+    return None
+
+def depfile_parse(content):
+    """
+    parse dependency file
+        return: list, (target, [prerequisite])
+    """
+    rules = []
+    for line in content.replace('\\\n', ' ').splitlines():
+        target, sep, deps = line.partition(': ')
+        if sep == '' and line.endswith(':'):
+            target, sep = line[:-1], ':'    # phony target of '-MP'
+        if sep == '':
+            continue
+
+        deps = [dep.replace('\0', ' ') for dep in deps.replace('\\ ', '\0').split()]
+        rules.append((target.strip(), deps))
+
+    return rules
+
+def symbols_find(paths):
+    """
+    find Kconfig symbols referenced by specified files
+        return: set, XXX of CONFIG_XXX
+    """
+    found = set()
+    for path in paths:
+        try:
+            with open(path, 'rb') as fd:
+                found.update(sym.decode('ascii') for sym in _FIXDEP_SYMBOL.findall(fd.read()))
+        except OSError:
+            continue
+
+    return found
+
+def symbol_file(path, name):
+    """
+    get symbol file of specified Kconfig symbol, a missing file is created
+    with the oldest mtime, since the symbol has NOT changed for this object
+        path:   string, symbol directory
+        name:   string, XXX of CONFIG_XXX
+        return: string, file path
+    """
+    file = os.path.join(path, name)
+    if not os.path.exists(file):
+        try:
+            fd = os.open(file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)   # umask applied
+            os.close(fd)
+            os.utime(file, (0, 0))
+        except FileExistsError:
+            pass
+
+    return file
+
+def fixdep(depfile, path, header):
+    """
+    rewrite dependency file, see above
+        depfile:    string, dependency file
+        path:       string, symbol directory
+        header:     string, Kconfig header, such as config.h
+    """
+    try:
+        with open(depfile, 'r', encoding='utf-8') as fd:
+            rules = depfile_parse(fd.read())
+    except OSError:
+        return
+
+    if rules == []:
+        return
+
+    header = os.path.abspath(header)
+    target, deps = rules[0]
+    deps = [dep for dep in deps if os.path.abspath(dep) != header]
+
+    os.makedirs(path, exist_ok = True)
+    deps += [symbol_file(path, name) for name in sorted(symbols_find(deps))]
+
+    content = "%s: %s\n" %(target, ' \\\n '.join(dep.replace(' ', '\\ ') for dep in deps))
+    for other, others in rules[1:]:     # phony targets of '-MP'
+        content += "%s: %s\n" %(other, ' '.join(dep.replace(' ', '\\ ') for dep in others))
+
+    tmp = depfile + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as fd:
+        fd.write(content)
+    os.replace(tmp, depfile)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="zmake fixdep")
+
+    parser.add_argument('-d', '--dir', required = True,
+                        help = 'symbol directory')
+    parser.add_argument('--header', required = True,
+                        help = 'Kconfig header removed from dependencies')
+    parser.add_argument('cmd', nargs = argparse.REMAINDER,
+                        help = 'compile command, after "--"')
+
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+    if cmd == []:
+        parser.error("command is required")
+
+    ret = subprocess.run(cmd).returncode
+    if ret == 0:
+        depfile = depfile_find(cmd)
+        if depfile != None:
+            fixdep(depfile, args.dir, args.header)
+
+    sys.exit(ret)
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#Copyright 2023 Xiaofeng Zu
+#
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+# zmake pool, command wrapper used by generated Makefile to limit concurrent
+# jobs of one ZMake pool, since GNU make has no pools:
+#   1) each pool has 'depth' slots, each of which is a lock file;
+#   2) the command is executed while holding one slot, and waits if all
+#   slots are held by other jobs.
+#
+# usage: zmake_pool.py --dir <lock directory> --depth <N> -- <command>
+
+import sys, os, argparse, subprocess, fcntl, time
+
+_POOL_POLL = 0.05   # interval in seconds to retry when all slots are held
+
+def slot_acquire(path, depth):
+    """
+    hold one free slot of the pool, and wait if all slots are held
+        path:   string, lock directory of the pool
+        depth:  int, number of slots
+        return: file object of the lock file, the slot is released when it is closed
+    """
+    os.makedirs(path, exist_ok = True)
+    fds = [open(os.path.join(path, 'slot%d' %idx), 'a') for idx in range(depth)]
+    while True:
+        for idx, fd in enumerate(fds):
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+
+            for other in fds[:idx] + fds[idx + 1:]:
+                other.close()
+            return fd
+
+        time.sleep(_POOL_POLL)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="zmake pool")
+
+    parser.add_argument('-d', '--dir', required = True,
+                        help = 'lock directory of the pool')
+    parser.add_argument('--depth', type = int, default = 1,
+                        help = 'maximum number of concurrent jobs in the pool')
+    parser.add_argument('cmd', nargs = argparse.REMAINDER,
+                        help = 'command, after "--"')
+
+    args = parser.parse_args()
+    cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+    if cmd == []:
+        parser.error("command is required")
+
+    with slot_acquire(args.dir, max(args.depth, 1)):
+        sys.exit(subprocess.run(cmd).returncode)
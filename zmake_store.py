@@ -0,0 +1,94 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#Copyright 2023 Xiaofeng Zu
+#
+#Licensed under the Apache License, Version 2.0 (the "License");
+#you may not use this file except in compliance with the License.
+#You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+#Unless required by applicable law or agreed to in writing, software
+#distributed under the License is distributed on an "AS IS" BASIS,
+#WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#See the License for the specific language governing permissions and
+#limitations under the License.
+
+# zmake store check, used by generated build.ninja for shared object store:
+#   1) outputs in the store are shared by several projects, so ninja of a
+#   project finds no entry for outputs built by other projects in its log,
+#   and runs their commands once;
+#   2) the command first runs this check, which succeeds if the output is
+#   newer than its inputs and the prerequisites in its dependency file, and
+#   the signature of its command saved in '<output>.sig' is unchanged, so
+#   the output is NOT rebuilt, and 'restat' keeps its dependents up to date.
+#
+# usage: zmake_store.py --sig <signature> [--dep <dependency file>] <output> [<input> ...]
+# exit code is 0 if the output is up to date, otherwise 1
+
+import sys, os, argparse
+
+from zmake_fixdep import depfile_parse
+
+def sig_read(path):
+    """
+    read signature of command saved for specified output
+        return: string, or None if NOT found
+    """
+    try:
+        with open(path + '.sig', 'r', encoding='utf-8') as fd:
+            return fd.read().strip()
+    except OSError:
+        return None
+
+def up_to_date(out, sig, inputs, depfile = None):
+    """
+    check whether output is up to date
+        out:        string, output path
+        sig:        string, signature of command
+        inputs:     list, input paths
+        depfile:    string, dependency file, or None
+        return:     bool, True if up to date
+    """
+    try:
+        mtime = os.stat(out).st_mtime_ns
+    except OSError:
+        return False
+
+    if sig_read(out) != sig:
+        return False
+
+    paths = list(inputs)
+    if depfile != None:
+        try:
+            with open(depfile, 'r', encoding='utf-8') as fd:
+                rules = depfile_parse(fd.read())
+        except OSError:
+            return False
+
+        for target, deps in rules[:1]:
+            paths += deps
+
+    for path in paths:
+        try:
+            if os.stat(path).st_mtime_ns > mtime:
+                return False
+        except OSError:
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="zmake store check")
+
+    parser.add_argument('--sig', required = True,
+                        help = 'signature of command')
+    parser.add_argument('--dep', default = None,
+                        help = 'dependency file of output')
+    parser.add_argument('out',
+                        help = 'output in shared object store')
+    parser.add_argument('inputs', nargs = '*',
+                        help = 'inputs of output')
+
+    args = parser.parse_args()
+    sys.exit(0 if up_to_date(args.out, args.sig, args.inputs, args.dep) else 1)